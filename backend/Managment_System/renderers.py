@@ -0,0 +1,98 @@
+import math
+import re
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Без orjson - обычные JSONRenderer/JSONParser DRF
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack - только если установлен msgpack
+    msgpack = None
+
+# Быстрые renderer/parser для DRF. Ответ побайтно совпадает с JSONRenderer (компактный, UTF-8,
+# U+2028/U+2029 экранированы): типы, которые orjson не знает (Decimal, timedelta, lazy-строки, QuerySet...),
+# приводятся тем же JSONEncoder DRF. Отступы (?indent, browsable API) и то, что orjson не умеет
+# (int больше 64 бит), - через json.
+# float, которые repr() пишет без экспоненты, orjson пишет так же, остальные - иначе (1e16 вместо 1e+16,
+# 0.00001 вместо 1e-05): такой ответ рендерится заново через json. NaN/Infinity из Decimal тоже уходят в json
+# (ошибка при STRICT_JSON), а float NaN/Infinity в самих данных orjson пишет как null - проверять каждое значение
+# дороже самого json, а FloatField в сериализаторах проекта нет.
+
+_default = JSONEncoder().default
+_LINE_SEPARATORS = ('\u2028'.encode(), '\u2029'.encode())
+# Вне строк e перед цифрой бывает только в экспоненте, 0.0000 - в числах, которые repr() пишет как 1e-05 и меньше.
+# Совпадение внутри строки лишь отправляет ответ в json. Один regex с альтернативой в несколько раз медленнее
+_EXPONENT = re.compile(rb'e-?[0-9]+[,\]}]')
+_SMALL = b'0.0000'
+
+
+def _json_default(value):
+    value = _default(value)
+    if type(value) is float and not math.isfinite(value):
+        raise TypeError('Non-finite float')  # orjson.JSONEncodeError -> JSONRenderer
+    return value
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.compact or self.ensure_ascii or isinstance(data, float) \
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        try:
+            ret = orjson.dumps(data, default=_json_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if _EXPONENT.search(ret) or _SMALL in ret:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2' in ret and (_LINE_SEPARATORS[0] in ret or _LINE_SEPARATORS[1] in ret):  # memchr по 1 байту быстрее
+            ret = ret.replace(_LINE_SEPARATORS[0], b'\\u2028').replace(_LINE_SEPARATORS[1], b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        if orjson is None or parser_context.get('encoding', settings.DEFAULT_CHARSET).lower() not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackRenderer(BaseRenderer):
+    # Выбирается по Accept: application/msgpack или ?format=msgpack
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
+
@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+from projects.cache import shared_cache
+
+# Чтение из реплик (settings.DATABASE_REPLICAS) для GET/HEAD/OPTIONS запросов, запись - в 'default'.
+# После изменяющего запроса клиент REPLICA_STICKY_SECONDS секунд читает из 'default' (read-your-writes).
+# Клиент определяется по токену из заголовка Authorization или сессионной cookie; метки хранятся в django cache,
+# поэтому с репликами cache должен быть общим (settings.CACHES), иначе middleware не запустится.
+# Изменяющий запрос, который выдает новые учетные данные (вход, обновление JWT), метит и их:
+# первый запрос с новым токеном не должен попасть на отстающую реплику.
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+read_alias = ContextVar('read_alias', default=None)  # реплика текущего запроса, None - 'default'
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias.get()
+        if alias is None or connections['default'].in_atomic_block:
+            return 'default'
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def _key(credentials):  # 'Token <key>' и '<key>' - один клиент
+    if not credentials:
+        return None
+    return 'replica-sticky:' + hashlib.sha256(credentials.split()[-1].encode()).hexdigest()
+
+
+def _client_key(request):
+    return _key(request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+
+
+def _issued_keys(response):  # Учетные данные из ответа: токен djoser, access JWT, новая сессионная cookie
+    data = getattr(response, 'data', None)
+    credentials = [data.get(name) for name in ('auth_token', 'access')] if isinstance(data, dict) else []
+    session = response.cookies.get(settings.SESSION_COOKIE_NAME)
+    if session is not None:
+        credentials.append(session.value)
+    return [_key(value) for value in credentials if isinstance(value, str)]
+
+
+def _choose_alias(request):  # Реплика для запроса или None
+    if request.method not in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+        return None
+    key = _client_key(request)
+    if key is not None and cache.get(key):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def _stick(request, response):
+    if request.method in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+        return
+    keys = [key for key in (_client_key(request), *_issued_keys(response)) if key is not None]
+    if keys:
+        cache.set_many(dict.fromkeys(keys, True), settings.REPLICA_STICKY_SECONDS)
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    if settings.DATABASE_REPLICAS and not shared_cache():
+        raise ImproperlyConfigured('DATABASE_REPLICAS require a cache shared by all processes in CACHES')
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = read_alias.set(await sync_to_async(_choose_alias, thread_sensitive=False)(request))
+            try:
+                response = await get_response(request)
+            finally:
+                read_alias.reset(token)
+            await sync_to_async(_stick, thread_sensitive=False)(request, response)
+            return response
+    else:
+        def middleware(request):
+            token = read_alias.set(_choose_alias(request))
+            try:
+                response = get_response(request)
+            finally:
+                read_alias.reset(token)
+            _stick(request, response)
+            return response
+    return middleware
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,12 +46,14 @@ INSTALLED_APPS = [
 
     'projects',
     'users',
+    'jobs',
 ]
 
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'Managment_System.replicas.replica_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -116,6 +119,22 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения, например:
+# DATABASES['replica'] = {**DATABASES['default'], 'HOST': 'replica-host', 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['Managment_System.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 5
+
+# Общий для всех процессов кэш: в нем метки read-your-writes реплик (без него реплики не включаются,
+# ImproperlyConfigured) и кэш токенов (без него токен кэшируется только в процессе на TOKEN_AUTH_LOCAL_CACHE_TTL).
+# По умолчанию у Django LocMemCache - свой в каждом процессе. Например:
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+#         'LOCATION': '127.0.0.1:11211',
+#     }
+# }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -173,21 +192,81 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+        'users.jwt.ClaimsJWTAuthentication',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    # orjson вместо json (Managment_System.renderers), MessagePack по Accept - если установлен msgpack
+    'DEFAULT_RENDERER_CLASSES': (
+        'Managment_System.renderers.ORJSONRenderer',
+        *(('Managment_System.renderers.MessagePackRenderer',) if find_spec('msgpack') else ()),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'Managment_System.renderers.ORJSONParser',
+        *(('Managment_System.renderers.MessagePackParser',) if find_spec('msgpack') else ()),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination'
 }
 
+# Кэш ролей пользователей в проектах (projects.access)
+PROJECT_ACCESS_CACHE_TTL = 5
+PROJECT_ACCESS_CACHE_SIZE = 10000
+
+# Загрузка файлов задач по частям (projects.uploads)
+TASK_UPLOAD_MAX_SIZE = 20 * 1024 ** 3
+TASK_UPLOAD_EXPIRE_HOURS = 24
+
+# Отдача файлов задач (projects.downloads): None - Django FileResponse с Range, 'x-accel-redirect' - nginx
+# (internal location SENDFILE_URL с alias на MEDIA_ROOT), 'x-sendfile' - Apache mod_xsendfile / lighttpd
+SENDFILE_BACKEND = None
+SENDFILE_URL = '/protected/'
+
+# Кэш статистики проектов (projects.stats)
+PROJECT_STATS_CACHE_TTL = 30
+PROJECT_STATS_CACHE_SIZE = 1000
+
+# Кэш токенов авторизации (users.authentication). TOKEN_AUTH_CACHE_TTL - только для общего CACHES
+TOKEN_AUTH_CACHE_TTL = 300
+TOKEN_AUTH_LOCAL_CACHE_TTL = 5
+TOKEN_AUTH_CACHE_SIZE = 10000
+
+# Пользователь и роли в проектах из claims JWT без запросов к БД (users.jwt). Claims действуют JWT_CLAIMS_TTL
+# секунд после выдачи или обновления токена, затем - обычная загрузка из БД
+JWT_STATELESS_USER = False
+JWT_CLAIMS_TTL = 300
+JWT_ROLE_CLAIMS_LIMIT = 100
+
+
+# Фоновые задания (jobs.queue), воркер - manage.py run_jobs
+JOBS_BATCH_SIZE = 50
+JOBS_POLL_INTERVAL = 1
+JOBS_RETRY_DELAY = 30
+JOBS_RETRY_MAX_DELAY = 3600
+JOBS_LOCK_TIMEOUT = 600
+JOBS_KEEP_DAYS = 7  # Выполненные и упавшие задания удаляются через столько дней
+JOBS_EMAIL_MAX_ATTEMPTS = 8
+
+# Письма отправляет воркер run_jobs через EMAIL_BACKEND. Для разработки - вывод в консоль воркера,
+# для локального SMTP-сервера: EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend', EMAIL_PORT = 1025
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'noreply@localhost'
+FRONTEND_URL = 'http://localhost:3000'
+
 
 DJOSER = {
     'PASSWORD_RESET_CONFIRM_URL': 'reset-password/{uid}/{token}',
     'USERNAME_RESET_CONFIRM_URL': '#/username/reset/confirm/{uid}/{token}',
     'PASSWORD_RESET_SHOW_EMAIL_NOT_FOUND': True,
     'SEND_CONFIRMATION_EMAIL': False,
-    'EMAIL': {
+    'EMAIL': {  # Все письма djoser отправляются через очередь jobs
+        'activation': 'users.email.ActivationEmail',
         'confirmation': 'users.email.ConfirmationEmail',
-        'password_reset': 'users.email.PasswordResetEmail'
+        'password_reset': 'users.email.PasswordResetEmail',
+        'password_changed_confirmation': 'users.email.PasswordChangedConfirmationEmail',
+        'username_changed_confirmation': 'users.email.UsernameChangedConfirmationEmail',
+        'username_reset': 'users.email.UsernameResetEmail',
     },
     'SERIALIZERS': {
         'user_create': 'users.serializers.UserCreateSerializer',
@@ -16,6 +16,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from .yasg import urlpatterns as doc_url
+from users.views import ClaimsTokenObtainPairView, ClaimsTokenRefreshView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,6 +26,8 @@ urlpatterns = [
 
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
+    path('auth/jwt/create/', ClaimsTokenObtainPairView.as_view(), name="jwt-create"),
+    path('auth/jwt/refresh/', ClaimsTokenRefreshView.as_view(), name="jwt-refresh"),
     path('auth/', include('djoser.urls.jwt')),
 
 ]
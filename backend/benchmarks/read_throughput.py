@@ -0,0 +1,79 @@
+"""
+Пропускная способность GET запросов: sync WSGI (gunicorn) против async ASGI (uvicorn, projects.async_views).
+
+    gunicorn Managment_System.wsgi -w 1 --threads 8 -b 127.0.0.1:8001
+    uvicorn Managment_System.asgi:application --workers 1 --port 8002
+
+    python benchmarks/read_throughput.py --token <token> \\
+        http://127.0.0.1:8001/projects/1/task/ \\
+        http://127.0.0.1:8002/projects/1/task/ \\
+        http://127.0.0.1:8002/async/projects/1/task/
+
+--slow-send N - клиент отправляет запрос частями в течение N секунд (медленный клиент): у WSGI воркера
+такой клиент держит поток, у ASGI - нет.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def fetch(url, token, slow_send):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    head = f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n'
+    if token:
+        head += f'Authorization: Token {token}\r\n'
+    started = time.perf_counter()
+    writer.write(head.encode())
+    await writer.drain()
+    if slow_send:
+        await asyncio.sleep(slow_send)
+    writer.write(b'\r\n')
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status = int(response.split(b' ', 2)[1]) if response else 0
+    return status, time.perf_counter() - started
+
+
+async def run(url, token, concurrency, total, slow_send):
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+    results = []
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            try:
+                results.append(await fetch(url, token, slow_send))
+            except OSError:
+                results.append((0, 0.0))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    ok = [latency for status, latency in results if status == 200]
+    errors = len(results) - len(ok)
+    p50 = statistics.median(ok) * 1000 if ok else 0
+    p99 = sorted(ok)[int(len(ok) * 0.99) - 1] * 1000 if ok else 0
+    print(f'{url}\n  {len(ok) / elapsed:8.1f} req/s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  errors {errors}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('urls', nargs='+')
+    parser.add_argument('--token')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--slow-send', type=float, default=0)
+    args = parser.parse_args()
+    for url in args.urls:
+        asyncio.run(run(url, args.token, args.concurrency, args.requests, args.slow_send))
+
+
+if __name__ == '__main__':
+    main()
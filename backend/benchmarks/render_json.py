@@ -0,0 +1,84 @@
+"""
+Скорость рендеринга и разбора списка задач: JSONRenderer/JSONParser DRF (json) против ORJSONRenderer/ORJSONParser
+(Managment_System.renderers) и MessagePack, если установлен msgpack. Данные - в форме ответа TaskSerializer.
+
+    DJANGO_SETTINGS_MODULE=Managment_System.settings python benchmarks/render_json.py --tasks 10000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Managment_System.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.utils.serializer_helpers import ReturnList  # noqa: E402
+
+from Managment_System import renderers  # noqa: E402
+
+
+def task_payload(count):  # Как TaskSerializer(many=True).data: даты уже строки, doers - список id
+    created = datetime(2021, 11, 1, tzinfo=timezone.utc)
+    return ReturnList([{
+        'id': i,
+        'title': f'Задача {i}',
+        'content': 'Описание задачи, достаточно длинное, чтобы походить на настоящее. ' * 3,
+        'weight': i % 10,
+        'creation_date': (created + timedelta(minutes=i, microseconds=i)).isoformat().replace('+00:00', 'Z'),
+        'dead_line': (created + timedelta(days=30)).isoformat().replace('+00:00', 'Z'),
+        'is_done': i % 3 == 0,
+        'taskType': i % 7 + 1,
+        'project': 1,
+        'doers': [i % 50 + 1, i % 50 + 2],
+    } for i in range(count)], serializer=None)
+
+
+def measure(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    data = task_payload(args.tasks)
+    stdlib, fast = JSONRenderer(), renderers.ORJSONRenderer()
+    body = stdlib.render(data)
+    assert fast.render(data) == body, 'ORJSONRenderer output differs from JSONRenderer'
+    print(f'{args.tasks} tasks, {len(body) / 1024:.0f} KiB JSON, best of {args.repeat}')
+
+    rows = [
+        ('render  JSONRenderer', measure(lambda: stdlib.render(data), args.repeat)),
+        ('render  ORJSONRenderer', measure(lambda: fast.render(data), args.repeat)),
+        ('parse   JSONParser', measure(lambda: JSONParser().parse(io.BytesIO(body)), args.repeat)),
+        ('parse   ORJSONParser', measure(lambda: renderers.ORJSONParser().parse(io.BytesIO(body)), args.repeat)),
+    ]
+    if renderers.msgpack is not None:
+        packed = renderers.MessagePackRenderer().render(data)
+        rows += [
+            ('render  MessagePackRenderer', measure(lambda: renderers.MessagePackRenderer().render(data), args.repeat)),
+            ('parse   MessagePackParser',
+             measure(lambda: renderers.MessagePackParser().parse(io.BytesIO(packed)), args.repeat)),
+        ]
+    baseline = {'render': rows[0][1], 'parse': rows[2][1]}
+    for name, ms in rows:
+        print(f'  {name:30} {ms:8.2f} ms  x{baseline[name.split()[0]] / ms:.1f}')
+
+
+if __name__ == '__main__':
+    main()
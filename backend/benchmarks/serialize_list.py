@@ -0,0 +1,87 @@
+"""
+Сериализация списка задач: TaskSerializer(many=True) по экземплярам моделей против строк values()
+(projects.values). Задачи создаются в тестовой базе (create_test_db), время - процессорное, включая запросы.
+
+    DJANGO_SETTINGS_MODULE=Managment_System.settings python benchmarks/serialize_list.py --tasks 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Managment_System.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from projects import models, serializers, values  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+def create_tasks(count, employees=50):
+    manager = User.objects.create(username='manager', email='manager@email.com')
+    project = models.Project.objects.create(manager=manager, project_name='Benchmark')
+    position = models.Position.objects.create(title='pos', project=project)
+    task_types = [models.TaskType.objects.create(title=f'type{i}', project=project) for i in range(7)]
+    users = [User.objects.create(username=f'user{i}', email=f'user{i}@email.com') for i in range(employees)]
+    doers = [models.Employee.objects.create(user=user, position=position, project=project) for user in users]
+    content = 'Описание задачи, достаточно длинное, чтобы походить на настоящее. ' * 3
+    models.Task.objects.bulk_create([
+        models.Task(title=f'Задача {i}', content=content,
+                    weight=i % 10, dead_line='2021-12-01T00:00:00Z', is_done=i % 3 == 0,
+                    taskType=task_types[i % 7], project=project)
+        for i in range(count)
+    ], batch_size=1000)
+    models.Task.doers.through.objects.bulk_create([
+        models.Task.doers.through(task_id=task_id, employee_id=doers[(i + shift) % employees].id)
+        for i, task_id in enumerate(models.Task.objects.filter(project=project).values_list('id', flat=True))
+        for shift in range(2)
+    ], batch_size=1000)
+    return project
+
+
+def measure(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.process_time()
+        function()
+        best = min(best, time.process_time() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        project = create_tasks(args.tasks)
+        tasks = models.Task.objects.filter(project=project).order_by('-creation_date', '-id')
+        plan = values.get_plan(serializers.TaskSerializer)
+
+        def slow():
+            return serializers.TaskSerializer(tasks.prefetch_related('doers'), many=True).data
+
+        def fast():  # Как KeysetPagination: creation_date - позиция курсора, остается datetime
+            return plan.serialize(plan.queryset(tasks, keep=('creation_date',)))
+
+        assert JSONRenderer().render(fast()) == JSONRenderer().render(slow()), 'values() output differs'
+        print(f'{args.tasks} tasks, {connection.vendor}, CPU time, best of {args.repeat}')
+        baseline = measure(slow, args.repeat)
+        for name, ms in (('TaskSerializer(many=True)', baseline), ('projects.values', measure(fast, args.repeat))):
+            print(f'  {name:28} {ms:8.1f} ms  {ms * 1000 / args.tasks:6.1f} us/row  x{baseline / ms:.1f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
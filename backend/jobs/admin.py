@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'created', 'finished')
+    list_display_links = ('id', 'name')
+    list_filter = ('status', 'name')
+    search_fields = ('id', 'name', 'last_error')
+    readonly_fields = ('locked_by', 'locked_at', 'created', 'finished', 'last_error')
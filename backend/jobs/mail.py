@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+from .queue import enqueue, register
+
+SEND_EMAIL = 'send_email'
+
+
+def email_payload(message):
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': list(message.to),
+        'cc': list(message.cc),
+        'bcc': list(message.bcc),
+        'reply_to': list(message.reply_to),
+        'headers': dict(message.extra_headers),
+        'alternatives': [list(alternative) for alternative in getattr(message, 'alternatives', [])],
+        'content_subtype': message.content_subtype,
+    }
+
+
+def email_message(payload, connection=None):
+    message = EmailMultiAlternatives(
+        subject=payload['subject'], body=payload['body'], from_email=payload['from_email'], to=payload['to'],
+        cc=payload['cc'], bcc=payload['bcc'], reply_to=payload['reply_to'], headers=payload['headers'],
+        alternatives=[tuple(alternative) for alternative in payload['alternatives']], connection=connection,
+    )
+    message.content_subtype = payload['content_subtype']
+    return message
+
+
+def enqueue_email(message):  # Письмо целиком (без вложений) - в очередь, отправит run_jobs
+    return enqueue(SEND_EMAIL, email_payload(message), max_attempts=settings.JOBS_EMAIL_MAX_ATTEMPTS)
+
+
+@register(SEND_EMAIL, batch=True, private_payload=True)  # Тело письма со ссылками сброса пароля и активации
+def send_emails(payloads, heartbeat):
+    """Пачка писем через одно соединение EMAIL_BACKEND. Ошибка отправки одного письма не мешает остальным."""
+    errors = []
+    with get_connection(fail_silently=False) as connection:
+        for payload in payloads:
+            heartbeat()  # Пачка может отправляться дольше JOBS_LOCK_TIMEOUT
+            try:
+                email_message(payload, connection).send()
+                errors.append(None)
+            except Exception as error:
+                errors.append(error)
+    return errors
+
+
+class QueuedEmailMixin:
+    """
+    Для писем templated_mail/djoser: send() рендерит письмо в запросе (шаблону нужен request для домена),
+    а отправка по SMTP уходит в очередь. Отрендеренное письмо хранится в payload только до отправки.
+    """
+
+    def send(self, to, *args, **kwargs):
+        self.render()
+        self.to = to
+        self.cc = kwargs.pop('cc', [])
+        self.bcc = kwargs.pop('bcc', [])
+        self.reply_to = kwargs.pop('reply_to', [])
+        self.from_email = kwargs.pop('from_email', settings.DEFAULT_FROM_EMAIL)
+        return enqueue_email(self)
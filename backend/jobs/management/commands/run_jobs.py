@@ -0,0 +1,45 @@
+import os
+import signal
+import socket
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновых заданий (jobs.queue): выполняет задания из очереди, пока не получит SIGINT/SIGTERM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.JOBS_BATCH_SIZE)
+        parser.add_argument('--sleep', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задания и выйти')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f'Worker {worker} started')
+
+        total, last_purge = 0, 0
+        while not self.stopping:  # Текущая пачка всегда дорабатывается до конца
+            close_old_connections()
+            if time.monotonic() - last_purge > 3600:
+                queue.purge(settings.JOBS_KEEP_DAYS)
+                last_purge = time.monotonic()
+            count = queue.run_pending(worker, options['batch_size'])
+            total += count
+            if count < options['batch_size']:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} stopped, {total} jobs processed'))
+
+    def stop(self, signum, frame):
+        self.stopping = True
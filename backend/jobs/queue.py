@@ -0,0 +1,166 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# name -> (функция, batch). Функция batch=True получает список payload всей пачки заданий с этим именем
+# и heartbeat() - его надо вызывать между долгими шагами, чтобы release_stale не вернул пачку в очередь;
+# возвращает список ошибок (None - успешно) в том же порядке. Иначе функция получает один payload
+handlers = {}
+# Имена заданий, payload которых очищается, когда задание выполнено или упало (секреты не хранятся в jobs_job)
+private = set()
+
+
+def register(name, batch=False, private_payload=False):
+    def decorator(function):
+        handlers[name] = (function, batch)
+        if private_payload:
+            private.add(name)
+        return function
+    return decorator
+
+
+def enqueue(name, payload=None, delay=None, max_attempts=None):
+    """
+    Ставит задание в очередь. Запись идет в текущей транзакции: задание не появится у воркера,
+    если запрос, который его создал, откатится.
+    """
+    if name not in handlers:
+        raise ValueError(f'Unknown job {name}')
+    job = Job(name=name, payload=payload or {})
+    if delay:
+        job.run_at = timezone.now() + delay
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+def retry_delay(attempts):  # Экспоненциальная задержка перед повтором: JOBS_RETRY_DELAY * 2^(n-1)
+    return timedelta(seconds=min(settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_DELAY))
+
+
+def release_stale():
+    """Возвращает в очередь задания воркеров, которые не завершили их за JOBS_LOCK_TIMEOUT (воркер упал)."""
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    ).update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def claim(worker, limit):
+    """
+    Берет в работу до limit готовых заданий. На PostgreSQL/MySQL строки выбираются SELECT ... FOR UPDATE
+    SKIP LOCKED, так что воркеры не ждут друг друга; условие status в UPDATE не дает двум воркерам
+    взять одно задание и там, где SKIP LOCKED нет (SQLite).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(Job.objects.select_for_update(skip_locked=True).filter(status=Job.QUEUED, run_at__lte=now)
+                   .order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1
+        )
+    return list(Job.objects.filter(id__in=ids, status=Job.RUNNING, locked_by=worker).order_by('run_at', 'id'))
+
+
+def heartbeat(worker, jobs):
+    """
+    Продлевает locked_at взятых заданий, пока они выполняются, чтобы другой воркер не вернул их в очередь
+    через release_stale. Возвращает id заданий, которые все еще за этим воркером.
+    """
+    held = Job.objects.filter(id__in=[job.id for job in jobs], status=Job.RUNNING, locked_by=worker)
+    if held.update(locked_at=timezone.now()) == len(jobs):
+        return {job.id for job in jobs}
+    return set(held.values_list('id', flat=True))
+
+
+def _call(name, jobs, beat):  # Ошибки заданий пачки в том же порядке, None - успешно
+    function, batch = handlers.get(name, (None, False))
+    if function is None:
+        return [ValueError(f'Unknown job {name}')] * len(jobs)
+    if batch:
+        try:
+            return function([job.payload for job in jobs], beat)
+        except Exception as error:
+            return [error] * len(jobs)
+    errors = []
+    for job in jobs:
+        try:
+            function(job.payload)
+            errors.append(None)
+        except Exception as error:
+            errors.append(error)
+    return errors
+
+
+def _finish(job, error):
+    now = timezone.now()
+    job.locked_by, job.locked_at = '', None
+    if error is None:
+        job.status, job.finished, job.last_error = Job.DONE, now, ''
+        return
+    job.last_error = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+    if job.attempts >= job.max_attempts:
+        job.status, job.finished = Job.FAILED, now
+        logger.error('Job %s failed after %s attempts: %r', job, job.attempts, error)
+    else:
+        job.status, job.run_at = Job.QUEUED, now + retry_delay(job.attempts)
+        logger.warning('Job %s will be retried at %s: %r', job, job.run_at, error)
+
+
+def run(jobs):
+    """
+    Выполняет взятые задания, группируя по имени. Результаты каждой пачки (для batch=False - каждого задания)
+    записываются сразу после нее: если воркер упадет, release_stale вернет в очередь только невыполненные.
+    Перед записью (и тем самым перед следующей пачкой) блокировка всех взятых заданий продлевается;
+    задания, которые за это время ушли другому воркеру, не выполняются и не перезаписываются.
+    """
+    if not jobs:
+        return []
+    worker = jobs[0].locked_by
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.name, []).append(job)
+    finished = []
+    held = heartbeat(worker, jobs)
+    for name, group in groups.items():
+        batch = handlers.get(name, (None, False))[1]
+        fields = ['status', 'run_at', 'locked_by', 'locked_at', 'last_error', 'finished']
+        if name in private:
+            fields.append('payload')
+        for part in [group] if batch else [[job] for job in group]:
+            part = [job for job in part if job.id in held]
+            if not part:
+                continue
+            for job, error in zip(part, _call(name, part, lambda: heartbeat(worker, jobs))):
+                _finish(job, error)
+                if job.status != Job.QUEUED and name in private:
+                    job.payload = {}
+            held = heartbeat(worker, jobs)
+            part = [job for job in part if job.id in held]
+            Job.objects.bulk_update(part, fields)
+            finished.extend(part)
+    return finished
+
+
+def run_pending(worker, limit):  # Один проход воркера, возвращает число выполненных заданий
+    release_stale()
+    jobs = claim(worker, limit)
+    if jobs:
+        run(jobs)
+    return len(jobs)
+
+
+def purge(days):  # Удаляет выполненные и упавшие задания, завершенные больше days дней назад
+    finished = Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished__lt=timezone.now() - timedelta(days=days))
+    return finished.delete()[0]
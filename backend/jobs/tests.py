@@ -0,0 +1,207 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .mail import SEND_EMAIL, enqueue_email
+from .models import Job
+
+calls = []
+
+
+@queue.register('test_job')
+def test_job(payload):
+    calls.append(payload)
+    if payload.get('fail'):
+        raise RuntimeError('boom')
+    if payload.get('slow'):  # Задание выполнялось час
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+    if payload.get('release'):  # Проход другого воркера
+        calls.append(queue.release_stale())
+    if payload.get('crash'):  # Воркер остановлен посреди прохода
+        raise KeyboardInterrupt
+
+
+@queue.register('test_batch', batch=True)
+def test_batch(payloads, heartbeat):
+    for payload in payloads:
+        heartbeat()
+        calls.append(queue.release_stale())
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+    return [None] * len(payloads)
+
+
+class CountingBackend(locmem.EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any('fail@email.com' in message.to for message in messages):
+            raise ConnectionError('SMTP refused')
+        return super().send_messages(messages)
+
+
+@override_settings(JOBS_RETRY_DELAY=30, JOBS_RETRY_MAX_DELAY=100, JOBS_LOCK_TIMEOUT=600)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_unknown_job(self):
+        with self.assertRaises(ValueError):
+            queue.enqueue('missing')
+
+    def test_run(self):
+        job = queue.enqueue('test_job', {'value': 1})
+        self.assertEqual(queue.run_pending('worker', 10), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+        self.assertIsNotNone(job.finished)
+        self.assertEqual(calls, [{'value': 1}])
+        self.assertEqual(queue.run_pending('worker', 10), 0)
+
+    def test_delay(self):
+        queue.enqueue('test_job', delay=timedelta(minutes=5))
+        self.assertEqual(queue.run_pending('worker', 10), 0)
+
+    def test_retry_with_backoff(self):
+        job = queue.enqueue('test_job', {'fail': True}, max_attempts=3)
+        delays = []
+        for _ in range(3):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            before = timezone.now()
+            with self.assertLogs('jobs.queue', 'WARNING'):
+                queue.run_pending('worker', 10)
+            job.refresh_from_db()
+            delays.append(round((job.run_at - before).total_seconds() / 10) * 10)
+        self.assertEqual(delays[:2], [30, 60])
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertEqual(queue.retry_delay(5), timedelta(seconds=100))
+
+    def test_claimed_once(self):
+        jobs = [queue.enqueue('test_job', {'value': i}) for i in range(5)]
+        first = queue.claim('first', 3)
+        second = queue.claim('second', 10)
+        self.assertEqual([job.id for job in first], [job.id for job in jobs[:3]])
+        self.assertEqual([job.id for job in second], [job.id for job in jobs[3:]])
+        self.assertEqual(queue.claim('third', 10), [])
+
+    def test_release_stale(self):
+        job = queue.enqueue('test_job')
+        queue.claim('crashed', 10)
+        self.assertEqual(queue.release_stale(), 0)
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(queue.release_stale(), 1)
+        self.assertEqual(queue.run_pending('worker', 10), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 2))
+
+    def test_heartbeat(self):
+        jobs = [queue.enqueue('test_job', {'slow': True}), queue.enqueue('test_job', {'release': True})]
+        self.assertEqual(queue.run_pending('worker', 10), 2)
+        self.assertEqual(calls, [{'slow': True}, {'release': True}, 0])
+        for i in range(3):
+            jobs.append(queue.enqueue('test_batch', {'value': i}))
+        calls.clear()
+        self.assertEqual(queue.run_pending('worker', 10), 3)
+        self.assertEqual(calls, [0, 0, 0])
+        self.assertEqual({(job.status, job.attempts) for job in Job.objects.filter(id__in=[job.id for job in jobs])},
+                         {(Job.DONE, 1)})
+
+    def test_lost_jobs_not_overwritten(self):
+        # Воркер завис дольше JOBS_LOCK_TIMEOUT, и другой воркер вернул его задания в очередь
+        first = queue.enqueue('test_job', {'value': 1})
+        second = queue.enqueue('test_job', {'value': 2})
+        jobs = queue.claim('worker', 10)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        queue.release_stale()
+        self.assertEqual(queue.run(jobs), [])
+        self.assertEqual(calls, [])
+        self.assertEqual(set(Job.objects.filter(id__in=[first.id, second.id]).values_list('status', flat=True)),
+                         {Job.QUEUED})
+
+    def test_results_saved_per_job(self):
+        done = queue.enqueue('test_job', {'value': 1})
+        crashed = queue.enqueue('test_job', {'crash': True})
+        jobs = queue.claim('worker', 10)
+        with self.assertRaises(KeyboardInterrupt):
+            queue.run(jobs)
+        done.refresh_from_db()
+        self.assertEqual(done.status, Job.DONE)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(queue.release_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=crashed.pk).status, Job.QUEUED)
+
+    def test_purge(self):
+        job = queue.enqueue('test_job')
+        failed = queue.enqueue('test_job', {'fail': True}, max_attempts=1)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_pending('worker', 10)
+        self.assertEqual(queue.purge(7), 0)
+        Job.objects.filter(pk__in=[job.pk, failed.pk]).update(finished=timezone.now() - timedelta(days=8))
+        self.assertEqual(queue.purge(7), 2)
+
+    def test_command(self):
+        for i in range(3):
+            queue.enqueue('test_job', {'value': i})
+        out = StringIO()
+        call_command('run_jobs', '--once', '--batch-size', '2', stdout=out)
+        self.assertIn('3 jobs processed', out.getvalue())
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+
+class EmailJobTests(TestCase):
+
+    def message(self, to):
+        message = mail.EmailMultiAlternatives('Subject', 'Text', 'noreply@localhost', [to])
+        message.attach_alternative('<p>Text</p>', 'text/html')
+        return message
+
+    def test_enqueued_not_sent(self):
+        job = enqueue_email(self.message('user@email.com'))
+        self.assertEqual(job.name, SEND_EMAIL)
+        self.assertEqual(mail.outbox, [])
+        queue.run_pending('worker', 10)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@email.com'])
+        self.assertEqual(mail.outbox[0].alternatives, [('<p>Text</p>', 'text/html')])
+
+    @override_settings(EMAIL_BACKEND='jobs.tests.CountingBackend')
+    def test_batch_one_connection(self):
+        CountingBackend.opened = 0
+        for i in range(5):
+            enqueue_email(self.message(f'user{i}@email.com'))
+        failed = enqueue_email(self.message('fail@email.com'))
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            queue.run_pending('worker', 10)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, Job.QUEUED)
+        self.assertIn('SMTP refused', failed.last_error)
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 5)
+
+    @override_settings(EMAIL_BACKEND='jobs.tests.CountingBackend', JOBS_EMAIL_MAX_ATTEMPTS=2)
+    def test_payload_cleared(self):  # Тело письма не остается в jobs_job после отправки или последней попытки
+        sent = enqueue_email(self.message('user@email.com'))
+        failed = enqueue_email(self.message('fail@email.com'))
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            queue.run_pending('worker', 10)
+        sent.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual((sent.status, sent.payload), (Job.DONE, {}))
+        self.assertEqual(failed.payload['to'], ['fail@email.com'])  # Нужен для повтора
+        Job.objects.filter(pk=failed.pk).update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_pending('worker', 10)
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.payload), (Job.FAILED, {}))
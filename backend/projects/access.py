@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from rest_framework_simplejwt.tokens import Token as JSONWebToken
+
+from . import models
+from .cache import TTLCache
+
+MANAGER = 'manager'
+PARTICIPANT = 'participant'
+
+# (user_id, project_id) -> роль; сбрасывается сигналами при изменении Employee/Project (projects.signals)
+membership_cache = TTLCache(max_size=settings.PROJECT_ACCESS_CACHE_SIZE, ttl=settings.PROJECT_ACCESS_CACHE_TTL)
+_missing = object()
+
+
+def resolve_role(user, project_id):  # Роль пользователя в проекте одним запросом, None - нет доступа
+    row = models.Project.objects.filter(pk=project_id).annotate(
+        is_participant=Exists(models.Employee.objects.filter(project=OuterRef('pk'), user=user.pk))
+    ).values_list('manager_id', 'is_participant').first()
+    if row is None:
+        return None
+    manager_id, is_participant = row
+    if manager_id == user.pk:
+        return MANAGER
+    if is_participant:
+        return PARTICIPANT
+    return None
+
+
+def get_role(user, project_id):
+    key = (user.pk, int(project_id))
+    role = membership_cache.get(key, _missing)
+    if role is _missing:
+        role = resolve_role(user, project_id)
+        membership_cache.set(key, role)
+    return role
+
+
+def forget_member(user_id, project_id):
+    membership_cache.delete((user_id, project_id))
+
+
+def forget_project(project_id):
+    membership_cache.delete_where(lambda key: key[1] == project_id)
+
+
+def project_roles(user):
+    """
+    Роли пользователя во всех его проектах {'<project_id>': роль} для claims JWT (users.jwt)
+    или None, если проектов больше JWT_ROLE_CLAIMS_LIMIT.
+    """
+    limit = settings.JWT_ROLE_CLAIMS_LIMIT
+    managed = models.Project.objects.filter(manager=user.pk).values_list('id', flat=True)[:limit + 1]
+    joined = models.Employee.objects.filter(user=user.pk).values_list('project_id', flat=True)[:limit + 1]
+    roles = {str(project_id): PARTICIPANT for project_id in joined}
+    roles.update({str(project_id): MANAGER for project_id in managed})
+    return roles if len(roles) <= limit else None
+
+
+def fresh_claims(token):  # JWT с claims из users.jwt, выданными не раньше JWT_CLAIMS_TTL секунд назад
+    return (settings.JWT_STATELESS_USER and isinstance(token, JSONWebToken)
+            and token.get('claims_at', 0) + settings.JWT_CLAIMS_TTL >= time.time())
+
+
+def get_request_role(request, project_id):  # Роль из свежих claims JWT, иначе get_role
+    if fresh_claims(request.auth) and 'project_roles' in request.auth:
+        return request.auth['project_roles'].get(str(project_id))
+    return get_role(request.user, project_id)
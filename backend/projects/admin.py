@@ -13,7 +13,7 @@ class TaskAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'content', 'weight', 'taskType', 'creation_date', 'dead_line', 'is_done', 'project',
                     'get_doers')
     list_display_links = ('id', 'title')
-    search_fields = ('id', 'title', 'project')
+    search_fields = ('id', 'title', 'content', 'project__project_name')
     list_editable = ('is_done',)
     list_filter = ('taskType', 'is_done')
     fieldsets = (
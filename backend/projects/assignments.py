@@ -0,0 +1,83 @@
+from django.db import IntegrityError, transaction
+
+from . import counters
+from . import models
+from . import stats
+
+ADDED = 'added'
+REMOVED = 'removed'
+UNCHANGED = 'unchanged'
+FORBIDDEN = 'forbidden'
+INVALID_TASK = 'invalid_task'
+INVALID_DOER = 'invalid_doer'
+
+
+class DoersConflict(Exception):
+    """Параллельный запрос уже добавил часть пар: ничего не записано, pairs - [{'task', 'doer'}] этих пар."""
+
+    def __init__(self, pairs):
+        super().__init__('Doers changed by a concurrent request')
+        self.pairs = pairs
+
+
+def change_doers(project, chief, task_ids, doer_ids, remove=False):
+    """
+    Назначает (или снимает при remove=True) исполнителей doer_ids на задачи task_ids проекта.
+    chief - Employee, от имени которого идет назначение: ему доступны только его подчиненные.
+    chief=None - менеджер проекта, доступны все сотрудники.
+    Возвращает список {'task', 'doer', 'result'} по всем парам.
+    """
+    tasks = {task_id: counters.open_weight(is_done, weight) for task_id, is_done, weight
+             in models.Task.objects.filter(project=project, id__in=task_ids).values_list('id', 'is_done', 'weight')}
+    employees = models.Employee.objects.filter(project=project, id__in=doer_ids).only('id', 'path')
+    allowed = {employee.id for employee in employees if chief is None or employee.is_subordinate_of(chief)}
+    known = {employee.id for employee in employees}
+
+    through = models.Task.doers.through
+    existing = set(through.objects.filter(task_id__in=tasks, employee_id__in=allowed)
+                   .values_list('task_id', 'employee_id'))
+
+    results, changed = [], []
+    for task_id in dict.fromkeys(task_ids):
+        for doer_id in dict.fromkeys(doer_ids):
+            if task_id not in tasks:
+                result = INVALID_TASK
+            elif doer_id not in known:
+                result = INVALID_DOER
+            elif doer_id not in allowed:
+                result = FORBIDDEN
+            elif ((task_id, doer_id) in existing) == remove:
+                result = REMOVED if remove else ADDED
+                changed.append((task_id, doer_id))
+            else:
+                result = UNCHANGED
+            results.append({'task': task_id, 'doer': doer_id, 'result': result})
+
+    if changed:
+        try:
+            write_doers(project, changed, tasks, remove=remove)
+        except IntegrityError:  # Те же пары добавил параллельный запрос
+            added = set(through.objects.filter(task_id__in={task for task, _ in changed},
+                                               employee_id__in={doer for _, doer in changed})
+                        .values_list('task_id', 'employee_id'))
+            raise DoersConflict([{'task': task, 'doer': doer} for task, doer in changed if (task, doer) in added])
+    return results
+
+
+def write_doers(project, pairs, tasks, remove=False):
+    """
+    Одной пачкой добавляет (удаляет) строки Task.doers.through для пар (task_id, doer_id).
+    tasks - {task_id: открытая сложность задачи} для счетчиков исполнителей. Пары заранее проверены вызывающим.
+    """
+    through = models.Task.doers.through
+    with transaction.atomic():
+        if remove:
+            through.objects.filter(task_id__in={task for task, _ in pairs},
+                                   employee_id__in={doer for _, doer in pairs}).delete()
+        else:
+            through.objects.bulk_create([through(task_id=task, employee_id=doer) for task, doer in pairs])
+        weights = {}
+        for task, doer in pairs:
+            weights[doer] = weights.get(doer, 0) + (-tasks[task] if remove else tasks[task])
+        counters.change_employees(weights)
+    stats.forget_stats(project.id)
@@ -0,0 +1,48 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from . import views
+
+# Async варианты GET-вьюх для ASGI (uvicorn).
+# В Django 3.2 ORM только синхронный, а sync-вьюхи под ASGI выполняются по очереди в одном общем потоке
+# (thread_sensitive). Здесь вся работа с БД и DRF (аутентификация, permissions, пагинация, рендер) уходит
+# в пул потоков одним переходом, а ожидание и отправка ответа медленным клиентам остаются в event loop.
+# Размер пула - переменная окружения ASGI_THREADS.
+
+
+def database_sync_to_async(func):
+    # Как channels.db.database_sync_to_async: соединения с БД в потоке пула закрываются, как в конце запроса
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+def as_async_view(view_class):
+    """Async вьюха только для чтения поверх APIView: ответ и коды ошибок те же, что у sync версии."""
+    sync_view = view_class.as_view(http_method_names=['get', 'head', 'options'])
+
+    def render(request, *args, **kwargs):
+        response = sync_view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    run = database_sync_to_async(render)
+
+    async def view(request, *args, **kwargs):
+        return await run(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    view.view_class = view_class
+    return view
+
+
+project_detail = as_async_view(views.ProjectView)
+task_list = as_async_view(views.TaskListView)
+employee_list = as_async_view(views.EmployeeListView)
+position_list = as_async_view(views.PositionListView)
+task_type_list = as_async_view(views.TaskTypeListView)
@@ -0,0 +1,118 @@
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from . import counters
+from . import models
+from . import stats
+
+MAX_BATCH_SIZE = 1000
+
+
+class TaskConflict(Exception):
+    """Вставка не прошла ограничения БД: данные поменял параллельный запрос. errors - как у create_tasks."""
+
+    def __init__(self, errors):
+        super().__init__('Tasks conflict with a concurrent change')
+        self.errors = errors
+
+
+class TaskBulkItemSerializer(serializers.ModelSerializer):
+    # taskType и doers проверяются сразу для всей пачки в create_tasks, а не отдельным запросом на элемент
+    taskType = serializers.IntegerField()
+    doers = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    class Meta:
+        model = models.Task
+        fields = ('title', 'content', 'weight', 'taskType', 'dead_line', 'is_done', 'doers')
+        extra_kwargs = {'content': {'required': True}, 'dead_line': {'required': True}}
+
+
+def insert_tasks(tasks, doers):
+    """
+    bulk_create задач и одной пачкой строк Task.doers.through.
+    doers - списки id исполнителей в том же порядке, что и tasks.
+    """
+    models.Task.objects.bulk_create(tasks)
+    if any(task.pk is None for task in tasks):  # БД не вернула id (sqlite), title уникален в проекте
+        ids = dict(models.Task.objects.filter(project=tasks[0].project_id, title__in=[task.title for task in tasks])
+                   .values_list('title', 'id'))
+        for task in tasks:
+            task.pk = ids[task.title]
+    through = models.Task.doers.through
+    through.objects.bulk_create(
+        [through(task_id=task.pk, employee_id=doer_id) for task, doer_ids in zip(tasks, doers) for doer_id in doer_ids]
+    )
+    counters.tasks_inserted(tasks, doers)  # bulk_create не отправляет сигналы
+    stats.forget_stats(tasks[0].project_id)
+    return tasks
+
+
+def create_tasks(project, items):
+    """
+    Создает задачи из списка словарей. Невалидные элементы пропускаются.
+    Возвращает (созданные задачи, [{'index': i, 'errors': {...}}]).
+    Если после проверки параллельный запрос занял title или удалил тип/исполнителя, ничего не создается
+    и поднимается TaskConflict с этими элементами.
+    """
+    errors = {}
+    valid = {}
+    for index, item in enumerate(items):
+        serializer = TaskBulkItemSerializer(data=item)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            errors[index] = serializer.errors
+
+    task_type_ids = {data['taskType'] for data in valid.values()}
+    doer_ids = {doer for data in valid.values() for doer in data['doers']}
+    titles = [data['title'] for data in valid.values()]
+    task_types = set(models.TaskType.objects.filter(project=project, id__in=task_type_ids).values_list('id', flat=True))
+    employees = set(models.Employee.objects.filter(project=project, id__in=doer_ids).values_list('id', flat=True))
+    existing = set(models.Task.objects.filter(project=project, title__in=titles).values_list('title', flat=True))
+
+    tasks, doers, indexes = [], [], []
+    for index, data in valid.items():
+        item_errors = {}
+        if data['taskType'] not in task_types:
+            item_errors['taskType'] = ['Invalid task type']
+        if any(doer not in employees for doer in data['doers']):
+            item_errors['doers'] = ['Invalid employee']
+        if data['title'] in existing:
+            item_errors['title'] = ['Task with this title already exists']
+        if item_errors:
+            errors[index] = item_errors
+            continue
+        existing.add(data['title'])
+        doers.append(sorted(set(data.pop('doers'))))
+        data['taskType_id'] = data.pop('taskType')
+        tasks.append(models.Task(project=project, **data))
+        indexes.append(index)
+
+    if tasks:
+        try:
+            with transaction.atomic():
+                insert_tasks(tasks, doers)
+        except IntegrityError:
+            raise TaskConflict(conflicts(project, tasks, doers, indexes))
+    return tasks, [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+
+
+def conflicts(project, tasks, doers, indexes):  # Элементы пачки, которые теперь не проходят проверки create_tasks
+    task_types = set(models.TaskType.objects.filter(project=project, id__in={task.taskType_id for task in tasks})
+                     .values_list('id', flat=True))
+    employees = set(models.Employee.objects.filter(project=project, id__in={doer for ids in doers for doer in ids})
+                    .values_list('id', flat=True))
+    existing = set(models.Task.objects.filter(project=project, title__in=[task.title for task in tasks])
+                   .values_list('title', flat=True))
+    errors = []
+    for index, task, doer_ids in zip(indexes, tasks, doers):
+        item_errors = {}
+        if task.taskType_id not in task_types:
+            item_errors['taskType'] = ['Invalid task type']
+        if any(doer not in employees for doer in doer_ids):
+            item_errors['doers'] = ['Invalid employee']
+        if task.title in existing:
+            item_errors['title'] = ['Task with this title already exists']
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+    return errors
@@ -0,0 +1,88 @@
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from . import models
+
+# Денормализованные счетчики: Project.open_count/done_count/total_weight и Employee.assigned_open_weight.
+# Меняются только приращениями F(...) + delta, поэтому параллельные запросы не затирают изменения друг друга.
+# Вызываются из projects.signals и массовых операций (bulk, assignments), которые сигналы не отправляют.
+# Расхождения исправляет manage.py reconcile_counters.
+
+
+def open_weight(is_done, weight):
+    return 0 if is_done else weight
+
+
+def change_projects(deltas):  # {project_id: (open, done, weight)}
+    for project_id, (open_, done, weight) in deltas.items():
+        if open_ or done or weight:
+            models.Project.objects.filter(pk=project_id).update(
+                open_count=F('open_count') + open_, done_count=F('done_count') + done,
+                total_weight=F('total_weight') + weight,
+            )
+
+
+def change_employees(deltas):  # {employee_id: изменение assigned_open_weight}, одним UPDATE
+    deltas = {employee_id: delta for employee_id, delta in deltas.items() if delta}
+    if deltas:
+        models.Employee.objects.filter(pk__in=deltas).update(assigned_open_weight=F('assigned_open_weight') + Case(
+            *[When(pk=employee_id, then=Value(delta)) for employee_id, delta in deltas.items()],
+            output_field=IntegerField(),
+        ))
+
+
+def change_task_doers(task_id, delta, employee_ids=None):  # Всем (или employee_ids) исполнителям задачи
+    if delta:
+        doers = models.Task.doers.through.objects.filter(task=task_id)
+        if employee_ids is not None:
+            doers = doers.filter(employee__in=employee_ids)
+        models.Employee.objects.filter(pk__in=doers.values('employee')).update(
+            assigned_open_weight=F('assigned_open_weight') + delta
+        )
+
+
+def task_changed(task_id, old, new):
+    """
+    old, new - (project_id, is_done, weight) до и после изменения, None - задачи не было (нет).
+    Исполнители созданной задачи учитываются при добавлении в doers, удаляемой - до удаления связей.
+    """
+    projects = {}
+    for state, sign in ((old, -1), (new, 1)):
+        if state is not None:
+            project_id, is_done, weight = state
+            open_, done, total = projects.get(project_id, (0, 0, 0))
+            projects[project_id] = (open_ + sign * (not is_done), done + sign * bool(is_done), total + sign * weight)
+    change_projects(projects)
+    if old is not None:
+        change_task_doers(task_id, open_weight(*new[1:]) - open_weight(*old[1:]) if new else -open_weight(*old[1:]))
+
+
+def tasks_inserted(tasks, doers):  # Пачка задач из bulk.insert_tasks; doers - id исполнителей каждой задачи
+    projects, employees = {}, {}
+    for task, doer_ids in zip(tasks, doers):
+        open_, done, total = projects.get(task.project_id, (0, 0, 0))
+        projects[task.project_id] = (open_ + (not task.is_done), done + bool(task.is_done), total + task.weight)
+        for doer_id in doer_ids:
+            employees[doer_id] = employees.get(doer_id, 0) + open_weight(task.is_done, task.weight)
+    change_projects(projects)
+    change_employees(employees)
+
+
+def project_drift():
+    """Проекты, у которых счетчики не совпадают с задачами; actual_* - правильные значения."""
+    tasks = models.Task.objects.filter(project=OuterRef('pk')).order_by().values('project')
+    return models.Project.objects.annotate(
+        actual_open=Coalesce(Subquery(tasks.filter(is_done=False).annotate(value=Count('pk')).values('value')), 0),
+        actual_done=Coalesce(Subquery(tasks.filter(is_done=True).annotate(value=Count('pk')).values('value')), 0),
+        actual_weight=Coalesce(Subquery(tasks.annotate(value=Sum('weight')).values('value')), 0),
+    ).exclude(
+        Q(open_count=F('actual_open')) & Q(done_count=F('actual_done')) & Q(total_weight=F('actual_weight'))
+    ).only('id', 'open_count', 'done_count', 'total_weight').order_by('id')
+
+
+def employee_drift():
+    """Сотрудники, у которых assigned_open_weight не совпадает с задачами; actual_weight - правильное значение."""
+    weights = models.Task.doers.through.objects.filter(employee=OuterRef('pk'), task__is_done=False).order_by() \
+        .values('employee').annotate(value=Sum('task__weight')).values('value')
+    return models.Employee.objects.annotate(actual_weight=Coalesce(Subquery(weights), 0)) \
+        .exclude(assigned_open_weight=F('actual_weight')).only('id', 'assigned_open_weight').order_by('id')
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import models
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def buckets(now):  # Непересекающиеся интервалы dead_line: (название, от, до), None - без границы
+    return (
+        ('overdue', None, now),
+        ('day', now, now + timedelta(days=1)),
+        ('week', now + timedelta(days=1), now + timedelta(days=7)),
+    )
+
+
+def _range(start, end):
+    condition = Q()
+    if start is not None:
+        condition &= Q(dead_line__gte=start)
+    if end is not None:
+        condition &= Q(dead_line__lt=end)
+    return condition
+
+
+def user_project_ids(user):  # Проекты, где пользователь менеджер или сотрудник
+    return list(models.Project.objects.filter(Q(manager=user.pk) | Q(employees__user=user.pk))
+                .order_by().values_list('id', flat=True).distinct())
+
+
+def deadline_buckets(user, limit=DEFAULT_LIMIT):
+    """
+    Открытые задачи всех проектов пользователя по срокам: просроченные, в ближайшие сутки, в ближайшую неделю.
+    Все запросы идут по частичному индексу task_open_deadline_idx (project, dead_line) WHERE NOT is_done.
+    Возвращает {'now', bucket: {'count', 'tasks': queryset первых limit задач по dead_line}}.
+    """
+    now = timezone.now()
+    result = {'now': now}
+    tasks = models.Task.objects.filter(project__in=user_project_ids(user), is_done=False).order_by()
+    intervals = buckets(now)
+    counts = tasks.filter(dead_line__lt=intervals[-1][2]).aggregate(
+        **{name: Count('id', filter=_range(start, end)) for name, start, end in intervals}
+    )
+    for name, start, end in intervals:
+        result[name] = {
+            'count': counts[name],
+            'tasks': (tasks.filter(_range(start, end)) if counts[name] else tasks.none())
+            .order_by('dead_line', 'id').prefetch_related('doers')[:limit],
+        }
+    return result
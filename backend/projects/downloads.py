@@ -0,0 +1,117 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+# Отдача TaskFile после проверки доступа. SENDFILE_BACKEND:
+#   'x-accel-redirect' - байты отдает nginx из internal location SENDFILE_URL, указывающей на MEDIA_ROOT;
+#   'x-sendfile'       - Apache mod_xsendfile / lighttpd по абсолютному пути (как и URL - в %-кодировке);
+#   None               - FileResponse из Django с поддержкой Range. Файл целиком под gunicorn уходит через
+#                        os.sendfile (wsgi.file_wrapper), диапазон - чтением по BLOCK_SIZE.
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class RangeFile:
+    # Часть файла от start длиной length. Без fileno(): sendfile gunicorn 20 отдает файл с начала,
+    # а не с текущей позиции
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Заголовок Range -> (start, end) включительно или None - отдать файл целиком.
+    Несколько диапазонов не поддерживаются (отдается весь файл, это допускает RFC 7233).
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:  # bytes=-N - последние N байт
+        if not int(end):
+            raise RangeNotSatisfiable
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def content_disposition(filename, as_attachment):
+    try:
+        filename.encode('ascii')
+        file_expr = 'filename="{}"'.format(filename)
+    except UnicodeEncodeError:
+        file_expr = "filename*=utf-8''{}".format(quote(filename))
+    return '{}; {}'.format('attachment' if as_attachment else 'inline', file_expr)
+
+
+def offloaded_response(name, path, filename, as_attachment):
+    response = HttpResponse()
+    if settings.SENDFILE_BACKEND == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(settings.SENDFILE_URL + name)
+    else:
+        response['X-Sendfile'] = quote(path)  # mod_xsendfile и lighttpd декодируют %XX, иначе Django кодирует MIME
+    response['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response['Content-Disposition'] = content_disposition(filename, as_attachment)
+    return response
+
+
+def file_response(task_file, request, as_attachment=False):
+    name = task_file.file.name
+    path = task_file.file.path
+    filename = os.path.basename(name)
+    if settings.SENDFILE_BACKEND:
+        return offloaded_response(name, path, filename, as_attachment)
+
+    stat = os.stat(path)
+    last_modified = http_date(stat.st_mtime)
+    header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if if_range and parse_http_date_safe(if_range) != int(stat.st_mtime):
+        header = None  # файл изменился с момента, когда клиент получил первую часть
+    try:
+        byte_range = parse_range(header, stat.st_size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, as_attachment=as_attachment, filename=filename)
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFile(file, start, end - start + 1), status=206, as_attachment=as_attachment,
+                                filename=filename)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response.block_size = BLOCK_SIZE
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = last_modified
+    return response
@@ -0,0 +1,70 @@
+import csv
+import json
+
+from rest_framework import serializers
+
+from . import models
+
+CHUNK_SIZE = 2000
+FORMATS = ('ndjson', 'csv')
+FIELDS = ('id', 'title', 'content', 'weight', 'taskType', 'creation_date', 'dead_line', 'is_done', 'doers')
+_datetime = serializers.DateTimeField()
+
+
+def iter_tasks(project, chunk_size=None):
+    """
+    Задачи проекта словарями: taskType - название типа, doers - список username исполнителей.
+    Читает по chunk_size задач по возрастанию id (keyset), исполнители подгружаются одним запросом на пачку.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    task_types = dict(models.TaskType.objects.filter(project=project).values_list('id', 'title'))
+    through = models.Task.doers.through
+    last_id = 0
+    while True:
+        rows = list(models.Task.objects.filter(project=project, id__gt=last_id).order_by('id')
+                    .values_list('id', 'title', 'content', 'weight', 'taskType', 'creation_date', 'dead_line',
+                                 'is_done')[:chunk_size])
+        if not rows:
+            return
+        doers = {}
+        # username - через JOIN в том же запросе: исполнитель может быть из другого проекта или добавлен во время выгрузки
+        for task_id, username in (through.objects.filter(task__in=[row[0] for row in rows])
+                                  .order_by('employee_id').values_list('task_id', 'employee__user__username')):
+            doers.setdefault(task_id, []).append(username)
+        for task_id, title, content, weight, task_type, creation_date, dead_line, is_done in rows:
+            yield {
+                'id': task_id,
+                'title': title,
+                'content': content,
+                'weight': weight,
+                'taskType': task_types.get(task_type),
+                'creation_date': _datetime.to_representation(creation_date),
+                'dead_line': _datetime.to_representation(dead_line),
+                'is_done': is_done,
+                'doers': doers.get(task_id, []),
+            }
+        last_id = rows[-1][0]
+
+
+def ndjson_lines(tasks):
+    for task in tasks:
+        yield json.dumps(task, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    # csv.writer пишет строку в "файл" и возвращает то, что вернул write
+    def write(self, value):
+        return value
+
+
+def csv_lines(tasks):  # doers - username через запятую
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for task in tasks:
+        task['doers'] = ','.join(task['doers'])
+        yield writer.writerow([task[field] for field in FIELDS])
+
+
+def export_tasks(project, fmt, chunk_size=None):
+    lines = ndjson_lines if fmt == 'ndjson' else csv_lines
+    return lines(iter_tasks(project, chunk_size))
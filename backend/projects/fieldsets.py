@@ -0,0 +1,39 @@
+from rest_framework.exceptions import ValidationError
+
+# ?fields=id,title,is_done - в ответе и в SELECT (.only()) только эти поля.
+# ?expand=taskType,doers - связанные объекты вложенными сериализаторами (serializer_class.expandable) вместо id,
+# каждая связь - одним prefetch-запросом. Поле из expand попадает в ответ, даже если его нет в fields.
+
+
+def _names(params, name, allowed):
+    names = [value for value in params[name].split(',') if value]
+    unknown = [value for value in names if value not in allowed]
+    if unknown:
+        raise ValidationError({name: f'Unknown fields: {", ".join(unknown)}'})
+    if not names:
+        raise ValidationError({name: 'Expected comma separated field names'})
+    return tuple(value for value in allowed if value in names)  # В порядке полей сериализатора
+
+
+def fieldset(params, serializer_class):
+    """Аргументы serializer_class (fields, expand) из ?fields= и ?expand=."""
+    kwargs = {}
+    if 'fields' in params:
+        kwargs['fields'] = _names(params, 'fields', tuple(serializer_class().fields))
+    if 'expand' in params:
+        kwargs['expand'] = _names(params, 'expand', tuple(serializer_class.expandable))
+    return kwargs
+
+
+def select(queryset, serializer_class, fields=None, expand=(), keep=()):
+    """
+    .only() по полям ответа и prefetch_related для ManyToMany и expand.
+    keep - поля, которые читает пагинация (ordering), они загружаются всегда.
+    """
+    meta = queryset.model._meta
+    names = [name for name in serializer_class().fields if fields is None or name in fields or name in expand]
+    many = [name for name in names if meta.get_field(name).many_to_many]
+    if fields is not None:
+        keep = [name.lstrip('-') for name in keep]
+        queryset = queryset.only(meta.pk.name, *keep, *(name for name in names if name not in many))
+    return queryset.prefetch_related(*many, *(name for name in expand if name not in many))
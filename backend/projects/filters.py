@@ -0,0 +1,55 @@
+from django.db.models import Exists, OuterRef
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from . import models
+
+TASK_ORDERING_FIELDS = ('dead_line', 'creation_date', 'weight', 'title', 'id')
+_boolean = serializers.BooleanField()
+_datetime = serializers.DateTimeField()
+
+
+def _ids(params, name):
+    try:
+        return [int(value) for value in params[name].split(',') if value]
+    except ValueError:
+        raise ValidationError({name: 'Expected comma separated ids'})
+
+
+def _parse(field, params, name):
+    try:
+        return field.to_internal_value(params[name])
+    except ValidationError as error:
+        raise ValidationError({name: error.detail})
+
+
+def filter_tasks(queryset, params):
+    """
+    ?is_done=true|false, ?taskType=1,2, ?dead_line_after=..., ?dead_line_before=..., ?doers=3,4
+    Фильтры сочетаются с индексами Task (project, is_done, dead_line) и (project, taskType).
+    """
+    if 'is_done' in params:
+        # is_done=False компилируется в NOT is_done, по которому sqlite не использует индекс; IN (...) - использует
+        queryset = queryset.filter(is_done__in=[_parse(_boolean, params, 'is_done')])
+    if 'taskType' in params:
+        queryset = queryset.filter(taskType__in=_ids(params, 'taskType'))
+    if 'dead_line_after' in params:
+        queryset = queryset.filter(dead_line__gte=_parse(_datetime, params, 'dead_line_after'))
+    if 'dead_line_before' in params:
+        queryset = queryset.filter(dead_line__lt=_parse(_datetime, params, 'dead_line_before'))
+    if 'doers' in params:
+        doers = models.Task.doers.through.objects.filter(task=OuterRef('pk'), employee__in=_ids(params, 'doers'))
+        queryset = queryset.filter(Exists(doers))
+    return queryset
+
+
+def task_ordering(params, default):  # ?ordering=dead_line или -weight; id - второй ключ курсора (KeysetPagination)
+    if 'ordering' not in params:
+        return default
+    ordering = params['ordering']
+    field = ordering.lstrip('-')
+    if field not in TASK_ORDERING_FIELDS or len(ordering) - len(field) > 1:
+        raise ValidationError({'ordering': f'Expected one of {", ".join(TASK_ORDERING_FIELDS)}'})
+    if field == 'id':
+        return (ordering,)
+    return ordering, '-id' if ordering.startswith('-') else 'id'
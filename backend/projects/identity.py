@@ -0,0 +1,49 @@
+from django.core.exceptions import ValidationError
+from django.http import Http404
+
+from . import models
+
+
+class IdentityMap:
+    # Объекты, загруженные за время одного запроса. Вьюхи, сериализаторы и permissions берут их отсюда,
+    # чтобы один и тот же Project/Employee/TaskType/Position не читался из БД несколько раз
+
+    def __init__(self):
+        self._objects = {}
+        self._employees = {}
+
+    def add(self, obj):
+        self._objects[(type(obj), obj.pk)] = obj
+        return obj
+
+    def get(self, model, pk):
+        try:
+            pk = model._meta.pk.to_python(pk)
+        except ValidationError:
+            raise model.DoesNotExist(f'{model._meta.object_name} with pk={pk!r} does not exist.')
+        key = (model, pk)
+        if key not in self._objects:
+            self._objects[key] = model._default_manager.get(pk=pk)
+        return self._objects[key]
+
+    def get_or_404(self, model, pk):
+        try:
+            return self.get(model, pk)
+        except model.DoesNotExist:
+            raise Http404
+
+    def employee(self, user, project):  # Employee пользователя в проекте или None
+        key = (user.pk, project.pk)
+        if key not in self._employees:
+            employee = models.Employee.objects.filter(user=user.pk, project=project.pk).first()
+            if employee is not None:
+                self.add(employee)
+            self._employees[key] = employee
+        return self._employees[key]
+
+
+def get_identity_map(request):
+    request = getattr(request, '_request', request)  # rest_framework Request -> HttpRequest
+    if not hasattr(request, 'identity_map'):
+        request.identity_map = IdentityMap()
+    return request.identity_map
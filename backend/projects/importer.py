@@ -0,0 +1,135 @@
+import codecs
+import csv
+import json
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import models
+from .bulk import insert_tasks
+
+CHUNK_SIZE = 1000
+MAX_ERRORS = 100
+FORMATS = ('ndjson', 'csv')
+
+
+class ImportFileError(Exception):
+    """Файл не дочитан (не utf-8, битый csv); result - счетчики импорта, уже сохраненные пачки остаются в базе."""
+
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.message = message
+        self.result = result
+
+
+class TaskImportItemSerializer(serializers.ModelSerializer):
+    # Формат строки экспорта (projects.export): taskType - название типа, doers - username исполнителей
+    taskType = serializers.CharField()
+    doers = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+
+    class Meta:
+        model = models.Task
+        fields = ('title', 'content', 'weight', 'taskType', 'dead_line', 'is_done', 'doers')
+        extra_kwargs = {'content': {'required': True}, 'dead_line': {'required': True}}
+
+
+def _ndjson_rows(lines):
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def _csv_rows(lines):  # doers - username через запятую
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # line_num - последняя прочитанная строка файла; поле в кавычках может занимать несколько строк
+        number = reader.line_num - sum(value.count('\n') for value in row.values() if isinstance(value, str))
+        row['doers'] = [username for username in (row.get('doers') or '').split(',') if username]
+        yield number, row
+
+
+def read_rows(file, fmt):
+    """Построчно читает бинарный файл (в т.ч. UploadedFile) формата ndjson или csv: (номер строки в файле, строка)."""
+    lines = codecs.iterdecode(file, 'utf-8-sig')
+    return _ndjson_rows(lines) if fmt == 'ndjson' else _csv_rows(lines)
+
+
+class TaskImporter:
+    """
+    Импорт задач в проект пачками по chunk_size: на каждую пачку один bulk_create задач и один - исполнителей,
+    каждая пачка в своей транзакции. Типы задач, исполнители и занятые названия читаются один раз на импорт.
+    progress(processed, created, failed) вызывается после каждой пачки.
+    """
+
+    def __init__(self, project, chunk_size=None, progress=None):
+        self.project = project
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.progress = progress
+        self.processed = self.created = self.failed = 0
+        self.errors = []
+
+    def run(self, rows):
+        self.task_types = dict(models.TaskType.objects.filter(project=self.project).values_list('title', 'id'))
+        self.employees = dict(models.Employee.objects.filter(project=self.project).values_list('user__username', 'id'))
+        self.titles = set(models.Task.objects.filter(project=self.project).values_list('title', flat=True))
+        tasks, doers = [], []
+        for line, row in rows:
+            self.processed += 1
+            task = self.build(line, row)
+            if task is not None:
+                tasks.append(task[0])
+                doers.append(task[1])
+            if len(tasks) >= self.chunk_size:
+                self.flush(tasks, doers)
+                tasks, doers = [], []
+        self.flush(tasks, doers)
+        return self.result()
+
+    def result(self):
+        return {'processed': self.processed, 'created': self.created, 'failed': self.failed, 'errors': self.errors}
+
+    def build(self, line, row):  # (Task, [id исполнителей]) или None, если строка с ошибкой
+        errors = {}
+        serializer = TaskImportItemSerializer(data=row) if isinstance(row, dict) else None
+        if serializer is None:
+            errors['non_field_errors'] = ['Invalid row']
+        elif not serializer.is_valid():
+            errors = serializer.errors
+        else:
+            data = serializer.validated_data
+            if data['taskType'] not in self.task_types:
+                errors['taskType'] = ['Invalid task type']
+            if any(username not in self.employees for username in data['doers']):
+                errors['doers'] = ['Invalid employee']
+            if data['title'] in self.titles:
+                errors['title'] = ['Task with this title already exists']
+        if errors:
+            self.failed += 1
+            if len(self.errors) < MAX_ERRORS:
+                self.errors.append({'line': line, 'errors': errors})
+            return None
+        self.titles.add(data['title'])
+        doers = sorted({self.employees[username] for username in data.pop('doers')})
+        data['taskType_id'] = self.task_types[data.pop('taskType')]
+        return models.Task(project=self.project, **data), doers
+
+    def flush(self, tasks, doers):
+        if tasks:
+            with transaction.atomic():
+                insert_tasks(tasks, doers)
+            self.created += len(tasks)
+        if self.progress is not None:
+            self.progress(self.processed, self.created, self.failed)
+
+
+def import_tasks(project, file, fmt, chunk_size=None, progress=None):
+    task_importer = TaskImporter(project, chunk_size, progress)
+    try:
+        return task_importer.run(read_rows(file, fmt))
+    except UnicodeDecodeError:
+        raise ImportFileError('File must be utf-8', task_importer.result())
+    except csv.Error as error:
+        raise ImportFileError(f'Invalid csv: {error}', task_importer.result())
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from projects import uploads
+
+
+class Command(BaseCommand):
+    help = 'Удаляет незавершенные загрузки файлов задач без новых частей дольше TASK_UPLOAD_EXPIRE_HOURS'
+
+    def handle(self, *args, **options):
+        count = 0
+        for upload in uploads.expired_uploads().iterator():
+            uploads.cancel(upload)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {count} uploads older than {settings.TASK_UPLOAD_EXPIRE_HOURS} hours'
+        ))
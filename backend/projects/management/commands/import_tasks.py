@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects import importer, models
+
+
+class Command(BaseCommand):
+    help = 'Импорт задач в проект из файла csv или ndjson (формат экспорта projects/<pk>/task/export/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=importer.FORMATS, help='По умолчанию - по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            project = models.Project.objects.get(pk=options['project_id'])
+        except models.Project.DoesNotExist:
+            raise CommandError(f'Project {options["project_id"]} does not exist')
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if fmt not in importer.FORMATS:
+            raise CommandError('Unknown format, use --format')
+
+        def progress(processed, created, failed):
+            self.stdout.write(f'{processed} processed, {created} created, {failed} failed')
+
+        with open(options['path'], 'rb') as file:
+            try:
+                result = importer.import_tasks(project, file, fmt, options['chunk_size'], progress)
+            except importer.ImportFileError as error:
+                raise CommandError(f'{error.message}; {error.result["created"]} tasks already imported')
+        for error in result['errors']:
+            self.stderr.write(f'line {error["line"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(f'Imported {result["created"]} of {result["processed"]} tasks'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from projects import counters, models
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики Project и Employee (projects.counters) по задачам и выводит расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только вывести расхождения')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        projects = list(counters.project_drift())
+        for project in projects:
+            self.stdout.write(
+                f'project {project.id}: open_count {project.open_count} -> {project.actual_open}, '
+                f'done_count {project.done_count} -> {project.actual_done}, '
+                f'total_weight {project.total_weight} -> {project.actual_weight}'
+            )
+            project.open_count, project.done_count = project.actual_open, project.actual_done
+            project.total_weight = project.actual_weight
+        employees = list(counters.employee_drift())
+        for employee in employees:
+            self.stdout.write(f'employee {employee.id}: assigned_open_weight '
+                              f'{employee.assigned_open_weight} -> {employee.actual_weight}')
+            employee.assigned_open_weight = employee.actual_weight
+
+        if not options['dry_run']:
+            models.Project.objects.bulk_update(projects, models.Project.counter_fields,
+                                               batch_size=options['batch_size'])
+            models.Employee.objects.bulk_update(employees, models.Employee.counter_fields,
+                                                batch_size=options['batch_size'])
+        action = 'found' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Drift {action}: {len(projects)} projects, {len(employees)} employees'
+        ))
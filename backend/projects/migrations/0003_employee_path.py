@@ -0,0 +1,64 @@
+# Generated by Django 3.2.8 on 2026-10-18 11:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    Employee = apps.get_model('projects', 'Employee')
+    chiefs = dict(Employee.objects.values_list('id', 'chief_id'))
+    paths = {}
+
+    def build(pk, seen=()):
+        if pk not in paths:
+            chief = chiefs[pk]
+            paths[pk] = f"{build(chief, seen + (pk,)) if chief and chief not in seen else ''}{pk}/"
+        return paths[pk]
+
+    employees = list(Employee.objects.only('id'))
+    for employee in employees:
+        employee.path = build(employee.id)
+    Employee.objects.bulk_update(employees, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1000, verbose_name='Путь в иерархии'),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='color',
+            field=models.CharField(default='#000000', max_length=7, verbose_name='Цвет'),
+        ),
+        migrations.AddField(
+            model_name='tasktype',
+            name='color',
+            field=models.CharField(default='#000000', max_length=7, verbose_name='Цвет'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='employee',
+            unique_together={('user', 'project')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='position',
+            unique_together={('title', 'project')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='task',
+            unique_together={('title', 'project')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='tasktype',
+            unique_together={('title', 'project')},
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+# PostgreSQL: генерируемая колонка search_vector + GIN индекс.
+# SQLite (локальная разработка и тесты): FTS5 таблица с внешним содержимым, синхронизируется триггерами.
+# Django не знает об этих объектах; на SQLite пересоздание projects_task (_remake_table) удалит триггеры.
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE projects_task ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX task_search_vector_idx ON projects_task USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "ALTER TABLE projects_task DROP COLUMN search_vector",
+]
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE projects_task_fts USING fts5(
+        title, content, content='projects_task', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER projects_task_fts_insert AFTER INSERT ON projects_task BEGIN
+        INSERT INTO projects_task_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER projects_task_fts_delete AFTER DELETE ON projects_task BEGIN
+        INSERT INTO projects_task_fts(projects_task_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER projects_task_fts_update AFTER UPDATE OF title, content ON projects_task BEGIN
+        INSERT INTO projects_task_fts(projects_task_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO projects_task_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO projects_task_fts(projects_task_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER projects_task_fts_insert",
+    "DROP TRIGGER projects_task_fts_delete",
+    "DROP TRIGGER projects_task_fts_update",
+    "DROP TABLE projects_task_fts",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_task_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.8 on 2026-10-18 12:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    Employee = apps.get_model('projects', 'Employee')
+    Task = apps.get_model('projects', 'Task')
+    tasks = Task.objects.filter(project=OuterRef('pk')).order_by().values('project')
+    Project.objects.update(
+        open_count=Coalesce(Subquery(tasks.filter(is_done=False).annotate(value=Count('pk')).values('value')), 0),
+        done_count=Coalesce(Subquery(tasks.filter(is_done=True).annotate(value=Count('pk')).values('value')), 0),
+        total_weight=Coalesce(Subquery(tasks.annotate(value=Sum('weight')).values('value')), 0),
+    )
+    weights = Task.doers.through.objects.filter(employee=OuterRef('pk'), task__is_done=False).order_by() \
+        .values('employee').annotate(value=Sum('task__weight')).values('value')
+    Employee.objects.update(assigned_open_weight=Coalesce(Subquery(weights), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_task_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='assigned_open_weight',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Сложность открытых задач'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='done_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Выполненных задач'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='open_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Открытых задач'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='total_weight',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Суммарная сложность'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
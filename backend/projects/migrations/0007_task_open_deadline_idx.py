@@ -0,0 +1,18 @@
+# Generated by Django 3.2.8 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(is_done=False), fields=['project', 'dead_line'],
+                               name='task_open_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.8 on 2026-10-18 12:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0007_task_open_deadline_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskFileUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('path', models.CharField(max_length=255, verbose_name='Путь в хранилище')),
+                ('size', models.BigIntegerField(verbose_name='Размер')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Загружено')),
+                ('sha256', models.CharField(blank=True, default='', max_length=64, verbose_name='Контрольная сумма SHA-256')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Начало загрузки')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Последняя часть')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='projects.task', verbose_name='Задача')),
+                ('task_file', models.OneToOneField(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='projects.taskfile', verbose_name='Файл задачи')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Загрузка файла задачи',
+                'verbose_name_plural': 'Загрузки файлов задач',
+                'ordering': ['task', 'id'],
+            },
+        ),
+    ]
@@ -1,4 +1,21 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Concat, Substr
+
+
+class CountersModel(models.Model):
+    # Счетчики (counter_fields) меняются только атомарными UPDATE из projects.counters,
+    # поэтому save() загруженного ранее объекта их не перезаписывает
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
 
 
 class TaskType(models.Model):
@@ -30,6 +47,34 @@ class TaskFile(models.Model):
         ordering = ['task']
 
 
+class TaskFileUpload(models.Model):
+    # Загрузка файла задачи по частям (projects.uploads): данные пишутся сразу в файл path в хранилище,
+    # offset - сколько байт уже записано. По завершении создается TaskFile с этим файлом
+    task = models.ForeignKey('Task', on_delete=models.CASCADE, verbose_name='Задача', related_name='uploads')
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, verbose_name='Пользователь')
+    filename = models.CharField(max_length=255, verbose_name='Имя файла')
+    path = models.CharField(max_length=255, verbose_name='Путь в хранилище')
+    size = models.BigIntegerField(verbose_name='Размер')
+    offset = models.BigIntegerField(default=0, verbose_name='Загружено')
+    sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name='Контрольная сумма SHA-256')
+    task_file = models.OneToOneField('TaskFile', on_delete=models.SET_NULL, null=True, blank=True, default=None,
+                                     verbose_name='Файл задачи')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Начало загрузки')
+    updated = models.DateTimeField(auto_now=True, verbose_name='Последняя часть')
+
+    def __str__(self):
+        return f"{self.filename} {self.offset}/{self.size}"
+
+    @property
+    def is_complete(self):
+        return self.offset == self.size
+
+    class Meta:
+        verbose_name = 'Загрузка файла задачи'
+        verbose_name_plural = 'Загрузки файлов задач'
+        ordering = ['task', 'id']
+
+
 class Task(models.Model):
     title = models.CharField(max_length=100, verbose_name='Название')
     content = models.TextField(verbose_name='Описание задания', default=None)
@@ -47,11 +92,27 @@ class Task(models.Model):
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        task = super().from_db(db, field_names, values)
+        # Состояние на момент загрузки, от него projects.counters считает изменения счетчиков при save()
+        if not task.get_deferred_fields() & {'project_id', 'is_done', 'weight'}:
+            task.counted = (task.project_id, task.is_done, task.weight)
+        return task
+
     class Meta:
         unique_together = ('title', 'project',)
         verbose_name = 'Задача'
         verbose_name_plural = 'Задачи'
         ordering = ['project', '-creation_date']
+        indexes = [
+            models.Index(fields=['project', '-creation_date'], name='task_project_created_idx'),
+            models.Index(fields=['project', 'is_done', 'dead_line'], name='task_project_done_deadline_idx'),
+            models.Index(fields=['project', 'taskType', '-creation_date'], name='task_project_type_idx'),
+            # Только открытые задачи: индекс не растет с историей выполненных (projects.deadlines)
+            models.Index(fields=['project', 'dead_line'], name='task_open_deadline_idx',
+                         condition=models.Q(is_done=False)),
+        ]
 
     def get_doers(self):
         return "\n".join([str(t.user) for t in self.doers.all()])
@@ -73,7 +134,20 @@ class Position(models.Model):
         ordering = ['project', 'title']
 
 
-class Employee(models.Model):  # Employee сильно связанный с проектом. Создается в момент добавления юзера в проект
+class EmployeeQuerySet(models.QuerySet):
+
+    def subordinates_of(self, employee):  # Всё поддерево подчиненных, один запрос по индексу path
+        if not employee.path:
+            return self.none()
+        return self.filter(path__startswith=employee.path).exclude(pk=employee.pk)
+
+    def move_subtree(self, old_path, new_path):  # Переписывает префикс path у узла и всех его подчиненных
+        return self.filter(path__startswith=old_path).update(
+            path=Concat(models.Value(new_path), Substr('path', len(old_path) + 1), output_field=models.CharField())
+        )
+
+
+class Employee(CountersModel):  # Employee сильно связанный с проектом. Создается в момент добавления юзера в проект
     user = models.ForeignKey('users.User', on_delete=models.CASCADE, verbose_name='Пользователь')
     chief = models.ForeignKey(
         'self', on_delete=models.SET_DEFAULT, blank=True, default=None, verbose_name='Начальник', null=True
@@ -81,10 +155,48 @@ class Employee(models.Model):  # Employee сильно связанный с п
     position = models.ForeignKey('Position', on_delete=models.PROTECT, blank=True, verbose_name='Роль')
     project = models.ForeignKey('Project', default=None, on_delete=models.CASCADE, blank=False, verbose_name='Проект',
                                 related_name='employees')
+    # Материализованный путь по chief: id всех начальников от корня и свой id, например '3/8/15/'
+    path = models.CharField(max_length=1000, db_index=True, blank=True, default='', editable=False,
+                            verbose_name='Путь в иерархии')
+    # Суммарная сложность незавершенных задач сотрудника (projects.counters)
+    assigned_open_weight = models.IntegerField(default=0, editable=False, verbose_name='Сложность открытых задач')
+
+    counter_fields = ('assigned_open_weight',)
+
+    objects = EmployeeQuerySet.as_manager()
 
     def __str__(self):
         return str(self.user.first_name + ' ' + self.user.last_name)
 
+    def is_subordinate_of(self, employee):
+        return bool(employee.path) and self.pk != employee.pk and self.path.startswith(employee.path)
+
+    def save(self, *args, **kwargs):
+        # path меняется только UPDATE по путям из БД: path загруженного ранее объекта может быть устаревшим
+        if self._state.adding:
+            self.path = ''
+        elif not args and not kwargs.get('force_insert'):
+            fields = kwargs.get('update_fields')
+            if fields is None:
+                fields = [field.name for field in self._meta.concrete_fields
+                          if not field.primary_key and field.name not in self.counter_fields]
+            kwargs['update_fields'] = [name for name in fields if name != 'path']
+        with transaction.atomic():
+            # Строки сотрудника и начальника заблокированы, пока их поддеревья не переписаны
+            paths = dict(Employee.objects.select_for_update().filter(pk__in=[self.pk, self.chief_id])
+                         .values_list('pk', 'path'))
+            old_path = paths.get(self.pk, '')
+            chief_path = paths.get(self.chief_id, '')
+            if old_path and chief_path.startswith(old_path):
+                raise ValueError('Начальник не может быть подчиненным сотрудника')
+            super().save(*args, **kwargs)
+            self.path = f'{chief_path}{self.pk}/'
+            if old_path != self.path:
+                if old_path:
+                    Employee.objects.move_subtree(old_path, self.path)
+                else:
+                    Employee.objects.filter(pk=self.pk).update(path=self.path)
+
     class Meta:
         unique_together = ('user', 'project',)
         verbose_name = 'Сотрудник'
@@ -92,9 +204,15 @@ class Employee(models.Model):  # Employee сильно связанный с п
         ordering = ['project', 'id']
 
 
-class Project(models.Model):
+class Project(CountersModel):
     project_name = models.CharField(max_length=100, verbose_name='Наименование')
     manager = models.ForeignKey('users.User', on_delete=models.PROTECT, related_name='manager', verbose_name='Менеджер проекта')
+    # Счетчики задач проекта (projects.counters)
+    open_count = models.IntegerField(default=0, editable=False, verbose_name='Открытых задач')
+    done_count = models.IntegerField(default=0, editable=False, verbose_name='Выполненных задач')
+    total_weight = models.IntegerField(default=0, editable=False, verbose_name='Суммарная сложность')
+
+    counter_fields = ('open_count', 'done_count', 'total_weight')
 
     def __str__(self):
         return self.project_name
@@ -0,0 +1,130 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination, _reverse_ordering
+
+from . import values
+
+
+class KeysetPagination(CursorPagination):
+    # Позиция курсора - значения всех полей ordering, последнее из которых уникально (id), поэтому
+    # страница выбирается условием (a > x) OR (a = x AND id > y) без OFFSET и при любом числе равных a.
+    # CursorPagination берет только первое поле и сдвигает равные значения OFFSET, который ограничен
+    # offset_cutoff. project (одинаковый внутри проекта) в ordering не входит
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):  # CursorPagination.paginate_queryset с keyset
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self.after(current_position, reverse))
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+        following_position = self._get_position_from_instance(results[-1], self.ordering) \
+            if has_following_position else None
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position, self.previous_position = following_position, current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def after(self, position, reverse=False):
+        """Условие на строки после position в порядке ordering (в обратном при reverse)."""
+        condition, equal = Q(), {}
+        for name, value in zip(self.ordering, position):
+            field = name.lstrip('-')
+            lookup = '__lt' if name.startswith('-') != reverse else '__gt'
+            condition |= Q(**equal, **{field + lookup: value})
+            equal[field] = value
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        names = [name.lstrip('-') for name in ordering]
+        if isinstance(instance, dict):
+            return tuple(str(instance[name]) for name in names)
+        return tuple(str(getattr(instance, name)) for name in names)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering) \
+                or not all(isinstance(value, str) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=tuple(position))
+
+    def encode_cursor(self, cursor):
+        if cursor.position is not None:
+            cursor = cursor._replace(position=json.dumps(cursor.position, ensure_ascii=False))
+        return super().encode_cursor(cursor)
+
+    def paginate(self, queryset, request, view, serializer_class, **kwargs):  # kwargs - для serializer_class
+        plan = values.get_plan(serializer_class, **kwargs)
+        if plan is None:
+            page = self.paginate_queryset(queryset, request, view=view)
+            return self.get_paginated_response(serializer_class(page, many=True, **kwargs).data)
+        # Строки values() не изменяются: по полям ordering в них get_paginated_response строит ссылки
+        position = (self.ordering,) if isinstance(self.ordering, str) else self.ordering
+        page = self.paginate_queryset(plan.queryset(queryset, keep=position), request, view=view)
+        return self.get_paginated_response(plan.serialize(page))
+
+
+class ProjectPagination(KeysetPagination):
+    ordering = ('project_name', 'id')
+
+
+class TaskPagination(KeysetPagination):
+    ordering = ('-creation_date', '-id')
+
+
+class EmployeePagination(KeysetPagination):
+    ordering = ('id',)
+
+
+class PositionPagination(KeysetPagination):
+    ordering = ('title', 'id')
+
+
+class TaskTypePagination(KeysetPagination):
+    ordering = ('title', 'id')
+
+
+class SearchPagination(LimitOffsetPagination):
+    # Результаты поиска упорядочены по rank, у которого нет уникального ключа для курсора
+    default_limit = 20
+    max_limit = 100
+
+    def paginate(self, queryset, request, view, serializer_class, **kwargs):
+        plan = values.get_plan(serializer_class, **kwargs)
+        if plan is None:
+            page = self.paginate_queryset(queryset, request, view=view)
+            return self.get_paginated_response(serializer_class(page, many=True, **kwargs).data)
+        page = self.paginate_queryset(plan.queryset(queryset), request, view=view)
+        return self.get_paginated_response(plan.serialize(page))
@@ -1,5 +1,7 @@
 from rest_framework.permissions import BasePermission
+from . import access
 from . import models
+from .identity import get_identity_map
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -13,7 +15,7 @@ class IsParticipantOfProject(BasePermission):
         return False
 
     def has_object_permission(self, request, view, obj):
-        if models.Employee.objects.filter(user=request.user, project=obj).exists() and request.method == 'GET':
+        if request.method == 'GET' and get_identity_map(request).employee(request.user, obj):
             return True
         return False
 
@@ -26,7 +28,23 @@ class IsManagerOfProject(BasePermission):
         return False
 
     def has_object_permission(self, request, view, obj):
-        if obj.manager == request.user:
+        if obj.manager_id == request.user.pk:
+            return True
+        return False
+
+
+class IsParticipantOrManagerOfProject(BasePermission):
+    # Участник - только чтение, менеджер - всё. Роль участника - из claims JWT или access.get_role (запрос или кэш)
+
+    def has_permission(self, request, view):
+        if request.user.is_authenticated:
+            return True
+        return False
+
+    def has_object_permission(self, request, view, obj):
+        if obj.manager_id == request.user.pk:
+            return True
+        if request.method == 'GET' and access.get_request_role(request, obj.pk) == access.PARTICIPANT:
             return True
         return False
 
@@ -40,15 +58,11 @@ class IsChiefOfEmployee(BasePermission):
 
     def has_object_permission(self, request, view, obj1, obj2):  # obj1 - проект, obj2 - работники
 
-        if obj1.manager == request.user:
+        if obj1.manager_id == request.user.pk:
+            return True
+        employee = get_identity_map(request).employee(request.user, obj1)
+        if employee and obj2.is_subordinate_of(employee):
             return True
-        if models.Employee.objects.filter(user=request.user, project=obj1).exists():
-            chief = obj2.chief
-            while chief:
-                if chief == models.Employee.objects.get(user=request.user, project=obj1):
-                    return True
-                chief = chief.chief
-                return False
         return False
 
 
@@ -0,0 +1,82 @@
+import heapq
+
+from django.db import transaction
+
+from . import assignments
+from . import models
+
+MAX_TASKS = 10000
+
+
+def candidates(project, chief=None, position_ids=None):
+    """
+    Сотрудники, на которых можно назначать задачи: {employee_id: текущая открытая сложность}.
+    chief - Employee, от имени которого идет назначение (только его подчиненные), None - менеджер проекта.
+    position_ids - только сотрудники с этими ролями.
+    """
+    employees = models.Employee.objects.filter(project=project) if chief is None \
+        else models.Employee.objects.subordinates_of(chief)
+    if position_ids:
+        employees = employees.filter(position__in=position_ids)
+    return dict(employees.order_by().values_list('id', 'assigned_open_weight'))
+
+
+def unassigned_tasks(project, task_ids=None, lock=False):
+    """
+    {task_id: weight} открытых задач без исполнителей, не больше MAX_TASKS по возрастанию id.
+    lock=True (внутри транзакции) - строки задач блокируются, а задачи, которым исполнителей назначил
+    параллельный запрос, пока строки ждали блокировки, отбрасываются.
+    """
+    tasks = models.Task.objects.filter(project=project, is_done=False, doers__isnull=True)
+    if task_ids is not None:
+        tasks = tasks.filter(id__in=task_ids)
+    tasks = tasks.order_by('id')
+    if lock:
+        tasks = tasks.select_for_update(of=('self',))
+    tasks = dict(tasks.values_list('id', 'weight')[:MAX_TASKS])
+    if lock:
+        for task_id in set(models.Task.doers.through.objects.filter(task_id__in=list(tasks))
+                           .values_list('task_id', flat=True)):
+            del tasks[task_id]
+    return tasks
+
+
+def balance(tasks, loads):
+    """
+    Жадное распределение LPT: задачи по убыванию сложности, каждая - наименее загруженному сотруднику
+    (куча по загрузке). O(T log T + T log E).
+    tasks - {task_id: weight}, loads - {employee_id: текущая загрузка}.
+    Возвращает ([(task_id, employee_id)], итоговые загрузки).
+    """
+    heap = [(load, employee_id) for employee_id, load in loads.items()]
+    heapq.heapify(heap)
+    pairs = []
+    for task_id in sorted(tasks, key=lambda task_id: (-tasks[task_id], task_id)):
+        load, employee_id = heap[0]
+        heapq.heapreplace(heap, (load + tasks[task_id], employee_id))
+        pairs.append((task_id, employee_id))
+    return pairs, {employee_id: load for load, employee_id in heap}
+
+
+def recommend(project, chief=None, task_ids=None, position_ids=None, apply=False):
+    """
+    Предлагает исполнителей для открытых задач без исполнителей (всех в проекте, не больше MAX_TASKS, или из task_ids),
+    выравнивая открытую сложность сотрудников. apply=True - сразу записывает назначения одной пачкой.
+    Возвращает {'assignments': [...], 'loads': {...}, 'skipped': [...], 'applied': bool} или None,
+    если назначать некого.
+    """
+    loads = candidates(project, chief, position_ids)
+    if not loads:
+        return None
+    with transaction.atomic():
+        tasks = unassigned_tasks(project, task_ids, lock=apply)
+        pairs, loads = balance(tasks, loads)
+        if apply and pairs:
+            assignments.write_doers(project, pairs, tasks)
+    return {
+        'assignments': [{'task': task_id, 'doer': employee_id, 'weight': tasks[task_id]}
+                        for task_id, employee_id in pairs],
+        'loads': loads,
+        'skipped': [task_id for task_id in dict.fromkeys(task_ids or ()) if task_id not in tasks],
+        'applied': apply and bool(pairs),
+    }
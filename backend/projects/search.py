@@ -0,0 +1,41 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Полнотекстовый поиск по Task.title и Task.content (индексы создает миграция 0005_task_search).
+# rank - чем больше, тем релевантнее; совпадения в title весят больше, чем в content.
+
+
+def _postgresql(queryset, query):
+    tsquery = "websearch_to_tsquery('russian', %s)"
+    return queryset.filter(
+        RawSQL(f'projects_task.search_vector @@ {tsquery}', (query,), output_field=BooleanField())
+    ).annotate(
+        rank=RawSQL(f'ts_rank(projects_task.search_vector, {tsquery})', (query,), output_field=FloatField())
+    )
+
+
+def _sqlite(queryset, query):
+    words = re.findall(r'\w+', query)
+    if not words:
+        return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+    match = ' '.join('"{}"*'.format(word) for word in words)  # все слова, каждое как префикс
+    return queryset.filter(
+        id__in=RawSQL('SELECT rowid FROM projects_task_fts WHERE projects_task_fts MATCH %s', (match,))
+    ).annotate(
+        rank=RawSQL('SELECT -bm25(projects_task_fts, 10.0, 1.0) FROM projects_task_fts '
+                    'WHERE projects_task_fts MATCH %s AND rowid = projects_task.id', (match,), output_field=FloatField())
+    )
+
+
+def _fallback(queryset, query):
+    return queryset.filter(Q(title__icontains=query) | Q(content__icontains=query)).annotate(
+        rank=Value(0.0, output_field=FloatField())
+    )
+
+
+def search_tasks(queryset, query):
+    search = {'postgresql': _postgresql, 'sqlite': _sqlite}.get(connection.vendor, _fallback)
+    return search(queryset, query).order_by('-rank', '-id')
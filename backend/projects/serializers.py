@@ -1,11 +1,45 @@
+import os
+
 from rest_framework import serializers
 from . import models
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
+from django.core.exceptions import ObjectDoesNotExist
+from django.urls import reverse
+from .identity import get_identity_map
 
 User = get_user_model()
 
 
+class IdentityMapRelatedField(serializers.PrimaryKeyRelatedField):
+    # Связанные объекты берутся из identity map запроса, если сериализатору передан request в context
+
+    def to_internal_value(self, data):
+        request = self.context.get('request')
+        if request is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return get_identity_map(request).get(self.get_queryset().model, data)
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class FieldsetMixin:
+    # fields - оставить только эти поля, expand - заменить связи вложенными сериализаторами из expandable
+    # (projects.fieldsets, ?fields= и ?expand=)
+    expandable = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = self.expandable[name]()
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - set(expand):
+                self.fields.pop(name)
+
+
 class ManagerSerializer(serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
@@ -18,6 +52,8 @@ class ManagerSerializer(serializers.ModelSerializer):
 
 
 class TaskTypeSerializer(serializers.ModelSerializer):
+    serializer_related_field = IdentityMapRelatedField
+
     class Meta:
         model = models.TaskType
         fields = "__all__"
@@ -37,7 +73,12 @@ class TaskFileSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(FieldsetMixin, serializers.ModelSerializer):
+    serializer_related_field = IdentityMapRelatedField
+    expandable = {
+        'taskType': lambda: TaskTypeSerializer(read_only=True),
+        'doers': lambda: EmployeeSerializer(many=True, read_only=True),
+    }
 
     class Meta:
         model = models.Task
@@ -66,6 +107,8 @@ class TaskSerializer(serializers.ModelSerializer):
 
 
 class PositionSerializer(serializers.ModelSerializer):
+    serializer_related_field = IdentityMapRelatedField
+
     class Meta:
         model = models.Position
         fields = "__all__"
@@ -79,10 +122,23 @@ class PositionSerializer(serializers.ModelSerializer):
         return position
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(FieldsetMixin, serializers.ModelSerializer):
+    serializer_related_field = IdentityMapRelatedField
+    expandable = {
+        'user': lambda: ManagerSerializer(read_only=True),
+        'position': lambda: PositionSerializer(read_only=True),
+    }
+
     class Meta:
         model = models.Employee
-        fields = "__all__"
+        # path и assigned_open_weight - служебные поля (иерархия и projects.counters), в API не выдаются
+        exclude = ("path", "assigned_open_weight")
+
+    def validate(self, attrs):
+        chief = attrs.get('chief')
+        if chief and self.instance and (chief == self.instance or chief.is_subordinate_of(self.instance)):
+            raise serializers.ValidationError({'chief': 'Начальник не может быть подчиненным сотрудника'})
+        return attrs
 
     def create(self, validated_data):
         employee = models.Employee.objects.create(
@@ -94,6 +150,51 @@ class EmployeeSerializer(serializers.ModelSerializer):
         return employee
 
 
+class DoersBatchSerializer(serializers.Serializer):
+    task_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    doer_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+
+
+class RecommendSerializer(serializers.Serializer):
+    task_ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=10000)
+    position_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    apply = serializers.BooleanField(default=False)
+
+
+class TaskFileDownloadSerializer(serializers.ModelSerializer):
+    name = serializers.SerializerMethodField()
+    size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.TaskFile
+        fields = ('id', 'task', 'name', 'size')
+
+    def get_name(self, task_file):
+        return os.path.basename(task_file.file.name)
+
+    def get_size(self, task_file):
+        try:
+            return task_file.file.size
+        except OSError:
+            return None
+
+
+class TaskFileUploadSerializer(serializers.ModelSerializer):
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, default='')
+    file = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.TaskFileUpload
+        fields = ('id', 'task', 'filename', 'size', 'offset', 'sha256', 'task_file', 'file', 'created', 'updated')
+        read_only_fields = ('task', 'offset', 'task_file', 'created', 'updated')
+        extra_kwargs = {'size': {'min_value': 0}}
+
+    def get_file(self, upload):  # Ссылка на скачивание (projects.downloads)
+        if upload.task_file_id is None:
+            return None
+        return reverse('project_task_file', args=[upload.task.project_id, upload.task_id, upload.task_file_id])
+
+
 class ProjectSerializer(serializers.ModelSerializer):
     manager = ManagerSerializer(read_only=True)
 
@@ -102,7 +203,10 @@ class ProjectSerializer(serializers.ModelSerializer):
         fields = (
             "id",
             "project_name",
-            "manager"
+            "manager",
+            "open_count",
+            "done_count",
+            "total_weight",
         )
 
     def create(self, validated_data):
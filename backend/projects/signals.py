@@ -0,0 +1,85 @@
+from django.db.models import Sum
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import access
+from . import counters
+from . import stats
+from . import models
+
+
+@receiver(post_delete, sender=models.Employee)
+def detach_subordinates(sender, instance, **kwargs):
+    # chief подчиненных уже сброшен в None (SET_DEFAULT), их поддеревья становятся корнями
+    if instance.path:
+        models.Employee.objects.move_subtree(instance.path, '')
+
+
+@receiver(post_save, sender=models.Employee)
+@receiver(post_delete, sender=models.Employee)
+def forget_employee_access(sender, instance, **kwargs):
+    access.forget_member(instance.user_id, instance.project_id)
+
+
+@receiver(post_save, sender=models.Project)
+@receiver(post_delete, sender=models.Project)
+def forget_project_access(sender, instance, **kwargs):
+    access.forget_project(instance.pk)
+
+
+@receiver(post_save, sender=models.Task)
+@receiver(post_delete, sender=models.Task)
+@receiver(post_save, sender=models.TaskType)
+@receiver(post_delete, sender=models.TaskType)
+@receiver(post_delete, sender=models.Employee)
+def forget_project_stats(sender, instance, **kwargs):
+    stats.forget_stats(instance.project_id)
+
+
+@receiver(m2m_changed, sender=models.Task.doers.through)
+def forget_doers_stats(sender, instance, action, reverse, **kwargs):
+    if action.startswith('post_'):
+        stats.forget_stats(instance.project_id)
+
+
+@receiver(pre_save, sender=models.Task)
+def remember_task_counted(sender, instance, **kwargs):
+    # Задача не из БД (или загружена без нужных полей) - состояние до сохранения читается отдельно
+    if not instance._state.adding and not hasattr(instance, 'counted'):
+        instance.counted = models.Task.objects.filter(pk=instance.pk) \
+            .values_list('project_id', 'is_done', 'weight').first()
+
+
+@receiver(post_save, sender=models.Task)
+def count_saved_task(sender, instance, created, **kwargs):
+    state = (instance.project_id, instance.is_done, instance.weight)
+    counters.task_changed(instance.pk, None if created else instance.counted, state)
+    instance.counted = state
+
+
+@receiver(pre_delete, sender=models.Task)
+def count_deleted_task(sender, instance, **kwargs):  # pre_delete: связи с исполнителями еще не удалены
+    counters.task_changed(instance.pk, (instance.project_id, instance.is_done, instance.weight), None)
+
+
+@receiver(m2m_changed, sender=models.Task.doers.through)
+def count_doers(sender, instance, action, reverse, pk_set, **kwargs):
+    # pre_remove/pre_clear - пока связи есть; в pk_set remove могут быть и несвязанные id
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    if not reverse:  # instance - задача, pk_set - сотрудники
+        weight = counters.open_weight(instance.is_done, instance.weight)
+        if action == 'post_add':
+            counters.change_employees({employee_id: weight for employee_id in pk_set})
+        else:
+            counters.change_task_doers(instance.pk, -weight, pk_set if action == 'pre_remove' else None)
+        return
+    tasks = models.Task.objects.filter(is_done=False)  # instance - сотрудник, pk_set - задачи
+    if action == 'post_add':
+        tasks = tasks.filter(pk__in=pk_set)
+    else:
+        tasks = tasks.filter(doers=instance)
+        if action == 'pre_remove':
+            tasks = tasks.filter(pk__in=pk_set)
+    weight = tasks.aggregate(weight=Sum('weight'))['weight'] or 0
+    counters.change_employees({instance.pk: weight if action == 'post_add' else -weight})
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import models
+from .cache import TTLCache
+
+# project_id -> статистика; сбрасывается сигналами (projects.signals) и массовыми операциями (bulk, assignments)
+stats_cache = TTLCache(max_size=settings.PROJECT_STATS_CACHE_SIZE, ttl=settings.PROJECT_STATS_CACHE_TTL)
+_COUNTERS = ('tasks', 'done', 'open', 'overdue', 'total_weight', 'remaining_weight')
+
+
+def _task_aggregates(prefix=''):  # Условные агрегаты по задачам; prefix - путь до Task
+    open_ = Q(**{prefix + 'is_done': False})
+    return {
+        'tasks': Count(prefix + 'id'),
+        'done': Count(prefix + 'id', filter=Q(**{prefix + 'is_done': True})),
+        'open': Count(prefix + 'id', filter=open_),
+        'overdue': Count(prefix + 'id', filter=open_ & Q(**{prefix + 'dead_line__lt': timezone.now()})),
+        'total_weight': Coalesce(Sum(prefix + 'weight'), 0),
+        'remaining_weight': Coalesce(Sum(prefix + 'weight', filter=open_), 0),
+    }
+
+
+def compute_stats(project_id):
+    """
+    Итоги по проекту, по типам задач и по исполнителям. Итоги складываются из строк по типам,
+    поэтому запросов два: по задачам с группировкой по типу и по Task.doers с группировкой по сотруднику.
+    """
+    by_type = list(models.Task.objects.filter(project=project_id).order_by()
+                   .values('taskType', 'taskType__title').annotate(**_task_aggregates()).order_by('taskType'))
+    by_employee = list(models.Task.doers.through.objects.filter(task__project=project_id).order_by()
+                       .values('employee').annotate(**_task_aggregates('task__')).order_by('employee'))
+    totals = {name: sum(row[name] for row in by_type) for name in _COUNTERS}
+    for row in by_type:
+        row['title'] = row.pop('taskType__title')
+    return {**totals, 'by_type': by_type, 'by_employee': by_employee}
+
+
+def get_stats(project_id):
+    project_id = int(project_id)
+    stats = stats_cache.get(project_id)
+    if stats is None:
+        stats = compute_stats(project_id)
+        stats_cache.set(project_id, stats)
+    return stats
+
+
+def forget_stats(project_id):
+    stats_cache.delete(project_id)
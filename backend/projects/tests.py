@@ -1,12 +1,58 @@
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-
+from django.db import connection, connections, transaction
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.test import override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from django.test.utils import CaptureQueriesContext
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+import asyncio
+import datetime
+import decimal
+import base64
+import csv
+import hashlib
+import io
 import json
+import tempfile
+import unittest
+import uuid
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import quote, unquote, urlencode
+from asgiref.sync import sync_to_async
+import pytz
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework.authtoken.models import Token
 
+from Managment_System import renderers
+from Managment_System.replicas import ReplicaRouter, read_alias, replica_middleware
+from users.authentication import local_cache as token_cache
+from users.tests import shared_cache_settings
+
 from .models import *
+from .pagination import KeysetPagination, TaskPagination
+from .access import membership_cache
+from .cache import TTLCache
+from .filters import filter_tasks, task_ordering
+from . import assignments
+from . import bulk
+from . import export
+from . import importer
+from .stats import stats_cache
+from . import counters
+from . import serializers
+from . import recommend
+from . import uploads
+from . import values
 
 User = get_user_model()
 
@@ -56,7 +102,7 @@ class ProjectTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
         response = self.client.get(reverse('list_my_projects'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json()[0].get('project_name'), 'TestProject1')
+        self.assertEqual(response.json()['results'][0].get('project_name'), 'TestProject1')
 
     # POST
     def test_create_projects(self):  # Создание проекта
@@ -79,7 +125,7 @@ class ProjectTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user2_token.key)
         response = self.client.get(reverse('list_part_projects'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json()[0].get('project_name'), 'TestProject1')
+        self.assertEqual(response.json()['results'][0].get('project_name'), 'TestProject1')
 
     def test_unauthorized_participant_projects(self):  # Не авторизованный юзер-участник
         response = self.client.get(reverse('list_part_projects'))
@@ -172,7 +218,7 @@ class PositionTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
         response = self.client.get(reverse('project_positions_list', args=[self.project1.id]))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json()[0].get('title'), 'testPos')
+        self.assertEqual(response.json()['results'][0].get('title'), 'testPos')
 
     def test_unAuth_get_positions(self):
         response = self.client.get(reverse('project_positions_list', args=[self.project1.id]))
@@ -304,7 +350,7 @@ class TaskTypeTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
         response = self.client.get(reverse('project_taskType_list', args=[self.project1.id]))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json()[0].get('title'), 'testType')
+        self.assertEqual(response.json()['results'][0].get('title'), 'testType')
 
     def test_unAuth_get_taskTypes(self):
         response = self.client.get(reverse('project_taskType_list', args=[self.project1.id]))
@@ -442,7 +488,7 @@ class EmployeeTest(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
         response = self.client.get(reverse('project_employee_list', args=[self.project1.id]))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json()[0].get('user'), self.user_test1.id)
+        self.assertEqual(response.json()['results'][0].get('user'), self.user_test1.id)
 
     def test_unAuth_get_employees(self):
         response = self.client.get(reverse('project_employee_list', args=[self.project1.id]))
@@ -585,7 +631,7 @@ class TaskTests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
         response = self.client.get(reverse('project_task_list', args=[self.project1.id]))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json()[0].get('title'), "task1")
+        self.assertEqual(response.json()['results'][0].get('title'), "task1")
 
     def test_unAuth_get_tasks(self):
         response = self.client.get(reverse('project_task_list', args=[self.project1.id]))
@@ -762,3 +808,1643 @@ class SetEmployeeTests(APITestCase):
         response = self.client.delete(reverse('project_set_employee', args=[self.project1.id, self.task1.id]),
                                       self.data_delete, format='json')
         self.assertEqual(response.status_code, 403)
+
+
+class LargeProjectTestCase(APITestCase):
+    TASKS = 300
+    EMPLOYEES = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="1q2w3e", first_name="manager",
+                                               last_name="manager", email="manager@email.com")
+        cls.project = Project.objects.create(manager=cls.manager, project_name="BigProject")
+        cls.positions = [Position.objects.create(title=f'pos{i}', project=cls.project) for i in range(10)]
+        cls.task_types = [TaskType.objects.create(title=f'type{i}', project=cls.project) for i in range(10)]
+        users = [User.objects.create(username=f'user{i}', first_name=f'user{i}', last_name=f'user{i}',
+                                     email=f'user{i}@email.com') for i in range(cls.EMPLOYEES)]
+        employees = [Employee.objects.create(user=user, position=cls.positions[i % 10], project=cls.project)
+                     for i, user in enumerate(users)]
+        Task.objects.bulk_create(
+            [Task(title=f'task{i}', content='content', weight=i % 5, dead_line="2021-11-22T00:00:00Z",
+                  taskType=cls.task_types[i % 10], project=cls.project) for i in range(cls.TASKS)]
+        )
+        Task.doers.through.objects.bulk_create(
+            [Task.doers.through(task_id=task_id, employee_id=employees[(i + shift) % cls.EMPLOYEES].id)
+             for i, task_id in enumerate(Task.objects.filter(project=cls.project).values_list('id', flat=True))
+             for shift in range(2)]
+        )
+        cls.participant = users[0]
+        cls.manager_token = Token.objects.create(user=cls.manager)
+        cls.participant_token = Token.objects.create(user=cls.participant)
+
+    def setUp(self):  # Счетчики запросов ниже - с холодными кэшами, включая запрос токена
+        membership_cache.clear()
+        token_cache.clear()
+        cache.clear()
+
+    def get(self, url_name, token, *args):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = self.client.get(reverse(url_name, args=args))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+
+class QueryCountTests(LargeProjectTestCase):
+
+    def test_tasks_list_queries(self):
+        with self.assertNumQueries(4):
+            response = self.get('project_task_list', self.manager_token, self.project.id)
+        self.assertEqual(len(response.json()['results']), KeysetPagination.page_size)
+        self.assertEqual(len(response.json()['results'][0].get('doers')), 2)
+
+    def test_employees_list_queries(self):
+        with self.assertNumQueries(3):
+            response = self.get('project_employee_list', self.manager_token, self.project.id)
+        self.assertEqual(len(response.json()['results']), self.EMPLOYEES)
+
+    def test_positions_list_queries(self):
+        with self.assertNumQueries(3):
+            self.get('project_positions_list', self.manager_token, self.project.id)
+
+    def test_task_types_list_queries(self):
+        with self.assertNumQueries(3):
+            self.get('project_taskType_list', self.manager_token, self.project.id)
+
+    def test_participant_tasks_list_queries(self):
+        with self.assertNumQueries(5):
+            response = self.get('project_task_list', self.participant_token, self.project.id)
+        self.assertEqual(len(response.json()['results']), KeysetPagination.page_size)
+
+    def test_manager_projects_queries(self):
+        with self.assertNumQueries(2):
+            self.get('list_my_projects', self.manager_token)
+
+    def test_participant_projects_queries(self):
+        with self.assertNumQueries(2):
+            response = self.get('list_part_projects', self.participant_token)
+        self.assertEqual(response.json()['results'][0].get('manager').get('username'), 'manager')
+
+    def test_tasks_next_page_queries(self):
+        response = self.get('project_task_list', self.manager_token, self.project.id)
+        for _ in range(3):
+            with self.assertNumQueries(3):  # токен уже в кэше
+                response = self.client.get(response.json().get('next'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.json()['results']), KeysetPagination.page_size)
+
+
+class IdentityMapTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+
+    def test_post_task_queries(self):
+        data = {"title": "new", "content": "new", "weight": 1, "dead_line": "2021-11-20T00:00:00Z",
+                "is_done": False, "taskType": self.task_types[0].id}
+        with self.assertNumQueries(8):  # в т.ч. UPDATE счетчиков проекта (projects.counters)
+            response = self.client.post(reverse('project_task_list', args=[self.project.id]), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_set_employee_queries(self):
+        task = Task.objects.filter(project=self.project).first()
+        doer = Employee.objects.filter(project=self.project).exclude(Исполнители=task).first()
+        # m2m_changed (projects.signals): add сначала читает существующие связи и обновляет счетчик исполнителя
+        with self.assertNumQueries(10):
+            response = self.client.patch(reverse('project_set_employee', args=[self.project.id, task.id]),
+                                         {"doer_id": doer.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(doer.id, response.json().get('doers'))
+
+    def test_missing_project(self):
+        response = self.client.get(reverse('project_task_list', args=[self.project.id + 1000]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_task_type(self):
+        data = {"title": "new", "content": "new", "weight": 1, "dead_line": "2021-11-20T00:00:00Z", "taskType": "x"}
+        response = self.client.post(reverse('project_task_list', args=[self.project.id]), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AccessCacheTests(LargeProjectTestCase):
+
+    def test_warm_cache_queries(self):
+        self.get('project_task_list', self.participant_token, self.project.id)
+        with self.assertNumQueries(3):  # роль и токен уже в кэше
+            self.get('project_task_list', self.participant_token, self.project.id)
+
+    def test_single_role_query(self):
+        self.get('project_task_list', self.manager_token, self.project.id)
+        membership_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.get('project_task_list', self.participant_token, self.project.id)
+        self.assertEqual(len([query for query in queries if 'projects_employee' in query['sql']
+                              and 'projects_task_doers' not in query['sql']]), 1)
+
+    def test_removed_employee_loses_access(self):
+        self.get('project_task_list', self.participant_token, self.project.id)
+        Employee.objects.get(user=self.participant, project=self.project).delete()
+        response = self.client.get(reverse('project_task_list', args=[self.project.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_new_manager_gets_access(self):
+        self.get('project_task_list', self.participant_token, self.project.id)
+        response = self.client.post(reverse('project_positions_list', args=[self.project.id]),
+                                    {"title": "new", "color": "#000000"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.project.manager = self.participant
+        self.project.save()
+        response = self.client.post(reverse('project_positions_list', args=[self.project.id]),
+                                    {"title": "new", "color": "#000000"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_ttl_and_lru(self):
+        cache = TTLCache(max_size=2, ttl=10)
+        with mock.patch('projects.cache.time.monotonic', return_value=100):
+            cache.set('a', 1)
+            cache.set('b', 2)
+            self.assertEqual(cache.get('a'), 1)
+            cache.set('c', 3)
+            self.assertIsNone(cache.get('b'))
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('projects.cache.time.monotonic', return_value=111):
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(len(cache), 1)
+
+
+class TaskBulkTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        self.doers = list(Employee.objects.filter(project=self.project).values_list('id', flat=True)[:3])
+
+    def items(self, count, prefix='bulk'):
+        return [{"title": f"{prefix}{i}", "content": "content", "weight": 1, "dead_line": "2021-11-20T00:00:00Z",
+                 "taskType": self.task_types[i % 10].id, "doers": self.doers} for i in range(count)]
+
+    def test_bulk_create(self):
+        response = self.client.post(reverse('project_task_bulk', args=[self.project.id]), self.items(50),
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json().get('created')), 50)
+        self.assertEqual(response.json().get('errors'), [])
+        self.assertEqual(Task.doers.through.objects.filter(task__title__startswith='bulk').count(), 150)
+        self.assertEqual(sorted(response.json().get('created')[0].get('doers')), sorted(self.doers))
+
+    def test_bulk_queries_do_not_grow(self):
+        self.get('project_id', self.manager_token, self.project.id)  # токен в кэше для обоих запросов
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(reverse('project_task_bulk', args=[self.project.id]), self.items(2, 'a'), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(reverse('project_task_bulk', args=[self.project.id]), self.items(40, 'b'),
+                             format='json')
+        self.assertEqual(len(small), len(large))
+
+    def test_bulk_per_item_errors(self):
+        items = self.items(4)
+        items[0]['title'] = 'task1'  # уже есть в проекте
+        items[1]['taskType'] = 0
+        items[2]['doers'] = [0]
+        items.append(dict(items[3]))  # повтор title внутри пачки
+        items.append({"title": "no content"})
+        response = self.client.post(reverse('project_task_bulk', args=[self.project.id]), items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([task.get('title') for task in response.json().get('created')], ['bulk3'])
+        errors = {error.get('index'): error.get('errors') for error in response.json().get('errors')}
+        self.assertEqual(sorted(errors), [0, 1, 2, 4, 5])
+        self.assertIn('taskType', errors[1])
+        self.assertIn('doers', errors[2])
+        self.assertIn('content', errors[5])
+
+    def test_bulk_concurrent_title(self):
+        atomic = transaction.atomic
+        created = []
+
+        def concurrent(*args, **kwargs):  # Параллельный запрос создал задачу с тем же title после проверки
+            if not created:
+                created.append(True)
+                Task.objects.create(title='bulk1', content='content', weight=1, dead_line='2021-11-20T00:00:00Z',
+                                    taskType=self.task_types[0], project=self.project)
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(bulk.transaction, 'atomic', side_effect=concurrent):
+            response = self.client.post(reverse('project_task_bulk', args=[self.project.id]), self.items(3),
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()['errors'],
+                         [{'index': 1, 'errors': {'title': ['Task with this title already exists']}}])
+        self.assertEqual(list(Task.objects.filter(title__startswith='bulk').values_list('title', flat=True)), ['bulk1'])
+
+    def test_bulk_invalid_payload(self):
+        response = self.client.post(reverse('project_task_bulk', args=[self.project.id]), {"title": "x"},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_participant_forbidden(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.participant_token.key)
+        response = self.client.post(reverse('project_task_bulk', args=[self.project.id]), self.items(1),
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BatchDoersTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        self.employees = list(Employee.objects.filter(project=self.project))
+        self.tasks = list(Task.objects.filter(project=self.project).values_list('id', flat=True)[:20])
+        Task.doers.through.objects.filter(task_id__in=self.tasks).delete()
+
+    def batch(self, method, task_ids, doer_ids):
+        return getattr(self.client, method)(reverse('project_set_employees', args=[self.project.id]),
+                                            {"task_ids": task_ids, "doer_ids": doer_ids}, format='json')
+
+    def test_batch_assign_and_remove(self):
+        doer_ids = [employee.id for employee in self.employees[10:20]]
+        response = self.batch('patch', self.tasks, doer_ids)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json().get('results')
+        self.assertEqual(len(results), 200)
+        self.assertEqual({result.get('result') for result in results}, {'added'})
+        self.assertEqual(Task.doers.through.objects.filter(task_id__in=self.tasks,
+                                                          employee_id__in=doer_ids).count(), 200)
+        response = self.batch('patch', self.tasks, doer_ids)
+        self.assertEqual({result.get('result') for result in response.json().get('results')}, {'unchanged'})
+        response = self.batch('delete', self.tasks, doer_ids)
+        self.assertEqual({result.get('result') for result in response.json().get('results')}, {'removed'})
+        self.assertFalse(Task.doers.through.objects.filter(task_id__in=self.tasks, employee_id__in=doer_ids).exists())
+
+    def test_batch_queries_do_not_grow(self):
+        self.get('project_id', self.manager_token, self.project.id)  # токен в кэше для обоих запросов
+        with CaptureQueriesContext(connection) as small:
+            self.batch('patch', self.tasks[:1], [self.employees[10].id])
+        with CaptureQueriesContext(connection) as large:
+            self.batch('patch', self.tasks[1:], [employee.id for employee in self.employees[11:25]])
+        self.assertEqual(len(small), len(large))
+
+    def test_batch_concurrent_assign(self):
+        write_doers = assignments.write_doers
+        doer_ids = [employee.id for employee in self.employees[10:12]]
+
+        def concurrent(project, pairs, tasks, remove=False):  # Параллельный запрос добавил ту же пару
+            Task.doers.through.objects.create(task_id=self.tasks[0], employee_id=doer_ids[1])
+            return write_doers(project, pairs, tasks, remove=remove)
+
+        with mock.patch.object(assignments, 'write_doers', side_effect=concurrent):
+            response = self.batch('patch', self.tasks[:2], doer_ids)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()['conflicts'], [{'task': self.tasks[0], 'doer': doer_ids[1]}])
+        self.assertEqual(Task.doers.through.objects.filter(task_id__in=self.tasks[:2]).count(), 1)
+
+    def test_chief_authority(self):
+        chief, subordinate, other = self.employees[1], self.employees[2], self.employees[3]
+        subordinate.chief = chief
+        subordinate.save()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=chief.user).key)
+        response = self.batch('patch', self.tasks[:1] + [0], [subordinate.id, other.id, 0])
+        results = {(result.get('task'), result.get('doer')): result.get('result')
+                   for result in response.json().get('results')}
+        self.assertEqual(results[(self.tasks[0], subordinate.id)], 'added')
+        self.assertEqual(results[(self.tasks[0], other.id)], 'forbidden')
+        self.assertEqual(results[(self.tasks[0], 0)], 'invalid_doer')
+        self.assertEqual(results[(0, subordinate.id)], 'invalid_task')
+
+    def test_not_participant(self):
+        outsider = User.objects.create(username='outsider', first_name='o', last_name='o', email='o@email.com')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=outsider).key)
+        response = self.batch('patch', self.tasks, [self.employees[0].id])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_payload(self):
+        response = self.batch('patch', [], [self.employees[0].id])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_single_task_endpoint_accepts_lists(self):
+        doer_ids = [employee.id for employee in self.employees[10:13]]
+        response = self.client.patch(reverse('project_set_employee', args=[self.project.id, self.tasks[0]]),
+                                     {"doer_ids": doer_ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result.get('doer') for result in response.json().get('results')], doer_ids)
+
+
+class TaskFilterTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        Task.objects.filter(project=self.project, weight=0).update(is_done=True, dead_line="2021-12-01T00:00:00Z")
+
+    def titles(self, query):
+        url = reverse('project_task_list', args=[self.project.id]) + '?page_size=500&' + query
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [task.get('title') for task in response.json()['results']]
+
+    def test_is_done(self):
+        self.assertEqual(len(self.titles('is_done=true')), self.TASKS // 5)
+        self.assertEqual(len(self.titles('is_done=false')), self.TASKS - self.TASKS // 5)
+
+    def test_task_type(self):
+        self.assertEqual(len(self.titles(f'taskType={self.task_types[0].id},{self.task_types[1].id}')),
+                         self.TASKS // 5)
+
+    def test_dead_line_range(self):
+        self.assertEqual(len(self.titles('dead_line_after=2021-11-30T00:00:00Z')), self.TASKS // 5)
+        self.assertEqual(len(self.titles('dead_line_before=2021-11-30T00:00:00Z&is_done=false')),
+                         self.TASKS - self.TASKS // 5)
+
+    def test_doers(self):
+        employee = Employee.objects.get(user=self.participant, project=self.project)
+        titles = self.titles(f'doers={employee.id}')
+        self.assertEqual(len(titles), len(set(titles)))
+        self.assertEqual(len(titles), Task.objects.filter(doers=employee).count())
+
+    def test_ordering(self):
+        titles = self.titles('ordering=-weight')
+        weights = dict(Task.objects.filter(project=self.project).values_list('title', 'weight'))
+        self.assertEqual([weights[title] for title in titles], sorted(weights.values(), reverse=True))
+        self.assertEqual(self.titles('ordering=title'), sorted(weights))
+
+    def test_ordering_pages(self):
+        url = reverse('project_task_list', args=[self.project.id]) + '?ordering=weight&page_size=70'
+        titles = []
+        while url:
+            response = self.client.get(url).json()
+            titles += [task.get('title') for task in response['results']]
+            url = response.get('next')
+        self.assertEqual(len(set(titles)), self.TASKS)
+
+    def test_ordering_pages_many_ties(self):
+        # Больше offset_cutoff (1000) задач с одинаковым weight и dead_line
+        Task.objects.bulk_create([Task(title=f'tie{i}', content='content', weight=2, dead_line='2021-11-22T00:00:00Z',
+                                       taskType=self.task_types[0], project=self.project) for i in range(1300)])
+        total = Task.objects.filter(project=self.project).count()
+        for ordering in ('weight', '-weight', 'dead_line'):
+            url = reverse('project_task_list', args=[self.project.id]) + f'?ordering={ordering}&page_size=200'
+            ids, pages = [], []
+            while url:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url).json()
+                self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+                ids += [task.get('id') for task in response['results']]
+                pages.append(response)
+                url = response.get('next')
+                self.assertLess(len(pages), 20)
+            self.assertEqual(len(ids), total)
+            self.assertEqual(len(set(ids)), total)
+            previous = self.client.get(pages[-1]['previous']).json()
+            self.assertEqual(previous['results'], pages[-2]['results'])
+
+    def test_invalid_params(self):
+        for query in ('is_done=maybe', 'taskType=a', 'dead_line_after=tomorrow', 'ordering=content',
+                      'ordering=--weight'):
+            response = self.client.get(reverse('project_task_list', args=[self.project.id]) + '?' + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def page(self, params):  # Запрос страницы в том виде, в котором его строит TaskListView
+        queryset = filter_tasks(Task.objects.filter(project=self.project), params)
+        return queryset.order_by(*task_ordering(params, TaskPagination.ordering))[:TaskPagination.page_size + 1]
+
+    def test_done_deadline_index(self):
+        for params in ({'is_done': 'false', 'dead_line_before': '2021-11-30T00:00:00Z'},
+                       {'is_done': 'false', 'ordering': 'dead_line'}):
+            self.assertIn('task_project_done_deadline_idx', self.explain(self.page(params)))
+
+    def test_task_type_index(self):
+        self.assertIn('task_project_type_idx', self.explain(self.page({'taskType': str(self.task_types[0].id)})))
+
+
+class PaginationTests(LargeProjectTestCase):
+
+    def test_walk_all_task_pages(self):
+        url = reverse('project_task_list', args=[self.project.id]) + '?page_size=70'
+        titles = []
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [task.get('title') for task in response.json()['results']]
+            url = response.json().get('next')
+        self.assertEqual(len(titles), self.TASKS)
+        self.assertEqual(len(set(titles)), self.TASKS)
+
+    def test_previous_page(self):
+        first = self.get('project_task_list', self.manager_token, self.project.id).json()
+        second = self.client.get(first.get('next')).json()
+        self.assertEqual(self.client.get(second.get('previous')).json()['results'], first['results'])
+
+    def test_page_size_cap(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        with mock.patch.object(TaskPagination, 'max_page_size', 100):
+            response = self.client.get(reverse('project_task_list', args=[self.project.id]) + '?page_size=1000')
+        self.assertEqual(len(response.json()['results']), 100)
+
+    def test_invalid_cursor(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        response = self.client.get(reverse('project_task_list', args=[self.project.id]) + '?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TaskSearchTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        Task.objects.filter(title='task1').update(title='Починить отчёт', content='Отчёт падает при экспорте')
+        Task.objects.filter(title='task2').update(content='Отчёты за квартал')
+
+    def search(self, query, **params):
+        url = reverse('project_task_search', args=[self.project.id])
+        return self.client.get(url, {'q': query, **params})
+
+    def test_title_ranks_above_content(self):
+        response = self.search('отчёт')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([task['title'] for task in response.json()['results']], ['Починить отчёт', 'task2'])
+
+    def test_updates_and_deletes_are_indexed(self):
+        Task.objects.filter(title='task3').update(content='Новый отчёт')
+        Task.objects.filter(title='task2').delete()
+        self.assertEqual(self.search('отчёт').json()['count'], 2)
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search('отчёт экспорте').json()['count'], 1)
+        self.assertEqual(self.search('отчёт квартал несуществующее').json()['count'], 0)
+
+    def test_pagination(self):
+        response = self.search('content', limit=10).json()
+        self.assertEqual(response['count'], self.TASKS - 2)
+        self.assertEqual(len(response['results']), 10)
+        self.assertIsNotNone(response['next'])
+
+    def test_other_project_not_found(self):
+        project = Project.objects.create(manager=self.manager, project_name="Other")
+        Task.objects.create(title='отчёт', content='отчёт', weight=1, dead_line="2021-11-22T00:00:00Z",
+                            taskType=TaskType.objects.create(title='type', project=project), project=project)
+        self.assertEqual(self.search('отчёт').json()['count'], 2)
+
+    def test_empty_query(self):
+        self.assertEqual(self.search(' ').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search('!!!').json()['count'], 0)
+
+    def test_participant_access(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.participant_token.key)
+        self.assertEqual(self.search('отчёт').status_code, status.HTTP_200_OK)
+        self.client.credentials()
+        self.assertEqual(self.search('отчёт').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TaskExportTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+
+    def export(self, fmt):
+        response = self.client.get(reverse('project_task_export', args=[self.project.id]), {'fmt': fmt})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        tasks = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        self.assertEqual(len(tasks), self.TASKS)
+        task = Task.objects.filter(project=self.project).order_by('id').first()
+        self.assertEqual(tasks[0]['id'], task.id)
+        self.assertEqual(tasks[0]['taskType'], task.taskType.title)
+        self.assertEqual(sorted(tasks[0]['doers']), sorted(task.doers.values_list('user__username', flat=True)))
+        self.assertEqual(tasks[0]['dead_line'], '2021-11-22T00:00:00Z')
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual(len(rows), self.TASKS)
+        self.assertEqual(tuple(rows[0]), export.FIELDS)
+        self.assertEqual(len(rows[0]['doers'].split(',')), 2)
+
+    def test_chunked_queries(self):  # Число запросов зависит от числа пачек, а не от числа задач
+        with mock.patch.object(export, 'CHUNK_SIZE', 100), CaptureQueriesContext(connection) as queries:
+            self.export('ndjson')
+        self.assertLessEqual(len(queries), 3 + 2 * (self.TASKS // 100 + 1) + 3)
+
+    def test_doer_from_other_project(self):
+        other = Project.objects.create(manager=self.manager, project_name="Other")
+        stranger = Employee.objects.create(user=self.manager, project=other,
+                                           position=Position.objects.create(title='pos', project=other))
+        task = Task.objects.filter(project=self.project).order_by('id').first()
+        task.doers.add(stranger)
+        tasks = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        self.assertEqual(len(tasks), self.TASKS)
+        self.assertIn(self.manager.username, tasks[0]['doers'])
+
+    def test_invalid_format(self):
+        response = self.client.get(reverse('project_task_export', args=[self.project.id]), {'fmt': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forbidden_for_outsider(self):
+        outsider = User.objects.create_user(username="outsider", password="1q2w3e", first_name="outsider",
+                                            last_name="outsider", email="outsider@email.com")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=outsider).key)
+        response = self.client.get(reverse('project_task_export', args=[self.project.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TaskImportTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+
+    def rows(self, count, prefix='imported'):
+        return [{'title': f'{prefix}{i}', 'content': 'content', 'weight': 1, 'taskType': f'type{i % 10}',
+                 'dead_line': '2021-11-20T00:00:00Z', 'is_done': False, 'doers': ['user1', 'user2']}
+                for i in range(count)]
+
+    def ndjson(self, rows):
+        return ''.join(json.dumps(row) + '\n' for row in rows).encode()
+
+    def upload(self, content, name='tasks.ndjson', **data):
+        file = SimpleUploadedFile(name, content)
+        return self.client.post(reverse('project_task_import', args=[self.project.id]), {'file': file, **data},
+                                format='multipart')
+
+    def test_ndjson(self):
+        response = self.upload(self.ndjson(self.rows(25)))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['created'], 25)
+        task = Task.objects.get(title='imported3')
+        self.assertEqual(task.taskType, self.task_types[3])
+        self.assertEqual(sorted(task.doers.values_list('user__username', flat=True)), ['user1', 'user2'])
+
+    def test_csv_round_trip(self):  # Экспорт проекта импортируется в другой проект с теми же типами и сотрудниками
+        project = Project.objects.create(manager=self.manager, project_name="Copy")
+        for task_type in self.task_types:
+            TaskType.objects.create(title=task_type.title, project=project)
+        for employee in Employee.objects.filter(project=self.project):
+            Employee.objects.create(user=employee.user, position=employee.position, project=project)
+        content = ''.join(export.export_tasks(self.project, 'csv')).encode()
+        response = self.client.post(reverse('project_task_import', args=[project.id]),
+                                    {'file': SimpleUploadedFile('tasks.csv', content)}, format='multipart')
+        self.assertEqual(response.json()['created'], self.TASKS)
+        self.assertEqual(Task.doers.through.objects.filter(task__project=project).count(), 2 * self.TASKS)
+
+    def test_per_row_errors(self):
+        rows = self.rows(5)
+        rows[0]['taskType'] = 'missing'
+        rows[1]['doers'] = ['nobody']
+        rows[2]['title'] = 'task1'
+        content = self.ndjson(rows) + b'not json\n'
+        result = self.upload(content).json()
+        self.assertEqual((result['created'], result['failed']), (2, 4))
+        self.assertEqual([error['line'] for error in result['errors']], [1, 2, 3, 6])
+        rows = self.rows(3, 'lines')
+        rows[2]['taskType'] = 'missing'
+        content = self.ndjson(rows[:1]) + b'\n' + self.ndjson(rows[1:])
+        self.assertEqual([error['line'] for error in self.upload(content).json()['errors']], [4])
+
+    def test_csv_error_lines(self):  # Номер строки в файле: после заголовка и многострочного поля в кавычках
+        rows = self.rows(3, 'csv')
+        rows[0]['content'] = 'first\nsecond\nthird'
+        rows[1]['taskType'] = 'missing'
+        rows[2]['weight'] = 'heavy'
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=list(rows[0]), lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(dict(row, doers=','.join(row['doers'])) for row in rows)
+        result = self.upload(out.getvalue().encode(), name='tasks.csv').json()
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([error['line'] for error in result['errors']], [5, 6])
+
+    def test_queries_per_chunk(self):
+        with CaptureQueriesContext(connection) as small:
+            self.upload(self.ndjson(self.rows(20, 'a')), chunk_size=20)
+        with CaptureQueriesContext(connection) as large:
+            self.upload(self.ndjson(self.rows(100, 'b')), chunk_size=20)
+        chunk_queries = (len(large) - len(small)) / 4
+        self.assertLessEqual(chunk_queries, 8)
+
+    def test_invalid_upload(self):
+        self.assertEqual(self.upload(b'', name='tasks.xml').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.upload(b'\xff\xfe').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.upload(b'', chunk_size='x').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_broken_file_reports_saved_chunks(self):
+        content = self.ndjson(self.rows(3)) + b'\xff\xfe\n'
+        response = self.upload(content, chunk_size=2)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((response.json()['error'], response.json()['created']), ('File must be utf-8', 2))
+        self.assertEqual(Task.objects.filter(title__startswith='imported').count(), 2)
+        content = ('title,content\nhuge,' + 'x' * (csv.field_size_limit() + 1) + '\n').encode()
+        response = self.upload(content, name='tasks.csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Invalid csv', response.json()['error'])
+
+    def test_participant_forbidden(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.participant_token.key)
+        self.assertEqual(self.upload(self.ndjson(self.rows(1))).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command(self):
+        progress = []
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as file:
+            file.write(self.ndjson(self.rows(30)))
+            file.flush()
+            call_command('import_tasks', self.project.id, file.name, chunk_size=10, stdout=io.StringIO())
+            with open(file.name, 'rb') as again:
+                importer.import_tasks(self.project, again, 'ndjson', 10, lambda *counts: progress.append(counts))
+        self.assertEqual(Task.objects.filter(title__startswith='imported').count(), 30)
+        self.assertEqual(progress[-1], (30, 0, 30))
+
+
+class AsyncReadTests(APITransactionTestCase):
+    # Async вьюхи читают из БД в потоках пула, поэтому данные должны быть закоммичены
+
+    def setUp(self):
+        membership_cache.clear()
+        self.manager = User.objects.create_user(username="manager", password="1q2w3e", first_name="manager",
+                                                last_name="manager", email="manager@email.com")
+        self.project = Project.objects.create(manager=self.manager, project_name="AsyncProject")
+        task_type = TaskType.objects.create(title='type', project=self.project)
+        position = Position.objects.create(title='pos', project=self.project)
+        self.participant = User.objects.create(username='user', first_name='user', last_name='user',
+                                               email='user@email.com')
+        employee = Employee.objects.create(user=self.participant, position=position, project=self.project)
+        for i in range(60):
+            task = Task.objects.create(title=f'task{i}', content='content', weight=1, taskType=task_type,
+                                       dead_line="2021-11-22T00:00:00Z", project=self.project)
+            task.doers.add(employee)
+        self.manager_token = Token.objects.create(user=self.manager)
+        self.participant_token = Token.objects.create(user=self.participant)
+
+    async def async_get(self, url, token=None, **params):
+        headers = {'Authorization': f'Token {token.key}'} if token else {}
+        if params:  # AsyncClient в Django 3.2 не переносит data в query string
+            url += '?' + urlencode(params)
+        return await self.async_client.get(url, **headers)
+
+    async def test_same_response_as_sync(self):
+        for name in ('project_id', 'project_task_list', 'project_employee_list', 'project_positions_list',
+                     'project_taskType_list'):
+            url = reverse('async_' + name, args=[self.project.id])
+            response = await self.async_get(url, self.participant_token)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, name)
+            self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.participant_token.key)
+            expected = await sync_to_async(self.client.get)(reverse(name, args=[self.project.id]))
+            expected = expected.content.decode().replace('/projects/', '/async/projects/')
+            self.assertEqual(response.json(), json.loads(expected), name)
+
+    async def test_next_page(self):
+        url = reverse('async_project_task_list', args=[self.project.id])
+        first = (await self.async_get(url, self.manager_token)).json()
+        self.assertIn('/async/projects/', first['next'])
+        second = (await self.async_get(first['next'], self.manager_token)).json()
+        self.assertEqual(len(first['results']) + len(second['results']), 60)
+
+    async def test_errors(self):
+        url = reverse('async_project_task_list', args=[self.project.id])
+        self.assertEqual((await self.async_get(url)).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual((await self.async_get(url, self.manager_token, cursor='garbage')).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual((await self.async_get(url, self.manager_token, is_done='maybe')).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        missing = reverse('async_project_task_list', args=[self.project.id + 100])
+        self.assertEqual((await self.async_get(missing, self.manager_token)).status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_read_only(self):
+        response = await self.async_client.delete(reverse('async_project_id', args=[self.project.id]),
+                                                  Authorization=f'Token {self.manager_token.key}')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_concurrent_requests(self):
+        url = reverse('async_project_task_list', args=[self.project.id])
+        responses = await asyncio.gather(*[self.async_get(url, self.participant_token) for _ in range(20)])
+        self.assertEqual({response.status_code for response in responses}, {status.HTTP_200_OK})
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(APITransactionTestCase):
+    # 'replica' - второе подключение к той же тестовой БД, поэтому данные должны быть закоммичены.
+    # Подключение добавляется после setUpClass, чтобы тестовый раннер не создавал для него отдельную БД
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.databases['replica'] = dict(connections['default'].settings_dict)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        shared_cache_settings(self)
+        cache.clear()
+        membership_cache.clear()
+        self.manager = User.objects.create_user(username="manager", password="1q2w3e", first_name="manager",
+                                                last_name="manager", email="manager@email.com")
+        self.project = Project.objects.create(manager=self.manager, project_name="Project")
+        self.task_type = TaskType.objects.create(title='type', project=self.project)
+        self.token = Token.objects.create(user=self.manager)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def aliases(self, method, url, *args, **kwargs):  # Подключения, через которые прошли запросы
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(url, *args, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return {alias for alias, queries in (('default', primary), ('replica', replica)) if queries}
+
+    def create_task(self):
+        return self.aliases('post', reverse('project_task_list', args=[self.project.id]), {
+            "title": "task", "content": "content", "weight": 1, "dead_line": "2021-11-22T00:00:00Z",
+            "taskType": self.task_type.id, "is_done": False}, format='json')
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.aliases('get', '/auth/users/me/'), {'replica'})
+        self.assertEqual(self.aliases('get', reverse('project_task_list', args=[self.project.id])), {'replica'})
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.create_task(), {'default'})
+
+    def test_sticky_after_write(self):
+        self.create_task()
+        self.assertEqual(self.aliases('get', reverse('project_task_list', args=[self.project.id])), {'default'})
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(
+            user=User.objects.create(username='other', email='other@email.com')).key)
+        self.assertEqual(self.aliases('get', '/auth/users/me/'), {'replica'})
+
+    def test_sticky_after_login(self):  # У запроса входа нет учетных данных, метится выданный токен
+        self.client.credentials()
+        response = self.client.post('/auth/token/login/', {'username': 'manager', 'password': '1q2w3e'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + response.json()['auth_token'])
+        self.assertEqual(self.aliases('get', '/auth/users/me/'), {'default'})
+        response = self.client.post(reverse('jwt-create'), {'username': 'manager', 'password': '1q2w3e'})
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + response.json()['access'])
+        self.assertEqual(self.aliases('get', '/auth/users/me/'), {'default'})
+
+    def test_sticky_window_expires(self):
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            self.create_task()
+        self.assertEqual(self.aliases('get', reverse('project_task_list', args=[self.project.id])), {'replica'})
+
+    def test_without_replicas(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.aliases('get', reverse('project_task_list', args=[self.project.id])),
+                             {'default'})
+
+    def test_requires_shared_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaises(ImproperlyConfigured):
+                replica_middleware(lambda request: None)
+
+    def test_atomic_block_reads_primary(self):
+        token = read_alias.set('replica')
+        try:
+            self.assertEqual(ReplicaRouter().db_for_read(Task), 'replica')
+            with transaction.atomic():
+                self.assertEqual(ReplicaRouter().db_for_read(Task), 'default')
+        finally:
+            read_alias.reset(token)
+        self.assertEqual(ReplicaRouter().db_for_read(Task), 'default')
+
+
+class ProjectStatsTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        stats_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        Task.objects.filter(project=self.project, weight=0).update(is_done=True)
+        Task.objects.filter(project=self.project, weight=1).update(dead_line="2099-01-01T00:00:00Z")
+
+    def stats(self):
+        return self.get('project_stats', self.manager_token, self.project.id).json()
+
+    def test_totals(self):
+        stats = self.stats()
+        tasks = Task.objects.filter(project=self.project)
+        self.assertEqual(stats['tasks'], self.TASKS)
+        self.assertEqual(stats['done'], tasks.filter(is_done=True).count())
+        self.assertEqual(stats['open'], tasks.filter(is_done=False).count())
+        self.assertEqual(stats['overdue'], tasks.filter(is_done=False).exclude(weight=1).count())
+        self.assertEqual(stats['total_weight'], sum(tasks.values_list('weight', flat=True)))
+        self.assertEqual(stats['remaining_weight'], sum(tasks.filter(is_done=False).values_list('weight', flat=True)))
+
+    def test_by_type_and_employee(self):
+        stats = self.stats()
+        self.assertEqual(len(stats['by_type']), 10)
+        self.assertEqual(stats['by_type'][0]['title'], 'type0')
+        self.assertEqual(sum(row['tasks'] for row in stats['by_type']), self.TASKS)
+        employee = Employee.objects.get(user=self.participant, project=self.project)
+        row = next(row for row in stats['by_employee'] if row['employee'] == employee.id)
+        self.assertEqual(row['tasks'], Task.objects.filter(doers=employee).count())
+        self.assertEqual(sum(row['tasks'] for row in stats['by_employee']), 2 * self.TASKS)
+
+    def test_queries_and_cache(self):
+        self.stats()
+        with CaptureQueriesContext(connection) as queries:
+            self.stats()
+        self.assertFalse([query for query in queries if 'projects_task' in query['sql']])
+        stats_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.stats()
+        self.assertEqual(len([query for query in queries if 'projects_task' in query['sql']]), 2)
+
+    def test_invalidation(self):
+        self.assertEqual(self.stats()['tasks'], self.TASKS)
+        task = Task.objects.filter(project=self.project, is_done=False).first()
+        task.is_done = True
+        task.save()
+        self.assertEqual(self.stats()['done'], self.TASKS // 5 + 1)
+        task.delete()
+        self.assertEqual(self.stats()['tasks'], self.TASKS - 1)
+        self.client.post(reverse('project_task_bulk', args=[self.project.id]), [
+            {"title": "bulk", "content": "content", "weight": 1, "dead_line": "2021-11-20T00:00:00Z",
+             "taskType": self.task_types[0].id}], format='json')
+        self.assertEqual(self.stats()['tasks'], self.TASKS)
+        employee = Employee.objects.get(user=self.participant, project=self.project)
+        Task.objects.get(title='bulk').doers.add(employee)
+        self.assertEqual(sum(row['tasks'] for row in self.stats()['by_employee']), 2 * self.TASKS - 1)
+
+    def test_participant_and_outsider(self):
+        self.get('project_stats', self.participant_token, self.project.id)
+        self.client.credentials()
+        response = self.client.get(reverse('project_stats', args=[self.project.id]))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CountersTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        call_command('reconcile_counters', stdout=io.StringIO())  # тестовые данные созданы bulk_create
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        self.employees = list(Employee.objects.filter(project=self.project))
+
+    def assertNoDrift(self):
+        self.assertFalse(counters.project_drift().exists())
+        self.assertFalse(counters.employee_drift().exists())
+
+    def test_reconciled(self):
+        self.project.refresh_from_db()
+        tasks = Task.objects.filter(project=self.project)
+        self.assertEqual(self.project.open_count, tasks.filter(is_done=False).count())
+        self.assertEqual(self.project.total_weight, sum(tasks.values_list('weight', flat=True)))
+        self.assertNoDrift()
+
+    def test_task_api(self):
+        response = self.client.post(reverse('project_task_list', args=[self.project.id]), {
+            "title": "new", "content": "new", "weight": 7, "dead_line": "2021-11-20T00:00:00Z", "is_done": False,
+            "taskType": self.task_types[0].id, "doers_ids": f'{self.employees[0].id},{self.employees[1].id}'},
+            format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNoDrift()
+        task = response.json()['id']
+        url = reverse('project_task_id', args=[self.project.id, task])
+        self.client.patch(url, {"weight": 3}, format='json')
+        self.assertNoDrift()
+        self.client.patch(url, {"is_done": True}, format='json')
+        self.assertNoDrift()
+        self.client.patch(url, {"is_done": False, "doers": [self.employees[2].id]}, format='json')
+        self.assertNoDrift()
+        self.client.patch(reverse('project_set_employee', args=[self.project.id, task]),
+                          {"doer_id": self.employees[3].id}, format='json')
+        self.assertNoDrift()
+        self.client.delete(url)
+        self.assertNoDrift()
+
+    def test_doers_m2m(self):
+        task = Task.objects.filter(project=self.project, is_done=False).exclude(weight=0).first()
+        employee = self.employees[5]
+        task.doers.add(employee, self.employees[6])
+        task.doers.remove(employee, self.employees[7])  # employees[7] может быть не связан с задачей
+        self.assertNoDrift()
+        task.doers.clear()
+        self.assertNoDrift()
+        employee.Исполнители.add(*Task.objects.filter(project=self.project)[:10])
+        employee.Исполнители.remove(*Task.objects.filter(project=self.project)[5:15])
+        self.assertNoDrift()
+        employee.Исполнители.clear()
+        self.assertNoDrift()
+
+    def test_bulk_paths(self):
+        doers = [self.employees[0].id, self.employees[1].id]
+        self.client.post(reverse('project_task_bulk', args=[self.project.id]), [
+            {"title": f"bulk{i}", "content": "content", "weight": i, "dead_line": "2021-11-20T00:00:00Z",
+             "is_done": i % 2 == 0, "taskType": self.task_types[0].id, "doers": doers} for i in range(10)],
+            format='json')
+        self.assertNoDrift()
+        tasks = list(Task.objects.filter(project=self.project).values_list('id', flat=True)[:20])
+        self.client.patch(reverse('project_set_employees', args=[self.project.id]),
+                          {"task_ids": tasks, "doer_ids": doers}, format='json')
+        self.assertNoDrift()
+        self.client.delete(reverse('project_set_employees', args=[self.project.id]),
+                           {"task_ids": tasks, "doer_ids": doers}, format='json')
+        self.assertNoDrift()
+
+    def test_delete_employee(self):
+        self.employees[0].delete()
+        self.assertNoDrift()
+
+    def test_save_keeps_counters(self):
+        project = Project.objects.get(pk=self.project.pk)
+        open_count = project.open_count
+        Task.objects.create(title='new', content='c', weight=1, dead_line="2021-11-22T00:00:00Z",
+                            project=self.project, taskType=self.task_types[0])
+        project.project_name = 'Renamed'
+        project.save()
+        project.refresh_from_db()
+        self.assertEqual((project.project_name, project.open_count), ('Renamed', open_count + 1))
+
+    def test_reconcile_reports_drift(self):
+        Project.objects.filter(pk=self.project.pk).update(open_count=0)
+        Employee.objects.filter(pk=self.employees[0].pk).update(assigned_open_weight=-1)
+        out = io.StringIO()
+        call_command('reconcile_counters', dry_run=True, stdout=out)
+        self.assertIn(f'project {self.project.id}: open_count 0 ->', out.getvalue())
+        self.assertIn('Drift found: 1 projects, 1 employees', out.getvalue())
+        call_command('reconcile_counters', stdout=io.StringIO())
+        self.assertNoDrift()
+
+
+class RecommendTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        self.employees = list(Employee.objects.filter(project=self.project))
+        self.tasks = list(Task.objects.filter(project=self.project).values_list('id', flat=True)[:40])
+        Task.doers.through.objects.filter(task_id__in=self.tasks).delete()
+        call_command('reconcile_counters', stdout=io.StringIO())  # тестовые данные созданы bulk_create
+
+    def recommend(self, **data):
+        return self.client.post(reverse('project_task_recommend', args=[self.project.id]), data, format='json')
+
+    def test_balance(self):
+        pairs, loads = recommend.balance({1: 5, 2: 4, 3: 3, 4: 3, 5: 1}, {10: 0, 11: 0, 12: 6})
+        self.assertEqual(dict(pairs), {1: 10, 2: 11, 3: 11, 4: 10, 5: 12})
+        self.assertEqual(loads, {10: 8, 11: 7, 12: 7})
+
+    def test_balance_large(self):
+        tasks = {task_id: task_id % 13 + 1 for task_id in range(10000)}
+        loads = {employee_id: employee_id % 7 for employee_id in range(500)}
+        pairs, result = recommend.balance(tasks, loads)
+        self.assertEqual(len(pairs), len(tasks))
+        self.assertLessEqual(max(result.values()) - min(result.values()), max(tasks.values()))
+
+    def test_recommend_without_apply(self):
+        response = self.recommend()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.json()
+        self.assertFalse(result['applied'])
+        self.assertEqual({item['task'] for item in result['assignments']}, set(self.tasks))
+        self.assertFalse(Task.doers.through.objects.filter(task_id__in=self.tasks).exists())
+
+    def test_max_tasks(self):
+        with mock.patch.object(recommend, 'MAX_TASKS', 5):
+            result = self.recommend(apply=True).json()
+        self.assertEqual(sorted(item['task'] for item in result['assignments']), sorted(self.tasks)[:5])
+        self.assertEqual(len(recommend.unassigned_tasks(self.project)), len(self.tasks) - 5)
+
+    def test_locked_apply_skips_assigned(self):  # Исполнителя назначили, пока строки задач ждали блокировки
+        through = Task.doers.through
+        first, filter_through = min(self.tasks), through.objects.filter
+
+        def assign_first(**kwargs):
+            through.objects.create(task_id=first, employee=self.employees[0])
+            return filter_through(**kwargs)
+
+        with transaction.atomic(), mock.patch.object(through.objects, 'filter', side_effect=assign_first):
+            tasks = recommend.unassigned_tasks(self.project, lock=True)
+        self.assertEqual(set(tasks), set(self.tasks) - {first})
+
+    def test_apply(self):
+        before = dict(Employee.objects.filter(project=self.project).values_list('id', 'assigned_open_weight'))
+        response = self.recommend(task_ids=self.tasks[:10] + [0], apply=True)
+        result = response.json()
+        self.assertTrue(result['applied'])
+        self.assertEqual(result['skipped'], [0])
+        pairs = {(item['task'], item['doer']) for item in result['assignments']}
+        self.assertEqual(set(Task.doers.through.objects.filter(task_id__in=self.tasks)
+                             .values_list('task_id', 'employee_id')), pairs)
+        least = min(before, key=lambda employee_id: (before[employee_id], employee_id))
+        heaviest = max(self.tasks[:10], key=lambda task_id: (Task.objects.get(id=task_id).weight, -task_id))
+        self.assertIn((heaviest, least), pairs)
+        self.assertFalse(counters.employee_drift().exists())
+        self.assertEqual(self.recommend(task_ids=self.tasks[:10]).json()['assignments'], [])
+
+    def test_positions_and_chief(self):
+        chief, subordinates = self.employees[1], self.employees[2:5]
+        for subordinate in subordinates:
+            subordinate.chief = chief
+            subordinate.save()
+        response = self.recommend(position_ids=[self.positions[3].id])
+        self.assertEqual({item['doer'] for item in response.json()['assignments']},
+                         {employee.id for employee in self.employees if employee.position_id == self.positions[3].id})
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=chief.user).key)
+        response = self.recommend()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({item['doer'] for item in response.json()['assignments']},
+                         {employee.id for employee in subordinates})
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.employees[3].user).key)
+        self.assertEqual(self.recommend().status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_not_participant(self):
+        outsider = User.objects.create(username='outsider', first_name='o', last_name='o', email='o@email.com')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=outsider).key)
+        self.assertEqual(self.recommend().status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DeadlinesTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        other_manager = User.objects.create_user(username="other", password="1q2w3e", first_name="other",
+                                                 last_name="other", email="other@email.com")
+        other = Project.objects.create(manager=other_manager, project_name="Other")
+        other_type = TaskType.objects.create(title='type', project=other)
+        Employee.objects.create(user=self.participant, project=other,
+                                position=Position.objects.create(title='pos', project=other))
+        Task.objects.filter(project=self.project).update(dead_line=now + timedelta(days=30))
+        tasks = Task.objects.filter(project=self.project).order_by('id')
+        self.overdue = list(tasks[:5].values_list('id', flat=True))
+        Task.objects.filter(id__in=self.overdue).update(dead_line=now - timedelta(hours=1))
+        Task.objects.filter(id=self.overdue[0]).update(is_done=True)
+        self.day = list(tasks[5:8].values_list('id', flat=True))
+        Task.objects.filter(id__in=self.day).update(dead_line=now + timedelta(hours=2))
+        self.week = [Task.objects.create(title='other', content='content', weight=1, taskType=other_type, project=other,
+                                         dead_line=now + timedelta(days=3)).id]
+
+    def deadlines(self, token, **params):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        return self.client.get(reverse('project_deadlines') + '?' + urlencode(params))
+
+    def test_buckets(self):
+        response = self.deadlines(self.participant_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.json()
+        self.assertEqual([task['id'] for task in result['overdue']['tasks']], self.overdue[1:])
+        self.assertEqual(result['overdue']['count'], 4)
+        self.assertEqual({task['id'] for task in result['day']['tasks']}, set(self.day))
+        self.assertEqual([task['id'] for task in result['week']['tasks']], self.week)
+
+    def test_only_own_projects(self):
+        result = self.deadlines(self.manager_token).json()
+        self.assertEqual(result['week']['count'], 0)
+        self.assertEqual(result['day']['count'], 3)
+
+    def test_limit(self):
+        result = self.deadlines(self.participant_token, limit=2).json()
+        self.assertEqual(len(result['overdue']['tasks']), 2)
+        self.assertEqual(result['overdue']['count'], 4)
+        self.assertEqual(self.deadlines(self.participant_token, limit='x').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_queries(self):
+        self.deadlines(self.participant_token)  # токен в кэше
+        with CaptureQueriesContext(connection) as queries:
+            self.deadlines(self.participant_token)
+        self.assertEqual(len(queries), 8)  # проекты, счетчики, по задачам и исполнителям на каждую группу
+
+    def test_partial_index(self):
+        index = next(index for index in Task._meta.indexes if index.name == 'task_open_deadline_idx')
+        self.assertEqual(index.condition, Q(is_done=False))
+
+    def test_anonymous(self):
+        self.assertEqual(self.client.get(reverse('project_deadlines')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TaskUploadTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        self.task = Task.objects.filter(project=self.project).first()
+        self.data = bytes(range(256)) * 4000
+
+    def create(self, size=None, **data):
+        return self.client.post(reverse('project_task_uploads', args=[self.project.id, self.task.id]),
+                                {'filename': 'design.psd', 'size': len(self.data) if size is None else size, **data},
+                                format='json')
+
+    def send(self, upload, offset, chunk, **headers):
+        return self.client.patch(reverse('project_task_upload', args=[self.project.id, self.task.id, upload]), chunk,
+                                 content_type=uploads.CONTENT_TYPE, HTTP_UPLOAD_OFFSET=str(offset), **headers)
+
+    def test_chunked_upload(self):
+        response = self.create(sha256=hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload = response.json()['id']
+        self.assertEqual(response['Location'],
+                         reverse('project_task_upload', args=[self.project.id, self.task.id, upload]))
+        for offset in range(0, len(self.data), 300000):
+            response = self.send(upload, offset, self.data[offset:offset + 300000])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(int(response['Upload-Offset']), min(offset + 300000, len(self.data)))
+        task_file = TaskFile.objects.get(id=response.json()['task_file'])
+        self.assertEqual(task_file.task, self.task)
+        with task_file.file.open('rb') as file:
+            self.assertEqual(file.read(), self.data)
+        self.assertTrue(task_file.file.name.startswith('files/'))
+
+    def test_resume(self):
+        upload = self.create().json()['id']
+        url = reverse('project_task_upload', args=[self.project.id, self.task.id, upload])
+        # Оборванная часть: сервер получил только начало тела
+        uploads.write_chunk(TaskFileUpload.objects.get(id=upload), 0, io.BytesIO(self.data[:1000]), length=5000)
+        response = self.client.head(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Upload-Offset'], '1000')
+        self.assertEqual(self.send(upload, 0, self.data).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.send(upload, 1000, self.data[1000:]).status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(TaskFileUpload.objects.get(id=upload).task_file)
+
+    def test_concurrent_chunk(self):
+        # Второй PATCH с тем же offset получил строку до того, как первый записал часть
+        upload = TaskFileUpload.objects.get(id=self.create().json()['id'])
+        stale = TaskFileUpload.objects.get(id=upload.id)
+        uploads.write_chunk(upload, 0, io.BytesIO(self.data[:1000]))
+        checksum = 'sha256 ' + base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        with self.assertRaises(uploads.OffsetMismatch):
+            uploads.write_chunk(stale, 0, io.BytesIO(b'other'), checksum=checksum)
+        self.assertEqual(stale.offset, 1000)
+        with uploads.storage().open(upload.path, 'rb') as file:
+            self.assertEqual(file.read(), self.data[:1000])
+
+    def test_chunk_read_outside_lock(self):
+        # Тело читается вне транзакции; PATCH, завершившийся за время чтения, выигрывает, файл не затирается
+        upload = TaskFileUpload.objects.get(id=self.create().json()['id'])
+        blocks = len(connection.savepoint_ids)
+        other = self.data[1000:2000]
+
+        class Stream(io.BytesIO):
+            def read(stream, size=-1):
+                self.assertEqual(len(connection.savepoint_ids), blocks)
+                if stream.tell() == 0:
+                    uploads.write_chunk(TaskFileUpload.objects.get(id=upload.id), 0, io.BytesIO(other))
+                return super().read(size)
+
+        with self.assertRaises(uploads.OffsetMismatch):
+            uploads.write_chunk(upload, 0, Stream(self.data[:1000]))
+        self.assertEqual(TaskFileUpload.objects.get(id=upload.id).offset, 1000)
+        with uploads.storage().open(upload.path, 'rb') as file:
+            self.assertEqual(file.read(), other)
+
+    def test_chunk_checksum(self):
+        upload = self.create().json()['id']
+        chunk = self.data[:1000]
+        checksum = 'sha256 ' + base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        response = self.send(upload, 0, chunk, HTTP_UPLOAD_CHECKSUM=checksum)
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(TaskFileUpload.objects.get(id=upload).offset, 0)
+        checksum = 'sha256 ' + base64.b64encode(hashlib.sha256(chunk).digest()).decode()
+        self.assertEqual(self.send(upload, 0, chunk, HTTP_UPLOAD_CHECKSUM=checksum).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.send(upload, 1000, b'x', HTTP_UPLOAD_CHECKSUM='sha256 !').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_file_checksum(self):
+        upload = self.create(sha256='0' * 64).json()['id']
+        response = self.send(upload, 0, self.data)
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(response['Upload-Offset'], '0')
+        self.assertFalse(TaskFile.objects.filter(task=self.task).exists())
+
+    def test_limits(self):
+        upload = self.create(size=10).json()['id']
+        self.assertEqual(self.send(upload, 0, b'x' * 11).status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        response = self.client.patch(reverse('project_task_upload', args=[self.project.id, self.task.id, upload]),
+                                     b'x', content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        with override_settings(TASK_UPLOAD_MAX_SIZE=100):
+            self.assertEqual(self.create(size=101).status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(self.create(size=-1).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_empty_file(self):
+        response = self.create(size=0)
+        self.assertIsNotNone(response.json()['task_file'])
+
+    def test_access(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.participant_token.key)
+        self.task.doers.clear()
+        self.assertEqual(self.create().status_code, status.HTTP_403_FORBIDDEN)
+        self.task.doers.add(Employee.objects.get(user=self.participant, project=self.project))
+        upload = self.create().json()['id']
+        self.assertEqual(self.send(upload, 0, self.data[:10]).status_code, status.HTTP_200_OK)
+        other = Employee.objects.filter(project=self.project).exclude(user=self.participant).first()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=other.user).key)
+        self.assertEqual(self.send(upload, 10, self.data[10:20]).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cancel_and_expire(self):
+        upload = TaskFileUpload.objects.get(id=self.create().json()['id'])
+        url = reverse('project_task_upload', args=[self.project.id, self.task.id, upload.id])
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(uploads.storage().exists(upload.path))
+        upload = TaskFileUpload.objects.get(id=self.create().json()['id'])
+        TaskFileUpload.objects.filter(id=upload.id).update(updated=timezone.now() - timedelta(days=2))
+        call_command('clean_uploads', stdout=io.StringIO())
+        self.assertFalse(TaskFileUpload.objects.filter(id=upload.id).exists())
+        self.assertFalse(uploads.storage().exists(upload.path))
+
+
+class TaskFileDownloadTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.task = Task.objects.filter(project=self.project).first()
+        self.data = bytes(range(256)) * 100
+        self.task_file = TaskFile(task=self.task)
+        self.task_file.file.save('preview.mp4', ContentFile(self.data))
+        self.url = reverse('project_task_file', args=[self.project.id, self.task.id, self.task_file.id])
+
+    def download(self, token=None, **headers):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + (token or self.participant_token).key)
+        response = self.client.get(self.url, **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_full(self):
+        response = self.download()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="preview.mp4"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range(self):
+        for header, start, end in (('bytes=100-199', 100, 199), ('bytes=25500-', 25500, 25599),
+                                   ('bytes=-10', 25590, 25599), ('bytes=25000-99999', 25000, 25599)):
+            response = self.download(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertEqual(b''.join(response.streaming_content), self.data[start:end + 1])
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{len(self.data)}')
+            self.assertEqual(int(response['Content-Length']), end - start + 1)
+
+    def test_range_not_satisfiable(self):
+        response = self.download(HTTP_RANGE='bytes=30000-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+        self.assertEqual(self.download(HTTP_RANGE='bytes=0-1,5-6').status_code, status.HTTP_200_OK)
+
+    def test_if_range(self):
+        last_modified = self.download()['Last-Modified']
+        self.assertEqual(self.download(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=last_modified).status_code,
+                         status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(self.download(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='Wed, 21 Oct 2015 07:28:00 GMT')
+                         .status_code, status.HTTP_200_OK)
+
+    def test_offload(self):
+        with override_settings(SENDFILE_BACKEND='x-accel-redirect'):
+            response = self.download(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.task_file.file.name)
+        self.assertEqual(response.content, b'')
+        with override_settings(SENDFILE_BACKEND='x-sendfile'):
+            response = self.download()
+        self.assertEqual(response['X-Sendfile'], quote(self.task_file.file.path))
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+
+    def test_offload_non_ascii(self):
+        self.task_file.file.save('отчет 1.pdf', ContentFile(self.data))
+        self.url = reverse('project_task_file', args=[self.project.id, self.task.id, self.task_file.id])
+        with override_settings(SENDFILE_BACKEND='x-sendfile'):
+            response = self.download()
+        self.assertEqual(response['X-Sendfile'], quote(self.task_file.file.path))
+        self.assertTrue(response['X-Sendfile'].isascii())
+        self.assertEqual(unquote(response['X-Sendfile']), self.task_file.file.path)
+        self.assertIn("filename*=utf-8''%D0%BE", response['Content-Disposition'])
+        with override_settings(SENDFILE_BACKEND='x-accel-redirect'):
+            response = self.download()
+        self.assertEqual(unquote(response['X-Accel-Redirect']), '/protected/' + self.task_file.file.name)
+
+    def test_list_and_access(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.participant_token.key)
+        response = self.client.get(reverse('project_task_files', args=[self.project.id, self.task.id]))
+        self.assertEqual(response.json(), [{'id': self.task_file.id, 'task': self.task.id, 'name': 'preview.mp4',
+                                            'size': len(self.data)}])
+        outsider = User.objects.create(username='outsider', first_name='o', last_name='o', email='o@email.com')
+        self.assertEqual(self.download(Token.objects.create(user=outsider)).status_code, status.HTTP_403_FORBIDDEN)
+        self.url = reverse('project_task_file', args=[self.project.id, self.task.id + 1, self.task_file.id])
+        self.assertEqual(self.download().status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_upload_links_download(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        response = self.client.post(reverse('project_task_uploads', args=[self.project.id, self.task.id]),
+                                    {'filename': 'empty.txt', 'size': 0}, format='json')
+        task_file = response.json()['task_file']
+        self.assertEqual(response.json()['file'],
+                         reverse('project_task_file', args=[self.project.id, self.task.id, task_file]))
+
+
+class RendererTests(LargeProjectTestCase):
+
+    def test_same_bytes_as_json_renderer(self):
+        data = serializers.TaskSerializer(Task.objects.filter(project=self.project).prefetch_related('doers'),
+                                          many=True).data
+        self.assertEqual(renderers.ORJSONRenderer().render(data), JSONRenderer().render(data))
+        odd = {
+            'moscow': timezone.now().astimezone(pytz.timezone('Europe/Moscow')), 'utc': timezone.now(),
+            'date': timezone.now().date(), 'time': datetime.time(10, 30, 0, 5), 'decimal': decimal.Decimal('1.10'),
+            'delta': timedelta(hours=1), 'uuid': uuid.uuid4(), 'lazy': gettext_lazy('Проект'), 'keys': {1: 'a'},
+            'separators': 'a\u2028b\u2029c', 'queryset': Position.objects.filter(project=self.project).values('id'),
+            'big': 2 ** 70, 'none': None, 'bytes': b'data',
+        }
+        self.assertEqual(renderers.ORJSONRenderer().render(odd), JSONRenderer().render(odd))
+
+    def test_floats(self):
+        data = {'floats': [1e16, 1.5e-07, -2e-05, 0.0001, 0.1, -2.5, 123456.789, 1e300, 2.0 ** 60],
+                'decimal': decimal.Decimal('1E-7'), 'key': {0.00001: 'a'}}
+        self.assertEqual(renderers.ORJSONRenderer().render(data), JSONRenderer().render(data))
+        for value in ([0.5, 1e-05], {'a': 2e+16}, 1e16, 0.25):
+            self.assertEqual(renderers.ORJSONRenderer().render(value), JSONRenderer().render(value))
+        # NaN/Infinity: при STRICT_JSON - ошибка, как у JSONRenderer, иначе NaN
+        for value in (decimal.Decimal('NaN'), decimal.Decimal('-Infinity')):
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'value': value})
+            with self.assertRaises(ValueError):
+                renderers.ORJSONRenderer().render({'value': value})
+            lax, orjson_lax = JSONRenderer(), renderers.ORJSONRenderer()
+            lax.strict = orjson_lax.strict = False
+            self.assertEqual(orjson_lax.render({'value': value}), lax.render({'value': value}))
+
+    def test_indent_falls_back(self):
+        data = {'a': [1, 2]}
+        self.assertEqual(renderers.ORJSONRenderer().render(data, 'application/json; indent=4'),
+                         JSONRenderer().render(data, 'application/json; indent=4'))
+        self.assertEqual(renderers.ORJSONRenderer().render(None), b'')
+
+    def test_api(self):
+        response = self.get('project_task_list', self.manager_token, self.project.id)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(response.json()['results']), 50)
+        response = self.client.post(reverse('project_positions_list', args=[self.project.id]), '{"title": ',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('JSON parse error', response.json()['detail'])
+        response = self.client.post(reverse('project_positions_list', args=[self.project.id]),
+                                    '{"title": "Роль", "color": "#ffffff"}'.encode(), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Position.objects.filter(project=self.project, title='Роль').exists())
+
+    @unittest.skipIf(renderers.msgpack is None, 'msgpack не установлен')
+    def test_msgpack(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        response = self.client.get(reverse('project_task_list', args=[self.project.id]),
+                                   HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(renderers.msgpack.unpackb(response.content),
+                         json.loads(JSONRenderer().render(response.data)))
+        response = self.client.post(reverse('project_positions_list', args=[self.project.id]),
+                                    renderers.msgpack.packb({'title': 'msgpack', 'color': '#ffffff'}),
+                                    content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class ValuesSerializationTests(LargeProjectTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Employee.objects.filter(id=Employee.objects.filter(project=self.project).order_by('id')[1].id) \
+            .update(chief=Employee.objects.filter(project=self.project).order_by('id').first())
+        Task.objects.filter(id=Task.objects.filter(project=self.project).order_by('id').first().id).update(is_done=True)
+
+    def both(self, url):  # Ответ быстрого пути и обычных сериализаторов
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.manager_token.key)
+        fast = self.client.get(url)
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        with mock.patch.object(values, 'get_plan', return_value=None):
+            slow = self.client.get(url)
+        return fast.content, slow.content
+
+    def test_same_bytes(self):
+        urls = [
+            reverse('project_task_list', args=[self.project.id]),
+            reverse('project_task_list', args=[self.project.id]) + '?ordering=-weight&page_size=7',
+            reverse('project_task_search', args=[self.project.id]) + '?q=task1&limit=5&offset=3',
+            reverse('project_employee_list', args=[self.project.id]),
+            reverse('project_positions_list', args=[self.project.id]),
+            reverse('project_taskType_list', args=[self.project.id]),
+            reverse('list_my_projects'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                fast, slow = self.both(url)
+                self.assertEqual(fast, slow)
+        # Ссылка next строится по строкам values() и ведет на ту же страницу, что и у обычного пути
+        fast, slow = self.both(urls[1])
+        next_url = json.loads(fast)['next']
+        self.assertIsNotNone(next_url)
+        self.assertEqual(self.both(next_url)[0], self.both(json.loads(slow)['next'])[1])
+
+    def test_timezone_and_unsupported(self):
+        tasks = Task.objects.filter(project=self.project).prefetch_related('doers')
+        plan = values.get_plan(serializers.TaskSerializer)
+        with timezone.override(pytz.timezone('Europe/Moscow')):
+            self.assertEqual(plan.serialize(plan.queryset(tasks)), serializers.TaskSerializer(tasks, many=True).data)
+        self.assertEqual(plan.serialize(plan.queryset(tasks)), serializers.TaskSerializer(tasks, many=True).data)
+        self.assertIsNone(values.get_plan(serializers.TaskFileDownloadSerializer))
+        self.assertIsNone(values.get_plan(serializers.DoersBatchSerializer))
+
+    def test_queries(self):
+        tasks = Task.objects.filter(project=self.project)
+        with self.assertNumQueries(2):  # строки задач и doers одним запросом
+            values.serialize(serializers.TaskSerializer, tasks)
+
+
+class FieldsetTests(LargeProjectTestCase):
+
+    def fetch(self, url_name, *args, **params):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.participant_token.key)
+        return self.client.get(reverse(url_name, args=args) + '?' + urlencode(params))
+
+    def test_sparse_task_list(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.fetch('project_task_list', self.project.id, fields='id,title,is_done,dead_line')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'title', 'dead_line', 'is_done'])
+        self.assertFalse(any('content' in query['sql'] or 'doers' in query['sql'] for query in queries))
+        # Позиция курсора (creation_date) загружается, хотя ее нет в fields
+        full = self.fetch('project_task_list', self.project.id, page_size=20).json()
+        sparse = self.fetch('project_task_list', self.project.id, page_size=20, fields='title').json()
+        sparse = self.client.get(sparse['next']).json()
+        full = self.client.get(full['next']).json()
+        self.assertEqual([task['title'] for task in sparse['results']], [task['title'] for task in full['results']])
+
+    def test_sparse_task_detail(self):
+        task = Task.objects.filter(project=self.project).first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.fetch('project_task_id', self.project.id, task.id, fields='title,weight')
+        self.assertEqual(response.json(), {'title': task.title, 'weight': task.weight})
+        self.assertFalse(any('content' in query['sql'] for query in queries))
+
+    def test_expand(self):
+        response = self.fetch('project_task_list', self.project.id, expand='taskType,doers', page_size=5)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        task = Task.objects.get(id=response.json()['results'][0]['id'])
+        result = response.json()['results'][0]
+        self.assertEqual(result['taskType'], serializers.TaskTypeSerializer(task.taskType).data)
+        self.assertEqual(result['doers'], serializers.EmployeeSerializer(task.doers.all(), many=True).data)
+        self.assertEqual(len(result['doers']), 2)
+        for page_size in (5, 50):  # Число запросов не зависит от числа задач
+            self.setUp()
+            with self.assertNumQueries(6):  # токен, проект, участие в проекте, задачи, doers, taskType
+                self.fetch('project_task_list', self.project.id, expand='taskType,doers', page_size=page_size)
+        # expand по ForeignKey остается на быстром пути projects.values (JOIN вместо prefetch)
+        fast = self.fetch('project_task_list', self.project.id, fields='id,title', expand='taskType').content
+        with mock.patch.object(values, 'get_plan', return_value=None):
+            slow = self.fetch('project_task_list', self.project.id, fields='id,title', expand='taskType').content
+        self.assertEqual(fast, slow)
+        self.assertIsNotNone(values.get_plan(serializers.TaskSerializer, fields=('id', 'title'), expand=('taskType',)))
+        response = self.fetch('project_task_search', self.project.id, q='task1', fields='id', expand='doers')
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'doers'])
+        self.assertEqual(len(response.json()['results'][0]['doers']), 2)
+
+    def test_employees(self):
+        response = self.fetch('project_employee_list', self.project.id, fields='id,position', expand='user,position')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        employee = Employee.objects.filter(project=self.project).order_by('id').first()
+        self.assertEqual(response.json()['results'][0], {
+            'id': employee.id,
+            'user': {'id': employee.user.id, 'username': employee.user.username,
+                     'first_name': employee.user.first_name, 'last_name': employee.user.last_name},
+            'position': {'id': employee.position.id, 'title': employee.position.title,
+                         'color': employee.position.color, 'project': self.project.id},
+        })
+        response = self.fetch('project_employee_id', self.project.id, employee.id, fields='user')
+        self.assertEqual(response.json(), {'user': employee.user.id})
+
+    def test_invalid(self):
+        for params in ({'fields': 'id,secret'}, {'fields': ','}, {'expand': 'project'}):
+            with self.subTest(params=params):
+                response = self.fetch('project_task_list', self.project.id, **params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(list(params)[0], response.json())
+
+
+class EmployeeHierarchyTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="1q2w3e", first_name="manager",
+                                                last_name="manager", email="manager@email.com")
+        self.project1 = Project.objects.create(manager=self.manager, project_name="TestProject1")
+        self.position1 = Position.objects.create(title='testPos1', color="#000000", project=self.project1)
+        self.users = [User.objects.create(username=f'user{i}', first_name=f'user{i}', last_name=f'user{i}',
+                                          email=f'user{i}@email.com') for i in range(5)]
+        # 0 -> 1 -> 2 -> 3, 4 - отдельно
+        self.employees = []
+        for i, user in enumerate(self.users):
+            chief = self.employees[i - 1] if 0 < i < 4 else None
+            self.employees.append(Employee.objects.create(user=user, chief=chief, position=self.position1,
+                                                          project=self.project1))
+        self.task1 = Task.objects.create(title='task1', content='task1', weight=4, dead_line="2021-11-22T00:00:00Z",
+                                         project=self.project1,
+                                         taskType=TaskType.objects.create(title='type', project=self.project1))
+        self.tokens = [Token.objects.create(user=user) for user in self.users]
+
+    def refresh(self):
+        for employee in self.employees:
+            employee.refresh_from_db()
+
+    def test_paths(self):
+        e = self.employees
+        self.assertEqual(e[0].path, f'{e[0].id}/')
+        self.assertEqual(e[3].path, f'{e[0].id}/{e[1].id}/{e[2].id}/{e[3].id}/')
+        self.assertTrue(e[3].is_subordinate_of(e[0]))
+        self.assertFalse(e[0].is_subordinate_of(e[3]))
+        self.assertFalse(e[0].is_subordinate_of(e[0]))
+
+    def test_subordinates_single_query(self):
+        e = self.employees
+        with self.assertNumQueries(1):
+            self.assertEqual(list(Employee.objects.subordinates_of(e[1])), [e[2], e[3]])
+        with self.assertNumQueries(1):
+            self.assertTrue(Employee.objects.subordinates_of(e[0]).filter(pk=e[3].pk).exists())
+
+    def test_move_subtree(self):
+        e = self.employees
+        e[1].chief = e[4]
+        e[1].save()
+        self.refresh()
+        self.assertEqual(e[3].path, f'{e[4].id}/{e[1].id}/{e[2].id}/{e[3].id}/')
+        self.assertFalse(e[3].is_subordinate_of(e[0]))
+        self.assertTrue(e[3].is_subordinate_of(e[4]))
+
+    def test_stale_instance_keeps_paths(self):
+        e = self.employees
+        stale = Employee.objects.get(pk=e[2].pk)  # Загружен до перемещения поддерева начальника
+        e[1].chief = e[4]
+        e[1].save()
+        stale.save()
+        self.refresh()
+        self.assertEqual(stale.path, f'{e[4].id}/{e[1].id}/{e[2].id}/')
+        self.assertEqual(e[2].path, stale.path)
+        self.assertEqual(e[3].path, f'{e[4].id}/{e[1].id}/{e[2].id}/{e[3].id}/')
+        stale.chief = e[0]
+        stale.save()
+        self.refresh()
+        self.assertEqual(e[3].path, f'{e[0].id}/{e[2].id}/{e[3].id}/')
+        self.assertEqual(list(Employee.objects.subordinates_of(e[1])), [])
+
+    def test_delete_detaches_subtree(self):
+        e = self.employees
+        e[1].delete()
+        for employee in (e[0], e[2], e[3]):
+            employee.refresh_from_db()
+        self.assertIsNone(e[2].chief_id)
+        self.assertEqual(e[3].path, f'{e[2].id}/{e[3].id}/')
+        self.assertEqual(list(Employee.objects.subordinates_of(e[0])), [])
+
+    def test_cycle(self):
+        e = self.employees
+        e[0].chief = e[3]
+        with self.assertRaises(ValueError):
+            e[0].save()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.manager).key)
+        response = self.client.patch(reverse('project_employee_id', args=[self.project1.id, e[1].id]),
+                                     {"chief": e[2].id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_subordinates_view(self):
+        e = self.employees
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.tokens[1].key)
+        response = self.client.get(reverse('project_employee_subordinates', args=[self.project1.id, e[0].id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item.get('id') for item in response.json()['results']], [e[1].id, e[2].id, e[3].id])
+
+    def test_internal_fields_hidden(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.tokens[1].key)
+        response = self.client.get(reverse('project_employee_list', args=[self.project1.id]))
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'user', 'chief', 'position', 'project'})
+        response = self.client.get(reverse('project_employee_id', args=[self.project1.id, self.employees[3].id]))
+        self.assertNotIn('path', response.json())
+        response = self.client.get(reverse('project_employee_list', args=[self.project1.id]) + '?fields=id,path')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_indirect_chief_sets_doer(self):
+        e = self.employees
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.tokens[0].key)
+        response = self.client.patch(reverse('project_set_employee', args=[self.project1.id, self.task1.id]),
+                                     {"doer_id": e[3].id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.tokens[3].key)
+        response = self.client.patch(reverse('project_set_employee', args=[self.project1.id, self.task1.id]),
+                                     {"doer_id": e[0].id}, format='json')
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,165 @@
+import base64
+import binascii
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from . import models
+
+# Протокол по образцу tus (https://tus.io/protocols/resumable-upload):
+#   POST  .../uploads/        {filename, size, sha256?} - создает загрузку и пустой файл в хранилище
+#   HEAD  .../uploads/<id>/   заголовок Upload-Offset - сколько байт сервер уже записал
+#   PATCH .../uploads/<id>/   Content-Type: application/offset+octet-stream, Upload-Offset, Upload-Checksum?
+#                             тело - следующая часть файла, без буферизации в памяти пишется во временный файл
+#                             и затем под блокировкой строки загрузки дописывается в файл
+# Оборванная часть сохраняется до последнего полученного байта, клиент продолжает с Upload-Offset.
+
+CONTENT_TYPE = 'application/offset+octet-stream'
+BUFFER_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    status = 400
+
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+
+class TooLarge(UploadError):
+    status = 413
+
+
+class ChecksumMismatch(UploadError):
+    status = 460  # Checksum Mismatch в tus
+
+
+def storage():
+    return models.TaskFile._meta.get_field('file').storage
+
+
+def parse_checksum(header):
+    """Upload-Checksum: '<алгоритм> <base64 дайджеста>' -> (hashlib-объект, дайджест) или (None, None)."""
+    if not header:
+        return None, None
+    try:
+        algorithm, value = header.split()
+        return hashlib.new(algorithm.lower()), base64.b64decode(value, validate=True)
+    except (ValueError, binascii.Error):
+        raise UploadError('Invalid Upload-Checksum')
+
+
+def create_upload(task, user, filename, size, sha256=''):
+    """Резервирует имя файла по upload_to TaskFile и создает пустой файл, в который будут писаться части."""
+    if size > settings.TASK_UPLOAD_MAX_SIZE:
+        raise TooLarge(f'File too large, max {settings.TASK_UPLOAD_MAX_SIZE} bytes')
+    field = models.TaskFile._meta.get_field('file')
+    path = storage().save(field.generate_filename(None, os.path.basename(filename)), ContentFile(b''))
+    upload = models.TaskFileUpload.objects.create(task=task, user=user, filename=filename, path=path, size=size,
+                                                  sha256=sha256.lower())
+    if upload.is_complete:
+        complete(upload)
+    return upload
+
+
+def _check_offset(upload, offset, length):
+    if upload.is_complete:
+        raise OffsetMismatch('Upload is complete')
+    if offset != upload.offset:
+        raise OffsetMismatch(f'Upload-Offset must be {upload.offset}')
+    remaining = upload.size - offset
+    if length is not None and length > remaining:
+        raise TooLarge(f'Chunk exceeds upload size, {remaining} bytes left')
+    return remaining
+
+
+def _current_offset(upload, lock=False):
+    queryset = models.TaskFileUpload.objects.select_for_update() if lock else models.TaskFileUpload.objects
+    return queryset.values_list('offset', flat=True).get(pk=upload.pk)
+
+
+def write_chunk(upload, offset, stream, length=None, checksum=None):
+    """
+    Дописывает в файл загрузки часть из stream начиная с offset, который должен совпадать с upload.offset.
+    length - Content-Length, если известен. checksum - заголовок Upload-Checksum части: при несовпадении
+    часть отбрасывается целиком, без него сохраняется всё полученное (и при обрыве соединения).
+    """
+    digest, expected = parse_checksum(checksum)
+    upload.offset = _current_offset(upload)
+    remaining = _check_offset(upload, offset, length)
+
+    # Тело читается от клиента во временный файл рядом с файлом загрузки без транзакции и блокировок:
+    # медленный клиент не держит подключение к БД и не мешает другим запросам к этой загрузке
+    path = storage().path(upload.path)
+    with tempfile.TemporaryFile(dir=os.path.dirname(path)) as part:
+        written = 0
+        while written < remaining:
+            chunk = stream.read(min(BUFFER_SIZE, remaining - written))
+            if not chunk:
+                break
+            part.write(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            written += len(chunk)
+        if digest is not None and (digest.digest() != expected or (length is not None and written != length)):
+            raise ChecksumMismatch('Checksum mismatch')
+
+        # Под блокировкой строки - только проверка offset, копирование части с локального диска и его сдвиг:
+        # из параллельных PATCH с тем же offset засчитывается один, остальные получают 409
+        with transaction.atomic():
+            upload.offset = _current_offset(upload, lock=True)
+            _check_offset(upload, offset, None)
+            if written:
+                part.seek(0)
+                with open(path, 'r+b') as file:
+                    file.seek(offset)
+                    shutil.copyfileobj(part, file, BUFFER_SIZE)
+                    file.flush()
+                    os.fsync(file.fileno())  # offset в БД не должен опережать данные на диске
+                if not models.TaskFileUpload.objects.filter(pk=upload.pk, offset=offset) \
+                        .update(offset=offset + written, updated=timezone.now()):
+                    raise OffsetMismatch('Upload-Offset changed by a concurrent request')
+                upload.offset = offset + written
+    if upload.is_complete:
+        complete(upload)
+    return upload
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with storage().open(path, 'rb') as file:
+        for chunk in file.chunks(BUFFER_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def complete(upload):
+    """Проверяет sha256 всего файла (если задан) и прикрепляет файл к задаче. При несовпадении - загрузка заново."""
+    if upload.sha256 and file_sha256(upload.path) != upload.sha256:
+        with open(storage().path(upload.path), 'r+b') as file:
+            file.truncate(0)
+        models.TaskFileUpload.objects.filter(pk=upload.pk).update(offset=0)
+        upload.offset = 0
+        raise ChecksumMismatch('File checksum mismatch, upload restarted')
+    with transaction.atomic():
+        upload.task_file = models.TaskFile.objects.create(task_id=upload.task_id, file=upload.path)
+        upload.save(update_fields=['task_file', 'updated'])
+
+
+def cancel(upload):
+    if upload.task_file_id is None:
+        storage().delete(upload.path)
+    upload.delete()
+
+
+def expired_uploads():  # Незавершенные загрузки без новых частей дольше TASK_UPLOAD_EXPIRE_HOURS
+    return models.TaskFileUpload.objects.filter(
+        task_file__isnull=True, updated__lt=timezone.now() - timedelta(hours=settings.TASK_UPLOAD_EXPIRE_HOURS)
+    )
@@ -1,18 +1,43 @@
 from django.urls import path
 from .import views
+from . import async_views
 
 
 urlpatterns = [
     path("projects/", views.ProjectListView.as_view(), name="list_my_projects"),
     path("projects/participant/", views.ProjectParticipantListView.as_view(), name="list_part_projects"),
+    path("projects/deadlines/", views.DeadlinesView.as_view(), name="project_deadlines"),
     path("projects/<int:pk>/", views.ProjectView.as_view(), name="project_id"),
+    path("projects/<int:pk>/stats/", views.ProjectStatsView.as_view(), name="project_stats"),
     path("projects/<int:pk>/positions/", views.PositionListView.as_view(), name="project_positions_list"),
     path("projects/<int:pk>/positions/<int:pos_pk>/", views.PositionView.as_view(), name="project_positions_id"),
     path("projects/<int:pk>/tasktype/", views.TaskTypeListView.as_view(), name="project_taskType_list"),
     path("projects/<int:pk>/tasktype/<int:pos_pk>/", views.TaskTypeView.as_view(), name="project_taskType_id"),
     path("projects/<int:pk>/employee/", views.EmployeeListView.as_view(), name="project_employee_list"),
     path("projects/<int:pk>/employee/<int:pos_pk>/", views.EmployeeView.as_view(), name="project_employee_id"),
+    path("projects/<int:pk>/employee/<int:pos_pk>/subordinates/", views.EmployeeSubordinatesView.as_view(),
+         name="project_employee_subordinates"),
     path("projects/<int:pk>/task/<int:pos_pk>/", views.TaskView.as_view(), name="project_task_id"),
     path("projects/<int:pk>/task/", views.TaskListView.as_view(), name="project_task_list"),
+    path("projects/<int:pk>/task/search/", views.TaskSearchView.as_view(), name="project_task_search"),
+    path("projects/<int:pk>/task/export/", views.TaskExportView.as_view(), name="project_task_export"),
+    path("projects/<int:pk>/task/import/", views.TaskImportView.as_view(), name="project_task_import"),
+    path("projects/<int:pk>/task/bulk/", views.TaskBulkView.as_view(), name="project_task_bulk"),
+    path("projects/<int:pk>/task/recommend/", views.TaskRecommendView.as_view(), name="project_task_recommend"),
+    path("projects/<int:pk>/task/<int:pos_pk>/files/", views.TaskFileListView.as_view(), name="project_task_files"),
+    path("projects/<int:pk>/task/<int:pos_pk>/files/<int:file_pk>/", views.TaskFileDownloadView.as_view(),
+         name="project_task_file"),
+    path("projects/<int:pk>/task/<int:pos_pk>/uploads/", views.TaskUploadListView.as_view(),
+         name="project_task_uploads"),
+    path("projects/<int:pk>/task/<int:pos_pk>/uploads/<int:upload_pk>/", views.TaskUploadView.as_view(),
+         name="project_task_upload"),
     path("projects/<int:pk>/employee_set/<int:pos_pk>/", views.SetEmployeeOnTask.as_view(), name="project_set_employee"),
+    path("projects/<int:pk>/employee_set/", views.SetEmployeesOnTasks.as_view(), name="project_set_employees"),
+
+    # Те же GET запросы для ASGI сервера (projects.async_views)
+    path("async/projects/<int:pk>/", async_views.project_detail, name="async_project_id"),
+    path("async/projects/<int:pk>/positions/", async_views.position_list, name="async_project_positions_list"),
+    path("async/projects/<int:pk>/tasktype/", async_views.task_type_list, name="async_project_taskType_list"),
+    path("async/projects/<int:pk>/employee/", async_views.employee_list, name="async_project_employee_list"),
+    path("async/projects/<int:pk>/task/", async_views.task_list, name="async_project_task_list"),
 ]
@@ -0,0 +1,251 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Быстрый путь для списков только на чтение: строки из .values() вместо экземпляров моделей и
+# to_representation каждого поля. Ответ совпадает с ModelSerializer(many=True).data побайтно.
+# Поддерживаются поля модели без source и своих to_representation: Integer/Char/Boolean/DateTime,
+# PrimaryKeyRelatedField, ManyRelatedField по pk и вложенный ModelSerializer по ForeignKey.
+# Для остальных сериализаторов get_plan() вернет None.
+# ids для ManyToMany: в PostgreSQL - ArrayAgg в подзапросе, иначе один запрос к through-таблице.
+# SQLite хранит даты текстом 'YYYY-MM-DD HH:MM:SS[.ffffff]' в UTC: разбирать их в datetime, чтобы
+# снова получить строку, дороже всего остального, поэтому они читаются текстом.
+
+_SIMPLE = {
+    serializers.IntegerField.to_representation,
+    serializers.CharField.to_representation,
+    serializers.BooleanField.to_representation,
+}
+_UTC = timedelta(0)
+_plans = {}
+_lock = threading.Lock()
+
+
+def _iso_datetime(value):  # DateTimeField.to_representation для ISO 8601, когда переводить часовой пояс не нужно
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _datetime_converter(field):
+    """Функция для DateTimeField; выбирается на каждый запрос, так как часовой пояс может быть активирован."""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None:
+        return None
+    field_timezone = getattr(field, 'timezone', field.default_timezone())
+    if output_format.lower() == ISO_8601 and field_timezone is not None and field_timezone.utcoffset(None) == _UTC:
+        return _iso_datetime
+    return field.to_representation
+
+
+def _text_converter(convert):  # Для дат, прочитанных из SQLite текстом
+    def text_to_representation(value):
+        if convert is _iso_datetime and len(value) in (19, 26) and value[10] == ' ':
+            return value[:10] + 'T' + value[11:] + 'Z'
+        return convert(timezone.make_aware(parse_datetime(value), timezone.utc))
+    return text_to_representation
+
+
+def _sqlite_text_dates(db):
+    connection = connections[db]
+    return connection.vendor == 'sqlite' and settings.USE_TZ and connection.timezone_name == 'UTC'
+
+
+class ValuesPlan:
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = []  # аргументы values()
+        self.fields = []  # (имя в ответе, вид, ключ строки, параметр)
+        self.many = []  # (имя, ManyToManyField)
+        self.datetimes = []  # ключи строки с DateTimeField
+
+    def add(self, name, kind, key, param=None):
+        self.fields.append((name, kind, key, param))
+
+    def queryset(self, queryset, keep=()):
+        """values() для serialize(); столбцы keep (позиция курсора) выбираются всегда и значениями полей модели."""
+        queryset = queryset.prefetch_related(None)
+        annotations = {}
+        if self.many and connections[queryset.db].vendor == 'postgresql':
+            from django.contrib.postgres.aggregates import ArrayAgg
+            for name, model_field in self.many:
+                through, source, target, ordering = _m2m(model_field)
+                annotations[_alias(name)] = models.Subquery(
+                    through.objects.filter(**{source: models.OuterRef('pk')}).values(source)
+                    .annotate(ids=ArrayAgg(target, ordering=ordering)).values('ids')
+                )
+        keep = [name.lstrip('-') for name in keep] + ([self.model._meta.pk.attname] if self.many else [])
+        columns = self.columns + [name for name in keep if name not in self.columns]
+        if self.datetimes and _sqlite_text_dates(queryset.db):
+            text = [key for key in self.datetimes if key not in keep]
+            annotations.update((_alias(key), Cast(key, models.TextField())) for key in text)
+            columns = [key for key in columns if key not in text]
+        return queryset.annotate(**annotations).values(*columns, *annotations)
+
+    def serialize(self, rows):
+        rows = list(rows)
+        if not rows:
+            return []
+        fields = self.prepare(rows)
+        return [_row(row, fields) for row in rows]
+
+    def prepare(self, rows):
+        """Поля с функциями преобразования под строки, которые вернул queryset()."""
+        fields = []
+        for name, kind, key, param in self.fields:
+            if kind == 'datetime':
+                kind, param = 'convert', _datetime_converter(param)
+                if param is None:
+                    kind = 'value'
+                elif _alias(key) in rows[0]:
+                    key, param = _alias(key), _text_converter(param)
+            elif kind == 'many' and _alias(name) in rows[0]:
+                key = _alias(name)
+            elif kind == 'many':
+                key = self.model._meta.pk.attname
+                kind, param = 'many_loaded', _load_m2m(param, rows, key)
+            elif kind == 'nested':
+                param = param.prepare(rows)
+            fields.append((name, kind, key, param))
+        return fields
+
+
+def _row(row, fields):
+    item = {}
+    for name, kind, key, param in fields:
+        value = row[key]
+        if kind == 'value':
+            item[name] = value
+        elif kind == 'convert':
+            item[name] = None if value is None else param(value)
+        elif kind == 'many':
+            item[name] = value or []
+        elif kind == 'many_loaded':
+            item[name] = param.get(value, [])
+        else:  # nested
+            item[name] = None if value is None else _row(row, param)
+    return item
+
+
+def _alias(name):
+    return f'values_{name}'
+
+
+def _ordering(model, prefix):
+    """Meta.ordering модели как ключи order_by от prefix; ForeignKey раскрывается по ordering связанной модели."""
+    result = []
+    for name in model._meta.ordering:
+        if not isinstance(name, str):
+            return None
+        descending, name = name.startswith('-'), name.lstrip('-')
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        if field.is_relation and field.related_model._meta.ordering:
+            names = _ordering(field.related_model, f'{prefix}__{field.name}')
+        else:
+            names = [f'{prefix}__{field.name}']
+        if names is None:
+            return None
+        if descending:
+            names = [name[1:] if name.startswith('-') else '-' + name for name in names]
+        result.extend(names)
+    return result
+
+
+def _m2m(model_field):
+    """(through-модель, поле на эту модель, поле на связанную, сортировка как у связанной модели)."""
+    through = model_field.remote_field.through
+    source, target = model_field.m2m_field_name(), model_field.m2m_reverse_field_name()
+    return through, source, f'{target}_id', _ordering(model_field.related_model, target) + [f'{target}_id']
+
+
+def _load_m2m(model_field, rows, key):  # {pk: [ids]} для строк одним запросом к through-таблице
+    through, source, target, ordering = _m2m(model_field)
+    loaded = {}
+    for pk, related in through.objects.filter(**{f'{source}__in': [row[key] for row in rows]}) \
+            .order_by(*ordering).values_list(f'{source}_id', target):
+        loaded.setdefault(pk, []).append(related)
+    return loaded
+
+
+def _build(serializer, model, prefix='', nested=False):
+    plan = ValuesPlan(model)
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source != name:
+            return None
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        key = prefix + name
+        if isinstance(field, serializers.ManyRelatedField):
+            if nested or not model_field.many_to_many or model_field.auto_created \
+                    or type(field.child_relation).to_representation \
+                    is not serializers.PrimaryKeyRelatedField.to_representation \
+                    or field.child_relation.pk_field is not None or _ordering(model_field.related_model, '') is None:
+                return None
+            plan.many.append((name, model_field))
+            plan.add(name, 'many', key, model_field)
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            if type(field).to_representation is not serializers.PrimaryKeyRelatedField.to_representation \
+                    or field.pk_field is not None or not model_field.many_to_one:
+                return None
+            plan.columns.append(key)
+            plan.add(name, 'value', key)
+        elif isinstance(field, serializers.ModelSerializer):
+            if nested or not model_field.many_to_one:
+                return None
+            inner = _compile(type(field), field, model_field.related_model, key + '__', nested=True)
+            if inner is None:
+                return None
+            plan.columns.append(key)
+            plan.columns.extend(inner.columns)
+            plan.datetimes.extend(inner.datetimes)
+            plan.add(name, 'nested', key, inner)
+        elif isinstance(field, serializers.DateTimeField) \
+                and type(field).to_representation is serializers.DateTimeField.to_representation:
+            plan.columns.append(key)
+            plan.datetimes.append(key)
+            plan.add(name, 'datetime', key, field)
+        elif type(field).to_representation in _SIMPLE:
+            plan.columns.append(key)
+            plan.add(name, 'value', key)
+        else:
+            return None
+    return plan
+
+
+def _compile(serializer_class, serializer, model, prefix='', nested=False):
+    if not issubclass(serializer_class, serializers.ModelSerializer) \
+            or serializer_class.to_representation is not serializers.ModelSerializer.to_representation:
+        return None
+    return _build(serializer, model, prefix, nested)
+
+
+def get_plan(serializer_class, **kwargs):
+    """ValuesPlan для ModelSerializer или None, если сериализатор нельзя заменить строками values()."""
+    key = (serializer_class, *sorted(kwargs.items()))
+    with _lock:
+        if key not in _plans:
+            _plans[key] = _compile(serializer_class, serializer_class(**kwargs),
+                                   getattr(getattr(serializer_class, 'Meta', None), 'model', None))
+        return _plans[key]
+
+
+def serialize(serializer_class, queryset, **kwargs):
+    """Аналог serializer_class(queryset, many=True, **kwargs).data для списков только на чтение."""
+    plan = get_plan(serializer_class, **kwargs)
+    if plan is None:
+        return serializer_class(queryset, many=True, **kwargs).data
+    return plan.serialize(plan.queryset(queryset))
@@ -6,8 +6,26 @@ from django.db import IntegrityError
 from rest_framework import status
 from . import models
 from . import serializers
-from .permissions import IsManagerOfProject, IsParticipantOfProject, IsChiefOfEmployee
+from . import pagination
+from . import bulk
+from . import assignments
+from . import filters
+from . import export
+from . import importer
+from . import stats
+from . import recommend
+from . import deadlines
+from . import uploads
+from . import downloads
+from . import values
+from . import fieldsets
+from .search import search_tasks
+from .identity import get_identity_map
+from .permissions import IsManagerOfProject, IsParticipantOrManagerOfProject, IsChiefOfEmployee
 from django.contrib.auth.models import AnonymousUser
+from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 
 
 class ProjectListView(APIView):
@@ -15,9 +33,8 @@ class ProjectListView(APIView):
     def get(self, request):  # Работает
         if self.request.user.is_anonymous:
             return Response({'detail': 'Unauthorized'}, status=401)
-        projects = models.Project.objects.filter(manager=self.request.user)
-        serializer = serializers.ProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+        projects = models.Project.objects.filter(manager=self.request.user).select_related('manager')
+        return pagination.ProjectPagination().paginate(projects, request, self, serializers.ProjectSerializer)
 
     def post(self, request):  # Работает
         if self.request.user.is_anonymous:
@@ -43,22 +60,37 @@ class ProjectParticipantListView(APIView):  # Работает
     def get(self, request):
         if self.request.user.is_anonymous:
             return Response({'detail': 'Unauthorized'}, status=401)
-        projects = [employee.project for employee in models.Employee.objects.filter(user=self.request.user)]
-        serializer = serializers.ProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+        projects = models.Project.objects.filter(employees__user=self.request.user).select_related('manager')
+        return pagination.ProjectPagination().paginate(projects, request, self, serializers.ProjectSerializer)
+
+
+class DeadlinesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):  # ?limit= - задач в каждой группе
+        try:
+            limit = min(int(request.query_params.get('limit', deadlines.DEFAULT_LIMIT)), deadlines.MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=400)
+        if limit < 0:
+            return Response({'error': 'Invalid limit'}, status=400)
+        result = deadlines.deadline_buckets(request.user, limit)
+        for name, _, _ in deadlines.buckets(result['now']):
+            result[name]['tasks'] = values.serialize(serializers.TaskSerializer, result[name]['tasks'])
+        return Response(result)
 
 
 class ProjectView(APIView):
-    permission_classes = [IsParticipantOfProject | IsManagerOfProject]
+    permission_classes = [IsParticipantOrManagerOfProject]
 
     def get(self, request, pk):
-        project = models.Project.objects.get(id=pk)
+        project = get_identity_map(request).get_or_404(models.Project, pk)
         self.check_object_permissions(request, project)
         serializer = serializers.ProjectSerializer(project)
         return Response(serializer.data, status=200)
 
     def patch(self, request, pk):
-        project = models.Project.objects.get(id=pk)
+        project = get_identity_map(request).get_or_404(models.Project, pk)
         self.check_object_permissions(request, project)
         serializer = serializers.ProjectSerializer(project, data=request.data, partial=True)
         if serializer.is_valid():
@@ -71,27 +103,35 @@ class ProjectView(APIView):
             return Response({'error': 'InvalidSerializer'}, status=400)
 
     def delete(self, request, pk):
-        project = models.Project.objects.get(id=pk)
+        project = get_identity_map(request).get_or_404(models.Project, pk)
         self.check_object_permissions(request, project)
         project.delete()
         return Response(status=200)
 
 
+class ProjectStatsView(APIView):
+    permission_classes = [IsParticipantOrManagerOfProject]
+
+    def get(self, request, pk):
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        return Response(stats.get_stats(pk), status=200)
+
+
 class PositionListView(APIView):
-    permission_classes = [IsParticipantOfProject | IsManagerOfProject]
+    permission_classes = [IsParticipantOrManagerOfProject]
 
     def get(self, request, pk):
         position = models.Position.objects.filter(project=pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.PositionSerializer(position, many=True)
-        return Response(serializer.data)
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        return pagination.PositionPagination().paginate(position, request, self, serializers.PositionSerializer)
 
     def post(self, request, pk):
-        serializer = serializers.PositionSerializer(data=request.data)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        project = get_identity_map(request).get_or_404(models.Project, pk)
+        serializer = serializers.PositionSerializer(data=request.data, context={'request': request})
+        self.check_object_permissions(request, project)
         if serializer.is_valid():
             try:
-                serializer.save(project=models.Project.objects.get(id=pk))
+                serializer.save(project=project)
             except IntegrityError:
                 return Response({'error': 'IntegrityError'}, status=400)
             return Response(serializer.data, status=201)
@@ -104,17 +144,19 @@ class PositionView(APIView):
 
     def get(self, request, pk, pos_pk):
         position = models.Position.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
         serializer = serializers.PositionSerializer(position)
         return Response(serializer.data)
 
     def patch(self, request, pk, pos_pk):
+        project = get_identity_map(request).get_or_404(models.Project, pk)
         position = models.Position.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.PositionSerializer(position, data=request.data, partial=True)
+        self.check_object_permissions(request, project)
+        serializer = serializers.PositionSerializer(position, data=request.data, partial=True,
+                                                    context={'request': request})
         if serializer.is_valid():
             try:
-                serializer.save(project=models.Project.objects.get(id=pk))
+                serializer.save(project=project)
             except IntegrityError:
                 return Response({'error': 'IntegrityError'}, status=400)
             return Response(serializer.data, status=201)
@@ -123,26 +165,26 @@ class PositionView(APIView):
 
     def delete(self, request, pk, pos_pk):
         position = models.Position.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
         position.delete()
         return Response(status=200)
 
 
 class TaskTypeListView(APIView):
-    permission_classes = [IsParticipantOfProject | IsManagerOfProject]
+    permission_classes = [IsParticipantOrManagerOfProject]
 
     def get(self, request, pk):
         task_type = models.TaskType.objects.filter(project=pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.TaskTypeSerializer(task_type, many=True)
-        return Response(serializer.data)
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        return pagination.TaskTypePagination().paginate(task_type, request, self, serializers.TaskTypeSerializer)
 
     def post(self, request, pk):
-        serializer = serializers.TaskTypeSerializer(data=request.data)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        project = get_identity_map(request).get_or_404(models.Project, pk)
+        serializer = serializers.TaskTypeSerializer(data=request.data, context={'request': request})
+        self.check_object_permissions(request, project)
         if serializer.is_valid():
             try:
-                serializer.save(project=models.Project.objects.get(id=pk))
+                serializer.save(project=project)
             except IntegrityError:
                 return Response({'error': 'IntegrityError'}, status=400)
             return Response(serializer.data, status=201)
@@ -155,17 +197,19 @@ class TaskTypeView(APIView):
 
     def get(self, request, pk, pos_pk):
         task_type = models.TaskType.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
         serializer = serializers.TaskTypeSerializer(task_type)
         return Response(serializer.data)
 
     def patch(self, request, pk, pos_pk):
+        project = get_identity_map(request).get_or_404(models.Project, pk)
         task_type = models.TaskType.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.PositionSerializer(task_type, data=request.data, partial=True)
+        self.check_object_permissions(request, project)
+        serializer = serializers.PositionSerializer(task_type, data=request.data, partial=True,
+                                                    context={'request': request})
         if serializer.is_valid():
             try:
-                serializer.save(project=models.Project.objects.get(id=pk))
+                serializer.save(project=project)
             except IntegrityError:
                 return Response({'error': 'IntegrityError'}, status=400)
             return Response(serializer.data, status=201)
@@ -174,28 +218,35 @@ class TaskTypeView(APIView):
 
     def delete(self, request, pk, pos_pk):
         task_type = models.TaskType.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
         task_type.delete()
         return Response(status=200)
 
 
 class EmployeeListView(APIView):
-    permission_classes = [IsParticipantOfProject | IsManagerOfProject]
+    permission_classes = [IsParticipantOrManagerOfProject]
 
     def get(self, request, pk):
         employee = models.Employee.objects.filter(project=pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.EmployeeSerializer(employee, many=True)
-        return Response(serializer.data)
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        fieldset = fieldsets.fieldset(request.query_params, serializers.EmployeeSerializer)
+        paginator = pagination.EmployeePagination()
+        employee = fieldsets.select(employee, serializers.EmployeeSerializer, keep=paginator.ordering, **fieldset)
+        return paginator.paginate(employee, request, self, serializers.EmployeeSerializer, **fieldset)
 
     def post(self, request, pk):
-        if models.Position.objects.get(id=request.data.get('position')).project != models.Project.objects.get(id=pk):
+        objects = get_identity_map(request)
+        project = objects.get_or_404(models.Project, pk)
+        try:
+            if objects.get(models.Position, request.data.get('position')).project_id != project.id:
+                return Response({'error': 'Invalid position'}, status=400)
+        except models.Position.DoesNotExist:
             return Response({'error': 'Invalid position'}, status=400)
-        serializer = serializers.EmployeeSerializer(data=request.data)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        serializer = serializers.EmployeeSerializer(data=request.data, context={'request': request})
+        self.check_object_permissions(request, project)
         if serializer.is_valid():
             try:
-                serializer.save(project=models.Project.objects.get(id=pk))
+                serializer.save(project=project)
             except IntegrityError:
                 return Response({'error': 'IntegrityError'}, status=400)
             return Response(serializer.data, status=201)
@@ -204,24 +255,33 @@ class EmployeeListView(APIView):
 
 
 class EmployeeView(APIView):
-    permission_classes = [IsParticipantOfProject | IsManagerOfProject]
+    permission_classes = [IsParticipantOrManagerOfProject]
 
     def get(self, request, pk, pos_pk):
-        employee = models.Employee.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.EmployeeSerializer(employee)
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        fieldset = fieldsets.fieldset(request.query_params, serializers.EmployeeSerializer)
+        employee = fieldsets.select(models.Employee.objects.filter(project=pk), serializers.EmployeeSerializer,
+                                    **fieldset).get(id=pos_pk)
+        serializer = serializers.EmployeeSerializer(employee, **fieldset)
         return Response(serializer.data)
 
 
     def patch(self, request, pk, pos_pk):
-        if request.data.get('position') and models.Position.objects.get(id=request.data.get('position')).project != models.Project.objects.get(id=pk):
+        objects = get_identity_map(request)
+        project = objects.get_or_404(models.Project, pk)
+        try:
+            if request.data.get('position') and \
+                    objects.get(models.Position, request.data.get('position')).project_id != project.id:
+                return Response({'error': 'Invalid position'}, status=400)
+        except models.Position.DoesNotExist:
             return Response({'error': 'Invalid position'}, status=400)
-        employee = models.Employee.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.EmployeeSerializer(employee, data=request.data, partial=True)
+        employee = objects.add(models.Employee.objects.get(project=pk, id=pos_pk))
+        self.check_object_permissions(request, project)
+        serializer = serializers.EmployeeSerializer(employee, data=request.data, partial=True,
+                                                    context={'request': request})
         if serializer.is_valid():
             try:
-                serializer.save(project=models.Project.objects.get(id=pk))
+                serializer.save(project=project)
             except IntegrityError:
                 return Response({'error': 'IntegrityError'}, status=400)
             return Response(serializer.data, status=201)
@@ -230,32 +290,54 @@ class EmployeeView(APIView):
 
     def delete(self, request, pk, pos_pk):
         employee = models.Employee.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
         employee.delete()
         return Response(status=200)
 
 
+class EmployeeSubordinatesView(APIView):
+    permission_classes = [IsParticipantOrManagerOfProject]
+
+    def get(self, request, pk, pos_pk):
+        objects = get_identity_map(request)
+        self.check_object_permissions(request, objects.get_or_404(models.Project, pk))
+        employee = get_object_or_404(models.Employee, project=pk, id=pos_pk)
+        fieldset = fieldsets.fieldset(request.query_params, serializers.EmployeeSerializer)
+        paginator = pagination.EmployeePagination()
+        subordinates = fieldsets.select(models.Employee.objects.subordinates_of(employee),
+                                        serializers.EmployeeSerializer, keep=paginator.ordering, **fieldset)
+        return paginator.paginate(subordinates, request, self, serializers.EmployeeSerializer, **fieldset)
+
+
 class TaskListView(APIView):
-    permission_classes = [IsParticipantOfProject | IsManagerOfProject]
+    permission_classes = [IsParticipantOrManagerOfProject]
 
     def get(self, request, pk):
-        tasks = models.Task.objects.filter(project=pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        tasks = filters.filter_tasks(models.Task.objects.filter(project=pk), request.query_params)
+        fieldset = fieldsets.fieldset(request.query_params, serializers.TaskSerializer)
+        paginator = pagination.TaskPagination()
+        paginator.ordering = filters.task_ordering(request.query_params, paginator.ordering)
+        tasks = fieldsets.select(tasks, serializers.TaskSerializer, keep=paginator.ordering, **fieldset)
+        return paginator.paginate(tasks, request, self, serializers.TaskSerializer, **fieldset)
 
     def post(self, request, pk):
-        if models.TaskType.objects.get(id=request.data.get('taskType')).project != models.Project.objects.get(id=pk):
+        objects = get_identity_map(request)
+        project = objects.get_or_404(models.Project, pk)
+        try:
+            if objects.get(models.TaskType, request.data.get('taskType')).project_id != project.id:
+                return Response({'error': 'Invalid position'}, status=400)
+        except models.TaskType.DoesNotExist:
             return Response({'error': 'Invalid position'}, status=400)
-        serializer = serializers.TaskSerializer(data=request.data)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        serializer = serializers.TaskSerializer(data=request.data, context={'request': request})
+        self.check_object_permissions(request, project)
         doers_ids_str = request.data.get('doers_ids')
         doers_ids = [0]
         if doers_ids_str:
             doers_ids = [int(s) for s in doers_ids_str.split(',')]
         if serializer.is_valid():
             try:
-                serializer.save(project=models.Project.objects.get(id=pk),
+                serializer.save(project=project,
                             doers=models.Employee.objects.filter(id__in=doers_ids)
                             )
             except IntegrityError:
@@ -266,27 +348,111 @@ class TaskListView(APIView):
             return Response({'error': 'InvalidSerializer'}, status=400)
 
 
+class TaskSearchView(APIView):
+    permission_classes = [IsParticipantOrManagerOfProject]
+
+    def get(self, request, pk):
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Empty query'}, status=400)
+        fieldset = fieldsets.fieldset(request.query_params, serializers.TaskSerializer)
+        tasks = search_tasks(models.Task.objects.filter(project=pk), query)
+        tasks = fieldsets.select(tasks, serializers.TaskSerializer, **fieldset)
+        return pagination.SearchPagination().paginate(tasks, request, self, serializers.TaskSerializer, **fieldset)
+
+
+class TaskExportView(APIView):
+    permission_classes = [IsParticipantOrManagerOfProject]
+    content_types = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+    def get(self, request, pk):  # ?fmt=ndjson|csv (format занят DRF)
+        project = get_identity_map(request).get_or_404(models.Project, pk)
+        self.check_object_permissions(request, project)
+        fmt = request.query_params.get('fmt', 'ndjson')
+        if fmt not in export.FORMATS:
+            return Response({'error': 'Invalid format'}, status=400)
+        response = StreamingHttpResponse(export.export_tasks(project, fmt),
+                                         content_type=self.content_types[fmt] + '; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="project_{project.id}_tasks.{fmt}"'
+        return response
+
+
+class TaskImportView(APIView):
+    permission_classes = [IsParticipantOrManagerOfProject]
+
+    def post(self, request, pk):  # multipart: file, fmt=ndjson|csv (по умолчанию - по расширению), chunk_size
+        project = get_identity_map(request).get_or_404(models.Project, pk)
+        self.check_object_permissions(request, project)
+        file = request.FILES.get('file')
+        if file is None:
+            return Response({'error': 'No file'}, status=400)
+        fmt = request.data.get('fmt') or file.name.rsplit('.', 1)[-1].lower()
+        if fmt not in importer.FORMATS:
+            return Response({'error': 'Invalid format'}, status=400)
+        try:
+            chunk_size = min(int(request.data.get('chunk_size', importer.CHUNK_SIZE)), importer.CHUNK_SIZE)
+        except ValueError:
+            return Response({'error': 'Invalid chunk_size'}, status=400)
+        if chunk_size < 1:
+            return Response({'error': 'Invalid chunk_size'}, status=400)
+        try:
+            result = importer.import_tasks(project, file, fmt, chunk_size)
+        except importer.ImportFileError as error:  # created - задачи из пачек, сохраненных до ошибки
+            return Response({'error': error.message, **error.result}, status=400)
+        return Response(result, status=201 if result['created'] else 400)
+
+
+class TaskBulkView(APIView):
+    permission_classes = [IsParticipantOrManagerOfProject]
+
+    def post(self, request, pk):
+        project = get_identity_map(request).get_or_404(models.Project, pk)
+        self.check_object_permissions(request, project)
+        if not isinstance(request.data, list) or not request.data:
+            return Response({'error': 'Expected a list of tasks'}, status=400)
+        if len(request.data) > bulk.MAX_BATCH_SIZE:
+            return Response({'error': f'Too many tasks, max {bulk.MAX_BATCH_SIZE}'}, status=400)
+        try:
+            tasks, errors = bulk.create_tasks(project, request.data)
+        except bulk.TaskConflict as conflict:  # Ничего не создано, errors - элементы, занятые параллельным запросом
+            return Response({'error': 'Tasks conflict with a concurrent change', 'errors': conflict.errors},
+                            status=409)
+        created = models.Task.objects.filter(id__in=[task.pk for task in tasks]).prefetch_related('doers')
+        return Response({'created': serializers.TaskSerializer(created, many=True).data, 'errors': errors},
+                        status=201 if tasks else 400)
+
+
 class TaskView(APIView):
-    permission_classes = [IsParticipantOfProject | IsManagerOfProject]
+    permission_classes = [IsParticipantOrManagerOfProject]
 
     def get(self, request, pk, pos_pk):
-        task = models.Task.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.TaskSerializer(task)
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        fieldset = fieldsets.fieldset(request.query_params, serializers.TaskSerializer)
+        task = fieldsets.select(models.Task.objects.filter(project=pk), serializers.TaskSerializer,
+                                **fieldset).get(id=pos_pk)
+        serializer = serializers.TaskSerializer(task, **fieldset)
         return Response(serializer.data)
 
     def patch(self, request, pk, pos_pk):
-        if request.data.get('taskType') and models.TaskType.objects.get(id=request.data.get('taskType')).project != models.Project.objects.get(id=pk):
+        objects = get_identity_map(request)
+        project = objects.get_or_404(models.Project, pk)
+        try:
+            if request.data.get('taskType') and \
+                    objects.get(models.TaskType, request.data.get('taskType')).project_id != project.id:
+                return Response({'error': 'Invalid position'}, status=400)
+        except models.TaskType.DoesNotExist:
             return Response({'error': 'Invalid position'}, status=400)
         task = models.Task.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
-        serializer = serializers.TaskSerializer(task, data=request.data, partial=True)
+        task.project = project
+        self.check_object_permissions(request, project)
+        serializer = serializers.TaskSerializer(task, data=request.data, partial=True, context={'request': request})
         if request.data.get('doers_ids'):
             doers_ids_str = request.data.get('doers_ids')
             doers_ids = [int(s) for s in doers_ids_str.split(',')]
             if serializer.is_valid():
                 try:
-                    serializer.save(project=models.Project.objects.get(id=pk),
+                    serializer.save(project=project,
                                     doers=models.Employee.objects.filter(id__in=doers_ids)
                                     )
                 except IntegrityError:
@@ -298,7 +464,7 @@ class TaskView(APIView):
         else:
             if serializer.is_valid():
                 try:
-                    serializer.save(project=models.Project.objects.get(id=pk))
+                    serializer.save(project=project)
                 except IntegrityError:
                     return Response({'error': 'IntegrityError'}, status=400)
                 return Response(serializer.data, status=201)
@@ -308,12 +474,158 @@ class TaskView(APIView):
 
     def delete(self, request, pk, pos_pk):
         task = models.Task.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk))
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
         task.delete()
         return Response(status=200)
 
 
-class SetEmployeeOnTask(APIView):
+class TaskUploadMixin:
+    # Загружать файлы задачи могут менеджер проекта и исполнители задачи, продолжать загрузку - ее автор и менеджер
+
+    def get_task(self, request, pk, pos_pk):
+        project = get_identity_map(request).get_or_404(models.Project, pk)
+        task = get_object_or_404(models.Task, project=pk, id=pos_pk)
+        if project.manager_id != request.user.pk and not task.doers.filter(user=request.user.pk).exists():
+            self.permission_denied(request)
+        return project, task
+
+    def get_upload(self, request, pk, pos_pk, upload_pk):
+        project = get_identity_map(request).get_or_404(models.Project, pk)
+        upload = get_object_or_404(models.TaskFileUpload.objects.select_related('task'), id=upload_pk,
+                                   task=pos_pk, task__project=pk)
+        if request.user.pk not in (upload.user_id, project.manager_id):
+            self.permission_denied(request)
+        return upload
+
+    def upload_response(self, upload, status=200):
+        response = Response(serializers.TaskFileUploadSerializer(upload).data, status=status)
+        response['Upload-Offset'] = upload.offset
+        response['Upload-Length'] = upload.size
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+class TaskUploadListView(TaskUploadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk, pos_pk):  # {filename, size, sha256?}
+        project, task = self.get_task(request, pk, pos_pk)
+        serializer = serializers.TaskFileUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'error': 'InvalidSerializer'}, status=400)
+        try:
+            upload = uploads.create_upload(task, request.user, **serializer.validated_data)
+        except uploads.UploadError as error:
+            return Response({'error': str(error)}, status=error.status)
+        response = self.upload_response(upload, status=201)
+        response['Location'] = reverse('project_task_upload', args=[pk, pos_pk, upload.id])
+        return response
+
+
+class TaskUploadView(TaskUploadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, pos_pk, upload_pk):  # HEAD - тот же ответ без тела, смещение в Upload-Offset
+        return self.upload_response(self.get_upload(request, pk, pos_pk, upload_pk))
+
+    def patch(self, request, pk, pos_pk, upload_pk):
+        # Тело читается из request.read() частями, request.data не используется, чтобы DRF не разбирал его целиком
+        upload = self.get_upload(request, pk, pos_pk, upload_pk)
+        if request.content_type.split(';')[0].strip() != uploads.CONTENT_TYPE:
+            return Response({'error': f'Content-Type must be {uploads.CONTENT_TYPE}'}, status=415)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length']) if request.headers.get('Content-Length') else None
+        except (KeyError, ValueError):
+            return Response({'error': 'Invalid Upload-Offset'}, status=400)
+        try:
+            uploads.write_chunk(upload, offset, request, length, request.headers.get('Upload-Checksum'))
+        except uploads.UploadError as error:
+            response = Response({'error': str(error)}, status=error.status)
+            response['Upload-Offset'] = upload.offset
+            return response
+        return self.upload_response(upload)
+
+    def delete(self, request, pk, pos_pk, upload_pk):
+        uploads.cancel(self.get_upload(request, pk, pos_pk, upload_pk))
+        return Response(status=204)
+
+
+class TaskFileListView(APIView):
+    permission_classes = [IsParticipantOrManagerOfProject]
+
+    def get(self, request, pk, pos_pk):
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        files = models.TaskFile.objects.filter(task=pos_pk, task__project=pk).order_by('id')
+        return Response(serializers.TaskFileDownloadSerializer(files, many=True).data)
+
+
+class TaskFileDownloadView(APIView):
+    permission_classes = [IsParticipantOrManagerOfProject]
+
+    def get(self, request, pk, pos_pk, file_pk):  # ?download=1 - attachment, иначе inline для предпросмотра
+        self.check_object_permissions(request, get_identity_map(request).get_or_404(models.Project, pk))
+        task_file = get_object_or_404(models.TaskFile, id=file_pk, task=pos_pk, task__project=pk)
+        as_attachment = request.query_params.get('download') in ('1', 'true')
+        try:
+            return downloads.file_response(task_file, request, as_attachment)
+        except FileNotFoundError:
+            return Response({'error': 'File not found'}, status=404)
+
+
+class BatchDoersMixin:
+
+    def change_doers(self, request, pk, data, remove=False):
+        serializer = serializers.DoersBatchSerializer(data=data)
+        if not serializer.is_valid():
+            return Response({'error': 'Invalid doers'}, status=400)
+        objects = get_identity_map(request)
+        project = objects.get_or_404(models.Project, pk)
+        chief = None
+        if project.manager_id != request.user.pk:
+            chief = objects.employee(request.user, project)
+            if chief is None:
+                self.permission_denied(request)
+        try:
+            results = assignments.change_doers(project, chief, serializer.validated_data['task_ids'],
+                                               serializer.validated_data['doer_ids'], remove=remove)
+        except assignments.DoersConflict as conflict:
+            return Response({'error': 'Doers changed by a concurrent request', 'conflicts': conflict.pairs},
+                            status=409)
+        return Response({'results': results}, status=200)
+
+
+class TaskRecommendView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):  # task_ids (по умолчанию - все без исполнителей), position_ids, apply
+        serializer = serializers.RecommendSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'error': 'Invalid data'}, status=400)
+        objects = get_identity_map(request)
+        project = objects.get_or_404(models.Project, pk)
+        chief = None
+        if project.manager_id != request.user.pk:
+            chief = objects.employee(request.user, project)
+            if chief is None:
+                self.permission_denied(request)
+        result = recommend.recommend(project, chief, **serializer.validated_data)
+        if result is None:
+            return Response({'error': 'No employees'}, status=400)
+        return Response(result, status=200)
+
+
+class SetEmployeesOnTasks(BatchDoersMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def patch(self, request, pk):
+        return self.change_doers(request, pk, request.data)
+
+    def delete(self, request, pk):
+        return self.change_doers(request, pk, request.data, remove=True)
+
+
+class SetEmployeeOnTask(BatchDoersMixin, APIView):
     permission_classes = [IsChiefOfEmployee]
 
     def check_object_permissions(self, request, obj1, obj2):
@@ -330,18 +642,26 @@ class SetEmployeeOnTask(APIView):
                 )
 
     def patch(self, request, pk, pos_pk):
+        if 'doer_ids' in request.data:
+            return self.change_doers(request, pk, {'task_ids': [pos_pk], 'doer_ids': request.data.get('doer_ids')})
         if not request.data.get('doer_id', None):
             return Response({'error': 'Invalid doers'}, status=400)
-        if models.Employee.objects.get(id=request.data.get('doer_id', None)).project != models.Project.objects.get(id=pk):
+        objects = get_identity_map(request)
+        project = objects.get_or_404(models.Project, pk)
+        try:
+            doer = objects.get(models.Employee, request.data.get('doer_id', None))
+        except models.Employee.DoesNotExist:
+            return Response({'error': 'Invalid employee'}, status=400)
+        if doer.project_id != project.id:
             return Response({'error': 'Invalid employee'}, status=400)
         task = models.Task.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk),
-                                      models.Employee.objects.get(id=request.data.get('doer_id', None)))
-        task.doers.add(models.Employee.objects.get(id=request.data.get('doer_id', None)))
-        serializer = serializers.TaskSerializer(task, data=request.data, partial=True)
+        task.project = project
+        self.check_object_permissions(request, project, doer)
+        task.doers.add(doer)
+        serializer = serializers.TaskSerializer(task, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
             try:
-                serializer.save(project=models.Project.objects.get(id=pk))
+                serializer.save(project=project)
             except IntegrityError:
                 return Response({'error': 'IntegrityError'}, status=400)
             return Response(serializer.data, status=201)
@@ -350,17 +670,26 @@ class SetEmployeeOnTask(APIView):
             return Response({'error': 'InvalidSerializer'},status=400)
 
     def delete(self, request, pk, pos_pk):
+        if 'doer_ids' in request.data:
+            return self.change_doers(request, pk, {'task_ids': [pos_pk], 'doer_ids': request.data.get('doer_ids')},
+                                     remove=True)
         if not request.data.get('doer_id', None):
             return Response(status=400)
-        if models.Employee.objects.get(id=request.data.get('doer_id', None)).project != models.Project.objects.get(id=pk):
+        objects = get_identity_map(request)
+        project = objects.get_or_404(models.Project, pk)
+        try:
+            doer = objects.get(models.Employee, request.data.get('doer_id', None))
+        except models.Employee.DoesNotExist:
+            return Response(status=400)
+        if doer.project_id != project.id:
             return Response(status=400)
         task = models.Task.objects.get(project=pk, id=pos_pk)
-        self.check_object_permissions(request, models.Project.objects.get(id=pk),
-                                      models.Employee.objects.get(id=request.data.get('doer_id', None)))
-        task.doers.remove(models.Employee.objects.get(id=request.data.get('doer_id', None)))
-        serializer = serializers.TaskSerializer(task, data=request.data, partial=True)
+        task.project = project
+        self.check_object_permissions(request, project, doer)
+        task.doers.remove(doer)
+        serializer = serializers.TaskSerializer(task, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
-            serializer.save(project=models.Project.objects.get(id=pk))
+            serializer.save(project=project)
             return Response(serializer.data, status=200)
         # return Response(doers_ids)
         else:
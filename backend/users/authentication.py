@@ -0,0 +1,59 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from projects.cache import TTLCache, shared_cache
+
+User = get_user_model()
+
+# token key -> (поля User, Token.created). Сначала кэш процесса, затем общий django cache, затем БД.
+# Сбрасывается сигналами users.signals при удалении токена и сохранении пользователя;
+# в других процессах локальная запись живет не дольше TOKEN_AUTH_LOCAL_CACHE_TTL. django cache используется,
+# только если он общий (settings.CACHES): сброс в LocMemCache одного процесса другие процессы не увидят.
+# Кэшируются только поля для проверки прав и users/me: пароль в кэш не попадает, остальные поля отложены,
+# а устаревшие значения User.save() обратно не записывает (User.from_cache).
+local_cache = TTLCache(max_size=settings.TOKEN_AUTH_CACHE_SIZE, ttl=settings.TOKEN_AUTH_LOCAL_CACHE_TTL)
+_fields = [User._meta.pk.attname, 'username', 'first_name', 'last_name', 'email', 'is_active', 'is_staff',
+           'is_superuser']
+
+
+def _cache_key(key):  # сам токен в ключ общего кэша не попадает
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_token(key):
+    local_cache.delete(key)
+    cache.delete(_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        entry = local_cache.get(key)
+        if entry is None:
+            shared = shared_cache()
+            entry = cache.get(_cache_key(key)) if shared else None
+            if entry is None:
+                token = self._load(key)
+                entry = ([getattr(token.user, name) for name in _fields], token.created)
+                if shared:
+                    cache.set(_cache_key(key), entry, settings.TOKEN_AUTH_CACHE_TTL)
+            local_cache.set(key, entry)
+        values, created = entry
+        # Каждому запросу - свой экземпляр User, чтобы изменения во вьюхе не попадали в кэш
+        user = User.from_cache(_fields, values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, Token(key=key, user=user, created=created)
+
+    def _load(self, key):
+        try:
+            return Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
@@ -1,17 +1,34 @@
 from djoser import email
 from django.conf import settings
 
+from jobs.mail import QueuedEmailMixin
 
-class ConfirmationEmail(email.ConfirmationEmail):
+
+class ActivationEmail(QueuedEmailMixin, email.ActivationEmail):
+    pass
+
+
+class ConfirmationEmail(QueuedEmailMixin, email.ConfirmationEmail):
     template_name = 'email/confirmation.html'
 
 
-class PasswordResetEmail(email.PasswordResetEmail):
+class PasswordResetEmail(QueuedEmailMixin, email.PasswordResetEmail):
     template_name = 'email/password_reset.html'
 
     def get_context_data(self):
         # PasswordResetEmail can be deleted
         context = super().get_context_data()
         context["frontend_url"] = settings.FRONTEND_URL
-        print(settings.FRONTEND_URL)
-        return context
\ No newline at end of file
+        return context
+
+
+class PasswordChangedConfirmationEmail(QueuedEmailMixin, email.PasswordChangedConfirmationEmail):
+    pass
+
+
+class UsernameChangedConfirmationEmail(QueuedEmailMixin, email.UsernameChangedConfirmationEmail):
+    pass
+
+
+class UsernameResetEmail(QueuedEmailMixin, email.UsernameResetEmail):
+    pass
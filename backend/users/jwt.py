@@ -0,0 +1,37 @@
+import time
+
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from projects import access
+
+User = get_user_model()
+
+# Claims для быстрого пути (settings.JWT_STATELESS_USER): username, is_active, роли в проектах и время их выдачи.
+# Пока claims свежие (access.fresh_claims), пользователь и роли берутся из токена без запросов к БД.
+_claim_fields = ('username', 'is_active')
+
+
+def add_claims(token, user):
+    for name in _claim_fields:
+        token[name] = getattr(user, name)
+    roles = access.project_roles(user)
+    if roles is not None:
+        token['project_roles'] = roles
+    token['claims_at'] = int(time.time())
+    return token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        if not access.fresh_claims(validated_token) or any(name not in validated_token for name in _claim_fields):
+            return super().get_user(validated_token)
+        # Остальные поля отложены и загружаются одним запросом при первом обращении (User.refresh_from_db)
+        fields = [User._meta.pk.attname, *_claim_fields]
+        user = User.from_cache(fields, [validated_token[api_settings.USER_ID_CLAIM],
+                                        *(validated_token[name] for name in _claim_fields)])
+        if not user.is_active:
+            return super().get_user(validated_token)
+        return user
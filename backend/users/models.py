@@ -55,6 +55,42 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_cache(cls, field_names, values):
+        """
+        Пользователь из кэша аутентификации (users.authentication) или claims JWT (users.jwt): field_names
+        загружены из кэша и могут быть устаревшими, остальные поля отложены.
+        """
+        cached = dict(zip(field_names, values))
+        names = [field.attname for field in cls._meta.concrete_fields if field.attname in cached]  # порядок from_db
+        user = cls.from_db('default', names, [cached[name] for name in names])
+        user.cached_values = cached
+        return user
+
+    def save(self, *args, **kwargs):
+        # Устаревшие значения из кэша не записываются обратно: сохраняются поля, измененные после загрузки,
+        # и догруженные из БД (иначе PATCH users/me откатил бы смену пароля или is_active из другого процесса)
+        cached = getattr(self, 'cached_values', None)
+        if cached is not None and self.pk is not None and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and (field.attname not in cached or getattr(self, field.attname) != cached[field.attname])
+            ]
+        super().save(*args, **kwargs)
+        if cached is not None:
+            cached.update((name, getattr(self, name)) for name in cached)
+
+    def refresh_from_db(self, using=None, fields=None):
+        # Пользователь из claims JWT (users.jwt) загружен частично: при обращении к отложенному полю
+        # догружаются сразу все отложенные
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields)
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
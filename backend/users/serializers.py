@@ -8,6 +8,11 @@ from djoser.compat import get_user_email_field_name, get_user_email
 from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer, UserSerializer as BaseUserSerializer
 from djoser.conf import settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .jwt import add_claims
 
 User = get_user_model()
 
@@ -59,3 +64,21 @@ class UserCreateSerializer(BaseUserCreateSerializer):
                 user.save(update_fields=["is_active"])
         return user
 
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    # Новый access токен получает claims на момент обновления, а не на момент входа
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        refresh = RefreshToken(attrs['refresh'])
+        user = User.objects.filter(**{jwt_settings.USER_ID_FIELD: refresh[jwt_settings.USER_ID_CLAIM]}).first()
+        if user is not None and user.is_active:
+            data['access'] = str(add_claims(refresh.access_token, user))
+        return data
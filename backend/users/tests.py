@@ -1,3 +1,181 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from jobs import queue
+from jobs.models import Job
+from projects.access import membership_cache
+from projects.models import Employee, Position, Project
+from .authentication import _cache_key, local_cache
+
+User = get_user_model()
+
+
+def shared_cache_settings(test):  # Общий для процессов django cache (файлы) на время теста
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    caches = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                                   'LOCATION': directory.name}})
+    caches.enable()
+    test.addCleanup(caches.disable)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        shared_cache_settings(self)
+        local_cache.clear()
+        cache.clear()
+        self.user = User.objects.create_user(username="user", password="1q2w3e", first_name="user",
+                                             last_name="user", email="user@email.com")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def me(self):
+        return self.client.get('/auth/users/me/')
+
+    def test_cached_after_first_request(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.me().status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.me()
+        self.assertEqual(response.json().get('username'), 'user')
+
+    def test_shared_cache(self):  # Другой процесс: локальный кэш пуст, общий заполнен
+        self.me()
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.me().status_code, status.HTTP_200_OK)
+
+    def test_deleted_token(self):
+        self.me()
+        self.token.delete()
+        self.assertEqual(self.me().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user(self):
+        self.me()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.me().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_update_visible(self):
+        self.me()
+        response = self.client.patch('/auth/users/me/', {'first_name': 'changed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.me().json().get('first_name'), 'changed')
+
+    def test_password_not_cached(self):
+        self.me()
+        values, _ = cache.get(_cache_key(self.token.key))
+        self.assertNotIn(self.user.password, values)
+
+    def test_stale_entry_not_written_back(self):  # Другой процесс сменил пароль, локальный кэш еще старый
+        self.me()
+        User.objects.filter(pk=self.user.pk).update(password='changed', is_staff=True)
+        response = self.client.patch('/auth/users/me/', {'first_name': 'changed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.password, self.user.is_staff, self.user.first_name), ('changed', True, 'changed'))
+
+    def test_local_cache_only(self):  # С LocMemCache общий кэш не используется: сброс в нем не виден другим процессам
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.me()
+            self.assertIsNone(cache.get(_cache_key(self.token.key)))
+            local_cache.clear()
+            with self.assertNumQueries(1):
+                self.assertEqual(self.me().status_code, status.HTTP_200_OK)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        self.assertEqual(self.me().status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(JWT_STATELESS_USER=True)
+class StatelessJWTTests(APITestCase):
+
+    def setUp(self):
+        membership_cache.clear()
+        self.user = User.objects.create_user(username="user", password="1q2w3e", first_name="user",
+                                             last_name="user", email="user@email.com")
+        manager = User.objects.create_user(username="manager", password="1q2w3e", first_name="manager",
+                                           last_name="manager", email="manager@email.com")
+        self.managed = Project.objects.create(manager=self.user, project_name="Managed")
+        self.joined = Project.objects.create(manager=manager, project_name="Joined")
+        self.employee = Employee.objects.create(user=self.user, project=self.joined,
+                                                position=Position.objects.create(title='pos', project=self.joined))
+        self.tokens = self.client.post('/auth/jwt/create/', {'username': 'user', 'password': '1q2w3e'}).json()
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + self.tokens['access'])
+
+    def test_claims(self):
+        token = AccessToken(self.tokens['access'])
+        self.assertEqual(token['username'], 'user')
+        self.assertTrue(token['is_active'])
+        self.assertEqual(token['project_roles'], {str(self.managed.id): 'manager', str(self.joined.id): 'participant'})
+
+    def test_permission_from_claims(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('project_task_list', args=[self.joined.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'users_user' in query['sql']
+                          or 'projects_employee' in query['sql']])
+
+    def test_user_loaded_lazily(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/auth/users/me/')
+        self.assertEqual(response.json().get('email'), 'user@email.com')
+
+    def test_stale_claims_use_database(self):
+        self.employee.delete()
+        with override_settings(JWT_CLAIMS_TTL=-1):
+            response = self.client.get(reverse('project_task_list', args=[self.joined.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_updates_claims(self):
+        self.employee.delete()
+        access = self.client.post('/auth/jwt/refresh/', {'refresh': self.tokens['refresh']}).json()['access']
+        self.assertEqual(AccessToken(access)['project_roles'], {str(self.managed.id): 'manager'})
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + access)
+        response = self.client.get(reverse('project_task_list', args=[self.joined.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_disabled(self):
+        with override_settings(JWT_STATELESS_USER=False), CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('project_task_list', args=[self.joined.id]))
+        self.assertTrue([query for query in queries if 'users_user' in query['sql']])
+
+
+class QueuedEmailTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="1q2w3e", first_name="user",
+                                             last_name="user", email="user@email.com")
+
+    def test_password_reset_queued(self):
+        response = self.client.post('/auth/users/reset_password/', {'email': 'user@email.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(mail.outbox, [])
+        job = Job.objects.get()
+        self.assertEqual(job.payload['to'], ['user@email.com'])
+        queue.run_pending('worker', 10)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('/reset-password/', mail.outbox[0].body)
+
+    @override_settings(DJOSER={**settings.DJOSER, 'SEND_CONFIRMATION_EMAIL': True})
+    def test_registration_queued(self):
+        response = self.client.post('/auth/users/', {
+            'username': 'new', 'password': 'Str0ng-pass', 're_password': 'Str0ng-pass', 'email': 'new@email.com',
+            'first_name': 'new', 'last_name': 'new'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.content)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Job.objects.get().payload['to'], ['new@email.com'])
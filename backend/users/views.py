@@ -5,6 +5,9 @@ from djoser.compat import get_user_email
 from djoser.conf import settings
 from rest_framework import viewsets, mixins
 from rest_framework.permissions import IsAdminUser
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from .serializers import ClaimsTokenObtainPairSerializer, ClaimsTokenRefreshSerializer
 
 
 class CustomUserViewSet(UserViewSet):
@@ -22,3 +25,10 @@ class CustomUserViewSet(UserViewSet):
         elif settings.SEND_CONFIRMATION_EMAIL:
             settings.EMAIL.confirmation(self.request, context).send(to)
 
+
+class ClaimsTokenObtainPairView(TokenObtainPairView):
+    serializer_class = ClaimsTokenObtainPairSerializer
+
+
+class ClaimsTokenRefreshView(TokenRefreshView):
+    serializer_class = ClaimsTokenRefreshSerializer